@@ -0,0 +1,409 @@
+# api.py
+# 唯讀 JSON 查詢服務（只用標準函式庫的 http.server）：給其他內部工具用，不必去爬 Streamlit 畫面
+# SQL 跟 app.py 同一套（queries.py），連線也一樣走 db_pool / replica
+#
+# 快取：每個路由對應幾張表，ETag = 這幾張表在 table_versions 裡的版本號（init_db.py 的 trigger 每次寫入 +1）
+#   - 帶 If-None-Match 且版本沒變：直接 304，不跑查詢
+#   - 版本沒變的同一個網址：回傳記憶體裡上次算好的 JSON
+#
+# 用法：
+#   python api.py                       http://127.0.0.1:8502
+#   python api.py --port 9000 --replica 讀取改走記憶體副本（replica.py）
+#
+# 路由（列表都是 keyset 分頁：回應的 next_cursor 原樣放進 ?cursor= 拿下一頁；?count=1 另外回傳總筆數）
+#   GET /lookups/companies | /lookups/groups | /lookups/nationalities
+#   GET /groups?q=&company=&without_company=1&order=name|members|releases|songs
+#   GET /groups/<id>                 團體資料 + 成員 + 發行 + 統計
+#   GET /groups/<id>/releases
+#   GET /members?q=&group=&nationality=
+#   GET /members/<id>
+#   GET /songs?q=&group=&lang=
+#   GET /stats                       快取 / 連線池統計（不快取）
+
+import argparse
+import base64
+import binascii
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from db_pool import DB_PATH, ConnectionPool
+from queries import (
+    COMPANIES_SQL,
+    COUNT_CAP,
+    GROUP_ORDERS,
+    GROUP_PROFILE_SQL,
+    GROUP_STATS_SQL,
+    GROUPS_SQL,
+    MEMBER_DETAIL_SQL,
+    NATIONALITIES_SQL,
+    PAGE_SIZE,
+    RELEASES_FOR_GROUP_SQL,
+    search_groups_sql,
+    search_members_sql,
+    search_songs_sql,
+)
+from replica import ReadReplica
+
+HOST = "127.0.0.1"
+PORT = 8502
+MAX_LIMIT = 200          # ?limit= 最多幾筆
+CACHE_ENTRIES = 2048     # 記憶體裡最多留幾個網址的回應（LRU）
+SQLITE_INT_MAX = 2**63 - 1  # SQLite 整數的範圍，超過的值綁進查詢會 OverflowError
+
+
+JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------------------------
+# 查詢參數
+# ---------------------------
+def arg(params: dict, name: str):
+    """單一查詢參數；沒給或空字串回傳 None"""
+    v = params.get(name, [""])[-1].strip()
+    return v or None
+
+
+def flag(params: dict, name: str) -> bool:
+    return arg(params, name) in ("1", "true", "yes")
+
+
+def page_limit(params: dict) -> int:
+    v = arg(params, "limit")
+    if v is None:
+        return PAGE_SIZE
+    if not v.isdigit() or not 1 <= int(v) <= MAX_LIMIT:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"limit 要是 1 ~ {MAX_LIMIT} 的整數")
+    return int(v)
+
+
+def encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(params: dict):
+    v = arg(params, "cursor")
+    if v is None:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(v + "=" * (-len(v) % 4)))
+    except (binascii.Error, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "cursor 格式錯誤") from None
+    if not isinstance(values, list) or not all(isinstance(x, (str, int, float, type(None))) for x in values):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "cursor 格式錯誤")
+    if any(isinstance(x, int) and not -SQLITE_INT_MAX - 1 <= x <= SQLITE_INT_MAX for x in values):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "cursor 格式錯誤")
+    return tuple(values)
+
+
+def path_id(m, what: str) -> int:
+    """網址裡的 id（路由已經限定是數字）；超過 SQLite 整數範圍的不可能存在，直接 404"""
+    v = int(m["id"])
+    if v > SQLITE_INT_MAX:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"找不到{what} {m['id']}")
+    return v
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match 可能是 *、一個或多個（逗號分隔、可能帶 W/ 前綴）ETag"""
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+# ---------------------------
+# 執行查詢
+# ---------------------------
+def fetch(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    cur = conn.execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur]
+
+
+def search_page(conn: sqlite3.Connection, build, params: dict, **filters) -> dict:
+    """
+    跟 app.py 的 search_page 一樣：limit + 1 筆判斷有沒有下一頁，排序欄位（_k*）當下一頁的 cursor。
+    ?count=1 時另外數總筆數（最多數到 COUNT_CAP）。
+    """
+    limit = page_limit(params)
+    try:
+        sql, args = build(after=decode_cursor(params), limit=limit + 1, **filters)
+    except ValueError as e:
+        # cursor 的值的個數跟這個查詢的排序欄位（_k*）對不上：被竄改或是別的查詢的 cursor
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"cursor 格式錯誤：{e}") from None
+    try:
+        rows = fetch(conn, sql, args)
+    except sqlite3.OperationalError as e:
+        # cursor 的值型別不對之類的
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"查詢失敗：{e}") from None
+
+    keys = [c for c in rows[0] if c.startswith("_k")] if rows else []
+    next_cursor = encode_cursor(rows[limit - 1][k] for k in keys) if len(rows) > limit else None
+    items = [{c: v for c, v in r.items() if not c.startswith("_k")} for r in rows[:limit]]
+
+    out = {"items": items, "limit": limit, "next_cursor": next_cursor}
+    if flag(params, "count"):
+        n = conn.execute(*build(count_cap=COUNT_CAP, **filters)).fetchone()[0]
+        out["total"] = min(n, COUNT_CAP)
+        out["total_capped"] = n > COUNT_CAP
+    return out
+
+
+# ---------------------------
+# 路由：(pattern, 依賴的表, handler(conn, match, params))
+# ---------------------------
+def lookup(sql):
+    return lambda conn, m, params: {"items": fetch(conn, sql)}
+
+
+def groups(conn, m, params):
+    order = arg(params, "order") or "name"
+    if order not in GROUP_ORDERS:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"order 只能是 {', '.join(GROUP_ORDERS)}")
+    return search_page(
+        conn, search_groups_sql, params,
+        q=arg(params, "q") or "",
+        company=arg(params, "company"),
+        without_company=flag(params, "without_company"),
+        order=order,
+    )
+
+
+def group_detail(conn, m, params):
+    group_id = path_id(m, "團體")
+    rows = fetch(conn, GROUP_PROFILE_SQL, (group_id,))
+    if not rows:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"找不到團體 {group_id}")
+    group = rows[0]
+    members = json.loads(group.pop("members_json"))
+    releases = json.loads(group.pop("releases_json"))
+    stats = fetch(conn, GROUP_STATS_SQL, (group_id,))
+    return {
+        "group": group,
+        "stats": stats[0] if stats else None,
+        "members": members,
+        "releases": releases,
+    }
+
+
+def group_releases(conn, m, params):
+    return {"items": fetch(conn, RELEASES_FOR_GROUP_SQL, (path_id(m, "團體"),))}
+
+
+def members(conn, m, params):
+    return search_page(
+        conn, search_members_sql, params,
+        q=arg(params, "q") or "",
+        group=arg(params, "group"),
+        nationality=arg(params, "nationality"),
+    )
+
+
+def member_detail(conn, m, params):
+    rows = fetch(conn, MEMBER_DETAIL_SQL, (path_id(m, "成員"),))
+    if not rows:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"找不到成員 {m['id']}")
+    return rows[0]
+
+
+def songs(conn, m, params):
+    return search_page(
+        conn, search_songs_sql, params,
+        q=arg(params, "q") or "",
+        group=arg(params, "group"),
+        lang=arg(params, "lang"),
+    )
+
+
+# 依賴的表跟 app.py 對應函式的 @cached_on 一致
+GROUP_TABLES = ("groups", "companies", "members", "member_nationalities", "releases", "songs")
+
+ROUTES = [
+    (r"/lookups/companies", ("companies",), lookup(COMPANIES_SQL)),
+    (r"/lookups/groups", ("groups", "companies"), lookup(GROUPS_SQL)),
+    (r"/lookups/nationalities", ("nationalities",), lookup(NATIONALITIES_SQL)),
+    (r"/groups", GROUP_TABLES, groups),
+    (r"/groups/(?P<id>\d+)", GROUP_TABLES, group_detail),
+    (r"/groups/(?P<id>\d+)/releases", ("releases",), group_releases),
+    (r"/members", GROUP_TABLES, members),
+    (r"/members/(?P<id>\d+)", GROUP_TABLES, member_detail),
+    (r"/songs", ("groups", "releases", "songs"), songs),
+]
+ROUTES = [(re.compile(p + r"/?"), tables, fn) for p, tables, fn in ROUTES]
+
+
+# ---------------------------
+# 服務本體（不依賴 http.server，方便直接呼叫）
+# ---------------------------
+class QueryService:
+    """
+    handle(path, query, if_none_match) -> (status, headers, body bytes)
+    thread-safe：連線由連線池 / 記憶體副本管理，回應快取有自己的 lock
+    """
+
+    def __init__(self, db_path=DB_PATH, replica: bool = False, cache_entries: int = CACHE_ENTRIES):
+        self.pool = ReadReplica(db_path) if replica else ConnectionPool(db_path)
+        self.cache_entries = cache_entries
+        # 版本號只在同一個資料庫檔裡遞增（init_db.py --wipe 重建會從 0 開始）：ETag 前面加上這次啟動的代號
+        self.etag_prefix = os.urandom(4).hex()
+        self._cache = OrderedDict()   # 網址 -> (etag, body)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "not_modified": 0, "cache_hits": 0, "queries": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    @staticmethod
+    def versions(conn: sqlite3.Connection, tables) -> tuple:
+        rows = dict(conn.execute(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({','.join('?' * len(tables))});",
+            tables,
+        ).fetchall())
+        return tuple(rows.get(t, 0) for t in tables)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._counters)
+            out["cached_urls"] = len(self._cache)
+        out["pool"] = self.pool.stats()
+        return out
+
+    def handle(self, path: str, query: str = "", if_none_match: str | None = None):
+        self._count("requests")
+        if path.rstrip("/") == "/stats":
+            return self._json(HTTPStatus.OK, self.stats(), {"Cache-Control": "no-store"})
+
+        for pattern, tables, fn in ROUTES:
+            m = pattern.fullmatch(path)
+            if m:
+                break
+        else:
+            return self._error(HTTPStatus.NOT_FOUND, f"沒有這個路徑：{path}")
+
+        params = parse_qs(query, keep_blank_values=True)
+        key = f"{path}?{query}"
+        try:
+            with self.pool.connection() as conn:
+                # 版本號跟資料在同一個讀取交易裡：不會拿舊版本號配新資料
+                conn.execute("BEGIN;")
+                try:
+                    etag = f'"{self.etag_prefix}-' + "-".join(map(str, self.versions(conn, tables))) + '"'
+                    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+                    if etag_matches(if_none_match, etag):
+                        self._count("not_modified")
+                        return HTTPStatus.NOT_MODIFIED, headers, b""
+
+                    with self._lock:
+                        hit = self._cache.get(key)
+                        if hit and hit[0] == etag:
+                            self._cache.move_to_end(key)
+                            self._counters["cache_hits"] += 1
+                            return HTTPStatus.OK, {**headers, **JSON_HEADERS}, hit[1]
+
+                    payload = fn(conn, m, params)
+                    self._count("queries")
+                finally:
+                    conn.rollback()
+        except ApiError as e:
+            return self._error(e.status, str(e))
+        except Exception as e:  # 查詢本身壞掉：回 500，server 繼續跑
+            return self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+
+        status, headers, body = self._json(HTTPStatus.OK, payload, headers)
+        with self._lock:
+            self._cache[key] = (etag, body)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return status, headers, body
+
+    def _json(self, status: HTTPStatus, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return status, {**(headers or {}), **JSON_HEADERS}, body
+
+    def _error(self, status: HTTPStatus, message: str):
+        self._count("errors")
+        return self._json(status, {"error": message}, {"Cache-Control": "no-store"})
+
+    def close(self) -> None:
+        if isinstance(self.pool, ReadReplica):
+            self.pool.close()
+        else:
+            self.pool.close_idle()
+
+
+# ---------------------------
+# HTTP
+# ---------------------------
+class Handler(BaseHTTPRequestHandler):
+    server_version = "kpop-api/1.0"
+    protocol_version = "HTTP/1.1"   # keep-alive：同一個 client 連續查不用每次重新連線
+    quiet = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, headers, body = self.server.service.handle(
+            url.path, url.query, self.headers.get("If-None-Match")
+        )
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 每個請求都寫一行 stderr 在高 QPS 下很貴：預設關掉，--verbose 才印
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: QueryService):
+        super().__init__(address, Handler)
+        self.service = service
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--replica", action="store_true", help="讀取走記憶體副本（replica.py）")
+    parser.add_argument("--verbose", action="store_true", help="每個請求印一行 log")
+    args = parser.parse_args()
+
+    if not DB_PATH.exists():
+        raise FileNotFoundError("找不到 kpop.db。請先執行：python init_db.py 以及 python import_from_csv.py --wipe")
+
+    Handler.quiet = not args.verbose
+    service = QueryService(DB_PATH, replica=args.replica)
+    server = ApiServer((args.host, args.port), service)
+    print(f"✅ JSON API：http://{args.host}:{args.port}/（Ctrl+C 結束）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,82 @@
-import re
+import functools
+import hmac
+import os
 import sqlite3
+import time
 from pathlib import Path
 import pandas as pd
 import streamlit.components.v1 as components
 import streamlit as st
 
+import image_manifest
+import image_store
+import youtube
+from db_pool import ConnectionPool
+from fuzzy import FuzzyIndex
+from queries import (
+    COMPANIES_SQL,
+    COUNT_CAP,
+    GROUP_PROFILE_SQL,
+    GROUP_STATS_SQL,
+    GROUPS_SQL,
+    MEMBER_DETAIL_SQL,
+    NATIONALITIES_SQL,
+    PAGE_SIZE,
+    RELEASES_FOR_GROUP_SQL,
+    SONGS_BY_VIDEO_SQL,
+    group_profile_from_df,
+    search_groups_sql,
+    search_members_sql,
+    search_songs_sql,
+    split_page,
+)
+from query_stats import QueryStats
+from replica import ReadReplica
+from thumbs import thumbnail, thumbnail_for
+
 DB_PATH = Path("kpop.db")
 
 # 你目前的 release_type
 RELEASE_TYPES = ["ALBUM", "EP", "SINGLE", "SINGLE_ALBUM"]
 RELEASE_LANGS = ["KR", "JP", "EN"]
 
-# 資料夾
-GROUP_IMG_DIR = Path("images/groups")
-MEMBER_IMG_DIR = Path("images/members")
+
+# 有設定才會出現管理者面板：網址加上 ?admin=<token> 才看得到（SQL 統計）
+ADMIN_TOKEN = os.environ.get("KPOP_ADMIN_TOKEN")
+
+# KPOP_READ_REPLICA=1：啟動時把 kpop.db 整份載進記憶體（replica.py），讀取都走記憶體，寫入照常寫磁碟
+READ_REPLICA = os.environ.get("KPOP_READ_REPLICA") == "1"
 
 # ---------------------------
 # DB Helpers
 # ---------------------------
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    # 整個 process 共用一個連線池（所有 session / rerun 都重用）
+    return ConnectionPool(DB_PATH)
+
+
+@st.cache_resource(show_spinner=False)
+def get_replica():
+    # 整個 process 共用一份記憶體副本；沒開 KPOP_READ_REPLICA 就是 None
+    return ReadReplica(DB_PATH) if READ_REPLICA else None
+
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys=ON;")
-    return conn
+    """
+    借一條讀取用的連線：用 with 區塊，結束時自動歸還。
+    有開記憶體副本就從副本借（寫入不要用這條，走 run_write）。
+    """
+    replica = get_replica()
+    if replica is not None:
+        return replica.connection()
+    return get_pool().connection()
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_stats():
+    # 整個 process 共用：所有 session 的 run_df / run_exec / run_many 都記在這裡
+    return QueryStats()
 
 
 def norm(v):
@@ -36,130 +91,287 @@ def norm(v):
 
 
 def run_df(sql: str, params=()):
-    conn = get_conn()
-    try:
+    with get_conn() as conn:
+        t0 = time.perf_counter()
         df = pd.read_sql_query(sql, conn, params=params)
+        get_query_stats().record(sql, time.perf_counter() - t0, len(df), conn, params)
         return df
-    finally:
-        conn.close()
+
+
+def run_write(fn, *args):
+    """
+    寫入交易：fn(conn, *args) 在 BEGIN IMMEDIATE 裡執行，成功 commit、失敗 rollback，
+    遇到 database is locked 會退避重試（見 db_pool.ConnectionPool.write）。
+    fn 可能跑不只一次，裡面只放 SQL，st.success 之類的放在外面。
+    有記憶體副本的話 commit 後標記副本過期：重載在背景跑，寫入不用等整份複製完，
+    下一次讀取才等它（看得到剛寫的東西；連續好幾筆寫入只重載一次）。
+    """
+    out = get_pool().write(fn, *args)
+    replica = get_replica()
+    if replica is not None:
+        replica.mark_stale()
+    return out
 
 
 def run_exec(sql: str, params=()):
-    conn = get_conn()
-    try:
-        cur = conn.execute(sql, params)
-        conn.commit()
-        return cur.rowcount
-    finally:
-        conn.close()
+    def execute(conn):
+        t0 = time.perf_counter()
+        n = conn.execute(sql, params).rowcount
+        get_query_stats().record(sql, time.perf_counter() - t0, n, conn, params)
+        return n
+
+    return run_write(execute)
 
 
 def run_many(sql: str, seq_params):
-    conn = get_conn()
-    try:
-        conn.executemany(sql, seq_params)
-        conn.commit()
-    finally:
-        conn.close()
+    seq_params = list(seq_params)  # 重試時要能再跑一次
+
+    def execute(conn):
+        t0 = time.perf_counter()
+        n = conn.executemany(sql, seq_params).rowcount
+        get_query_stats().record(sql, time.perf_counter() - t0, n, conn, seq_params[0] if seq_params else ())
+
+    run_write(execute)
 
 
-def clear_cache():
-    st.cache_data.clear()
+def table_versions(*tables) -> tuple:
+    """目前各表的版本號（init_db.py 的 trigger 在每次寫入時 +1）"""
+    with get_conn() as conn:
+        rows = dict(conn.execute(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({','.join('?' * len(tables))});",
+            tables,
+        ).fetchall())
+    return tuple(rows.get(t, 0) for t in tables)
+
+
+def cached_on(*tables):
+    """
+    跟 st.cache_data 一樣，但快取 key 另外帶上 tables 的版本號：
+    只有這幾張表有寫入時才重新查詢，不必整個 st.cache_data.clear()。
+    """
+    def deco(fn):
+        @st.cache_data(show_spinner=False)
+        @functools.wraps(fn)
+        def cached(versions, *args, **kwargs):
+            return fn(*args, **kwargs)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return cached(table_versions(*tables), *args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return deco
 
 
 def ensure_db():
     if not DB_PATH.exists():
         st.error("找不到 kpop.db。請先執行：python init_db.py 以及 python import_from_csv.py --wipe")
         st.stop()
+    with get_conn() as conn:
+        have = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('table_versions', 'member_search', 'images');"
+        )}
+    if len(have) < 3:
+        st.error("kpop.db 的結構是舊版，請先執行：python init_db.py（會保留資料、補上新的表與 trigger）")
+        st.stop()
+    optimize_db()
+
 
+@st.cache_resource(show_spinner=False)
+def optimize_db():
+    # 每個 process 一次：從沒 ANALYZE 過、或資料量變很多的表重新抽樣統計，查詢規劃才選得到對的索引
+    run_write(lambda conn: conn.execute("PRAGMA optimize=0x10002;"))
+    return True
 
-def safe_filename(name: str) -> str:
-    name = name.strip()
-    name = re.sub(r"[^\w\-一-龥]+", "_", name)  # 避免奇怪字元
-    return name
+
+def show_image(path: str, width: int):
+    """
+    顯示圖片：先查 images 清單表（image_manifest.py），已知壞掉的路徑不碰檔案系統；
+    有 hash 就直接用縮圖快取（thumbs.py），清單裡沒有的才現場讀檔。
+    """
+    info = get_image(path)
+    if info is None:
+        st.image(str(thumbnail(path, width) or path), width=width)
+    elif info["status"] != "ok":
+        st.caption(f"⚠️ 圖片讀取失敗：{path}")
+    else:
+        st.image(str(thumbnail_for(path, info["sha256"], width) or path), width=width)
 
 # ---------------------------
 # Cached Lookups
 # ---------------------------
-@st.cache_data(show_spinner=False)
+@cached_on("images")
+def get_image(path: str):
+    """images 清單表的一列（status / sha256 ...）；沒有收錄回傳 None"""
+    df = run_df("SELECT status, sha256 FROM images WHERE path = ?;", (image_manifest.normalize_path(path),))
+    return None if df.empty else df.iloc[0].to_dict()
+
+
+@cached_on("companies")
 def get_companies():
-    df = run_df(
-        """
-        SELECT company_id, company_name
-        FROM companies
-        ORDER BY company_name COLLATE NOCASE;
-        """
-    )
+    df = run_df(COMPANIES_SQL)
     return df
 
 
-@st.cache_data(show_spinner=False)
+@cached_on("groups", "companies")
 def get_groups():
-    df = run_df(
-        """
-        SELECT g.group_id, g.group_name, c.company_name, g.debut_date, g.fandom_name, g.image_path
-        FROM groups g
-        LEFT JOIN companies c ON g.company_id=c.company_id
-        ORDER BY g.group_name COLLATE NOCASE;
-        """
-    )
+    df = run_df(GROUPS_SQL)
     return df
 
 
-@st.cache_data(show_spinner=False)
+@cached_on("nationalities")
 def get_nationalities():
-    df = run_df(
-        """
-        SELECT nationality_code, nationality_name
-        FROM nationalities
-        ORDER BY nationality_code;
-        """
-    )
+    df = run_df(NATIONALITIES_SQL)
     return df
 
 
-@st.cache_data(show_spinner=False)
+@cached_on("releases")
 def get_releases_for_group(group_id: int):
-    df = run_df(
-        """
-        SELECT release_id, release_name, release_type, release_lang, release_date
-        FROM releases
-        WHERE group_id = ?
-        ORDER BY release_date, release_name COLLATE NOCASE;
-        """,
-        (group_id,),
-    )
+    df = run_df(RELEASES_FOR_GROUP_SQL, (group_id,))
     return df
 
 
+@cached_on("groups", "members", "releases", "songs")
+def get_group_stats(group_id: int):
+    """成員 / 發行 / 歌曲數與最早 / 最新發行日（group_stats，由 trigger 維護）；找不到回傳 None"""
+    df = run_df(GROUP_STATS_SQL, (group_id,))
+    if df.empty:
+        return None
+    return {k: (None if pd.isna(v) else v) for k, v in df.iloc[0].items()}
+
+
+# ---------------------------
+# Group profile（團體詳細頁一次載入）
+# ---------------------------
+# member_search 裡有成員的國籍，所以國籍相關的表也算
+@cached_on("groups", "companies", "members", "member_nationalities", "nationalities", "releases")
+def get_group_profile(group_id: int):
+    """
+    一個 SQL 拿齊團體詳細頁需要的東西：基本資料、成員（含國籍）、發行作品（計數見 get_group_stats）。
+    找不到團體回傳 None。
+    """
+    return group_profile_from_df(run_df(GROUP_PROFILE_SQL, (group_id,)))
+
+
+# ---------------------------
+# 搜尋結果分頁（keyset）
+# ---------------------------
+@cached_on("groups", "companies", "members", "member_nationalities", "releases", "songs")
+def count_rows(sql: str, params: tuple) -> int:
+    return int(run_df(sql, params).iloc[0, 0])
+
+
+def count_label(n: int) -> str:
+    return f"{COUNT_CAP}+" if n > COUNT_CAP else str(n)
+
+
+def search_page(state_key: str, build, **filters):
+    """
+    跑一頁搜尋結果。session_state[state_key] 是 cursor 堆疊：每一頁開始前的位置（第一頁為 None），
+    上一頁 / 下一頁只是 pop / push，SQL 用 (排序欄位, id) > cursor + LIMIT，不會把整個結果集讀出來。
+    回傳 (這一頁的 df, 總筆數（最多數到 COUNT_CAP + 1）, 下一頁的 cursor)
+    """
+    cursors = st.session_state.setdefault(state_key, [None])
+    sql, params = build(after=cursors[-1], limit=PAGE_SIZE + 1, **filters)
+    df, next_cursor = split_page(run_df(sql, params), PAGE_SIZE)
+
+    # 資料被刪到這一頁已經沒東西了：退回上一頁
+    if df.empty and len(cursors) > 1:
+        cursors.pop()
+        st.rerun()
+
+    total = count_rows(*build(count_cap=COUNT_CAP, **filters))
+    return df, total, next_cursor
+
+
+def pager(state_key: str, next_cursor):
+    """上一頁 / 下一頁按鈕（只有一頁時不顯示）"""
+    cursors = st.session_state[state_key]
+    if len(cursors) == 1 and next_cursor is None:
+        return
+
+    c1, c2, c3 = st.columns([1, 2, 1])
+    with c1:
+        if st.button("⬅️ 上一頁", key=f"{state_key}_prev", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with c2:
+        st.caption(f"第 {len(cursors)} 頁（每頁 {PAGE_SIZE} 筆）")
+    with c3:
+        if st.button("下一頁 ➡️", key=f"{state_key}_next", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
+
+# ---------------------------
+# 模糊搜尋（精確搜尋找不到東西時的備案）
+# ---------------------------
+@st.cache_resource(show_spinner=False)
+def get_fuzzy_index(kind: str):
+    # 每個 process 每種資料一個 trigram 索引（fuzzy.py），之後依 fuzzy_log 增量更新
+    return FuzzyIndex(kind)
+
+
+def fuzzy_page(kind: str, build, q: str, **filters) -> pd.DataFrame:
+    """
+    用 trigram 相似度找 q（容忍錯字 / 大小寫 / 重音 / 羅馬拼音寫法），候選再用 build 套一次篩選，
+    依相似度排序，最多 PAGE_SIZE 筆；多一欄 similarity。
+    """
+    index = get_fuzzy_index(kind)
+    with get_conn() as conn:
+        if index.seq is None:
+            with st.spinner("第一次使用，建立模糊搜尋索引中 ..."):
+                index.refresh(conn)
+        else:
+            index.refresh(conn)
+    hits = dict(index.search(q, limit=PAGE_SIZE * 5))
+    if not hits:
+        return pd.DataFrame()
+
+    df = run_df(*build(ids=list(hits), **filters))
+    df = df.drop(columns=[c for c in df.columns if c.startswith("_k")])
+    df["similarity"] = df.iloc[:, 0].map(hits)
+    return df.sort_values("similarity", ascending=False, kind="stable").head(PAGE_SIZE)
+
+
 # ---------------------------
 # YouTube helpers
 # ---------------------------
-_YT_RE = re.compile(r"(?:v=|youtu\.be/)([A-Za-z0-9_-]{6,})")
+@cached_on("songs", "releases", "groups")
+def get_songs_by_video(video_id: str):
+    return run_df(SONGS_BY_VIDEO_SQL, (video_id,))
 
-def extract_youtube_id(url: str | None):
-    if not url:
-        return None
-    m = _YT_RE.search(url)
-    return m.group(1) if m else None
-
-
-def show_youtube(url: str, width: int = 560, height: int = 315):
-    # 支援 youtu.be / watch?v= / embed
-    vid = None
-    if "youtu.be/" in url:
-        vid = url.split("youtu.be/")[-1].split("?")[0]
-    elif "watch?v=" in url:
-        vid = url.split("watch?v=")[-1].split("&")[0]
-    elif "/embed/" in url:
-        vid = url.split("/embed/")[-1].split("?")[0]
-
-    if not vid:
-        st.link_button("開啟 YouTube", url)
+
+def show_youtube(video_id, url=None, width: int = 560, height: int = 315):
+    """
+    點了才載入播放器：先放 YouTube 的預覽圖和播放按鈕，按下去才建 iframe（同一時間只有一個播放器）。
+    video_id 是 songs.youtube_video_id；認不出 id 的連結只給「開啟」按鈕。
+    """
+    if not isinstance(video_id, str):
+        if isinstance(url, str):
+            st.link_button("開啟 YouTube", url)
         return
 
-    embed_url = f"https://www.youtube.com/embed/{vid}"
-    components.iframe(embed_url, width=width, height=height)
+    if st.session_state.get("yt_playing") == video_id:
+        components.iframe(youtube.embed_url(video_id, autoplay=True), width=width, height=height)
+        return
+
+    st.image(youtube.thumbnail_url(video_id), width=width)
+    c1, c2 = st.columns(2)
+    if c1.button("▶️ 播放", key=f"yt_play_{video_id}"):
+        st.session_state["yt_playing"] = video_id
+        st.rerun()
+    c2.link_button("在 YouTube 開啟", youtube.watch_url(video_id))
+
+
+def same_video_songs(video_id, song_id=None) -> list:
+    """同一支影片的其他歌：["團名 — 歌名", ...]"""
+    if not isinstance(video_id, str):
+        return []
+    df = get_songs_by_video(video_id)
+    df = df[df["song_id"] != song_id]
+    return [f"{r.group_name} — {r.title}" for r in df.itertuples()]
 
 
 # ---------------------------
@@ -172,13 +384,17 @@ def page_search_groups():
     groups = get_groups()
 
     # ------- 搜尋條件（用 form：按 Enter / 按按鈕 才會觸發） -------
+    sort_opts = {"名稱": "name", "成員數": "members", "發行作品數": "releases", "歌曲數": "songs"}
+
     with st.form("group_search_form", clear_on_submit=False):
-        c1, c2 = st.columns([1.3, 1])
+        c1, c2, c3 = st.columns([1.3, 1, 0.7])
         with c1:
             q_in = st.text_input("團體名稱 group name", placeholder="")
         with c2:
             company_opts = ["全部"] + companies["company_name"].tolist() + ["其他"]
             company_pick = st.selectbox("進階搜尋：公司 company", company_opts, index=0)
+        with c3:
+            sort_pick = st.selectbox("排序 sort", list(sort_opts), index=0)
 
         submitted = st.form_submit_button("搜尋")
 
@@ -186,9 +402,11 @@ def page_search_groups():
     if submitted:
         st.session_state["groups_q"] = q_in.strip()
         st.session_state["groups_company_pick"] = company_pick
+        st.session_state["groups_sort"] = sort_opts[sort_pick]
 
-        # ✅ 重要：每次按 Enter 重新搜尋，就清掉之前選過的團
+        # ✅ 重要：每次按 Enter 重新搜尋，就清掉之前選過的團，並回到第一頁
         st.session_state.pop("selected_group_id", None)
+        st.session_state.pop("groups_page", None)
 
     # 初次進入頁面：還沒搜尋就先停在這裡（不顯示結果/筆數/詳細資訊）
     if "groups_q" not in st.session_state and "groups_company_pick" not in st.session_state:
@@ -198,22 +416,24 @@ def page_search_groups():
     # 取得目前要用的搜尋條件（從 session_state 讀）
     q = st.session_state.get("groups_q", "").strip()
     company_pick = st.session_state.get("groups_company_pick", "全部")
+    sort = st.session_state.get("groups_sort", "name")
 
 
-    # ------- 篩選 -------
-    df = groups.copy()
-
-    if company_pick == "其他":
-        df = df[df["company_name"].isna()]
-    elif company_pick != "全部":
-        df = df[df["company_name"] == company_pick]
-
-    if q:
-        df = df[df["group_name"].str.contains(q, case=False, na=False)]
-
-    df = df.sort_values("group_name", key=lambda s: s.str.lower())
+    # ------- 篩選（SQL；有關鍵字時走 groups_fts，依相關度排序；一次只查一頁） -------
+    filters = dict(
+        company=None if company_pick in ("全部", "其他") else company_pick,
+        without_company=company_pick == "其他",
+        order=sort,
+    )
+    df, total, next_cursor = search_page("groups_page", search_groups_sql, q=q, **filters)
 
-    st.caption(f"共找到 {len(df)} 個團體")
+    # 完全比對找不到：改用模糊搜尋（錯字、大小寫、羅馬拼音寫法不同）
+    if df.empty and q:
+        df = fuzzy_page("groups", search_groups_sql, q, **filters)
+    if "similarity" in df.columns:
+        st.caption(f"沒有完全符合「{q}」的團體，以下是名稱相近的 {len(df)} 個（模糊搜尋）")
+    else:
+        st.caption(f"共找到 {count_label(total)} 個團體")
     if df.empty:
         st.info("沒有符合條件的團體。")
         return
@@ -244,7 +464,9 @@ def page_search_groups():
             company_show = r.company_name if pd.notna(r.company_name) else "其他"
             debut_show = r.debut_date if pd.notna(r.debut_date) else ""
             st.caption(f"{company_show}" + (f" · {debut_show}" if debut_show else ""))
+            st.caption(f"👥 {r.member_count} · 🎵 {r.song_count}")
 
+    pager("groups_page", next_cursor)
     st.divider()
 
     # 一開始不顯示詳細資訊：只有點了團體才顯示
@@ -255,62 +477,39 @@ def page_search_groups():
     gid = int(st.session_state["selected_group_id"])
 
     # ---------- 團體詳細資訊 + quick stats ----------
-    gdetail = run_df(
-        """
-        SELECT g.group_id, g.group_name, c.company_name, g.debut_date, g.fandom_name, g.image_path
-        FROM groups g
-        LEFT JOIN companies c ON g.company_id=c.company_id
-        WHERE g.group_id=?;
-        """,
-        (gid,),
-    ).iloc[0]
+    profile = get_group_profile(gid)
+    if profile is None:
+        st.session_state.pop("selected_group_id", None)
+        st.info("此團體已不存在，請重新選擇。")
+        return
+    gdetail = profile["group"]
 
     st.subheader("ℹ️ 團體詳細資訊")
     left, right = st.columns([1.3, 1])
 
     with left:
-        img = norm(gdetail.get("image_path"))
+        img = gdetail["image_path"]
         if img:
-            st.image(img, width=220)
+            show_image(img, width=220)
         st.markdown(f"### {gdetail['group_name']}")
-        st.write("**公司：**", gdetail["company_name"] if pd.notna(gdetail["company_name"]) else "其他")
-        st.write("**出道日：**", gdetail["debut_date"] if pd.notna(gdetail["debut_date"]) else "（未填）")
-        st.write("**粉絲名：**", gdetail["fandom_name"] if pd.notna(gdetail["fandom_name"]) else "（未填）")
+        st.write("**公司：**", gdetail["company_name"] or "其他")
+        st.write("**出道日：**", gdetail["debut_date"] or "（未填）")
+        st.write("**粉絲名：**", gdetail["fandom_name"] or "（未填）")
 
     with right:
-        mem_cnt = run_df("SELECT COUNT(*) AS n FROM members WHERE group_id=?;", (gid,))["n"].iloc[0]
-        rel_cnt = run_df("SELECT COUNT(*) AS n FROM releases WHERE group_id=?;", (gid,))["n"].iloc[0]
-        song_cnt = run_df(
-            """
-            SELECT COUNT(*) AS n
-            FROM songs s
-            JOIN releases r ON s.release_id=r.release_id
-            WHERE r.group_id=?;
-            """,
-            (gid,),
-        )["n"].iloc[0]
-
-        st.metric("成員數", int(mem_cnt))
-        st.metric("發行作品數", int(rel_cnt))
-        st.metric("歌曲數", int(song_cnt))
+        stats = get_group_stats(gid) or {}
+        st.metric("成員數", stats.get("member_count", 0))
+        st.metric("發行作品數", stats.get("release_count", 0))
+        st.metric("歌曲數", stats.get("song_count", 0))
+        if stats.get("first_release_date"):
+            st.caption(f"📅 {stats['first_release_date']} ~ {stats['latest_release_date']}")
 
     st.divider()
 
     # ------- 成員列表（卡片網格：含 image_path） -------
     st.subheader("👥 成員列表")
 
-    mem = run_df(
-        """
-        SELECT m.member_id, m.stage_name, m.real_name, m.birth_date, m.image_path,
-               GROUP_CONCAT(mn.nationality_code, ',') AS nationalities
-        FROM members m
-        LEFT JOIN member_nationalities mn ON mn.member_id=m.member_id
-        WHERE m.group_id=?
-        GROUP BY m.member_id
-        ORDER BY m.stage_name COLLATE NOCASE;
-        """,
-        (gid,),
-    )
+    mem = profile["members"]
 
     if mem.empty:
         st.info("此團尚無成員資料。")
@@ -320,7 +519,7 @@ def page_search_groups():
             with mcols[i % 5]:
                 mimg = norm(getattr(row, "image_path", None))
                 if mimg:
-                    st.image(mimg, width=120)
+                    show_image(mimg, width=120)
                 else:
                     st.markdown(avatar_html(row.stage_name), unsafe_allow_html=True)
 
@@ -337,15 +536,7 @@ def page_search_groups():
     # ------- 發行作品總覽（原本保留） -------
     st.subheader("📦 發行作品（releases）")
 
-    rel = run_df(
-        """
-        SELECT release_name, release_type, release_lang, release_date
-        FROM releases
-        WHERE group_id=?
-        ORDER BY release_date DESC, release_name COLLATE NOCASE;
-        """,
-        (gid,),
-    )
+    rel = profile["releases"]
 
     if rel.empty:
         st.info("此團尚無發行作品。")
@@ -400,7 +591,7 @@ def page_search_members():
     with st.form("member_search_form", clear_on_submit=False):
         c1, c2, c3 = st.columns([1.4, 1, 1])
         with c1:
-            q_in = st.text_input("成員藝名 stage name", placeholder="")
+            q_in = st.text_input("成員藝名 / 本名 stage / real name", placeholder="")
         with c2:
             group_pick_in = st.selectbox("進階搜尋：團體 group", group_opts, index=0)
         with c3:
@@ -413,6 +604,7 @@ def page_search_members():
         st.session_state["members_group_pick"] = group_pick_in
         st.session_state["members_nat_pick"] = nat_pick_in
         st.session_state.pop("selected_member_id", None)  # 重新搜尋就清掉舊選取
+        st.session_state.pop("members_page", None)
 
     # 初次進入：不顯示任何結果
     if "members_q" not in st.session_state and "members_group_pick" not in st.session_state and "members_nat_pick" not in st.session_state:
@@ -423,40 +615,20 @@ def page_search_members():
     group_pick = st.session_state.get("members_group_pick", "全部")
     nat_pick = st.session_state.get("members_nat_pick", "全部")
 
-    # ---- 2) 查詢：stage_name + 進階篩選（團體 / 國籍）----
-    sql = """
-    SELECT
-      m.member_id,
-      m.stage_name,
-      g.group_name
-    FROM members m
-    JOIN groups g ON m.group_id = g.group_id
-    WHERE 1=1
-    """
-    params = []
-
-    if q:
-        sql += " AND m.stage_name LIKE ? "
-        params.append(f"%{q}%")
-
-    if group_pick != "全部":
-        sql += " AND g.group_name = ? "
-        params.append(group_pick)
-
-    if nat_pick != "全部":
-        sql += """
-        AND EXISTS (
-          SELECT 1 FROM member_nationalities mn2
-          WHERE mn2.member_id = m.member_id AND mn2.nationality_code = ?
-        )
-        """
-        params.append(nat_pick)
-
-    sql += " ORDER BY g.group_name COLLATE NOCASE, m.stage_name COLLATE NOCASE; "
-
-    df = run_df(sql, tuple(params))
+    # ---- 2) 查詢：藝名/本名（members_fts）+ 進階篩選（團體 / 國籍）----
+    filters = dict(
+        group=None if group_pick == "全部" else group_pick,
+        nationality=None if nat_pick == "全部" else nat_pick,
+    )
+    df, total, next_cursor = search_page("members_page", search_members_sql, q=q, **filters)
 
-    st.caption(f"共找到 {len(df)} 位成員")
+    # 完全比對找不到：改用模糊搜尋（Chayeong ~ Chaeyoung、rosé ~ Rose）
+    if df.empty and q:
+        df = fuzzy_page("members", search_members_sql, q, **filters)
+    if "similarity" in df.columns:
+        st.caption(f"沒有完全符合「{q}」的成員，以下是名字相近的 {len(df)} 位（模糊搜尋）")
+    else:
+        st.caption(f"共找到 {count_label(total)} 位成員")
     if df.empty:
         st.info("沒有符合條件的成員。")
         return
@@ -470,6 +642,7 @@ def page_search_members():
             if st.button(r.stage_name, key=f"member_btn_{r.member_id}", use_container_width=True):
                 st.session_state["selected_member_id"] = int(r.member_id)
 
+    pager("members_page", next_cursor)
     st.divider()
 
     # ---- 4) 未點選前，不顯示詳細資訊 ----
@@ -480,26 +653,12 @@ def page_search_members():
     mid = int(st.session_state["selected_member_id"])
 
     # ---- 5) 詳細資訊（圖片左 / 資訊右）----
-    detail = run_df(
-        """
-        SELECT
-          m.member_id,
-          m.stage_name,
-          m.real_name,
-          m.birth_date,
-          m.image_path,
-          g.group_name,
-          c.company_name,
-          GROUP_CONCAT(mn.nationality_code, ',') AS nationalities
-        FROM members m
-        JOIN groups g ON m.group_id = g.group_id
-        LEFT JOIN companies c ON g.company_id = c.company_id
-        LEFT JOIN member_nationalities mn ON mn.member_id = m.member_id
-        WHERE m.member_id = ?
-        GROUP BY m.member_id;
-        """,
-        (mid,),
-    ).iloc[0]
+    detail_df = run_df(MEMBER_DETAIL_SQL, (mid,))
+    if detail_df.empty:  # 搜尋結果顯示之後才被刪掉（app 其他分頁、匯入）
+        st.session_state.pop("selected_member_id", None)
+        st.info("此成員已不存在，請重新選擇。")
+        return
+    detail = detail_df.iloc[0]
 
     st.subheader("ℹ️ 成員資訊")
 
@@ -509,7 +668,7 @@ def page_search_members():
         img = norm(detail.get("image_path"))
         if img:
             try:
-                st.image(img, width=260)
+                show_image(img, width=260)
             except Exception:
                 st.caption(f"⚠️ 圖片讀取失敗：{img}")
         else:
@@ -550,6 +709,7 @@ def page_search_songs():
         st.session_state["songs_group_pick"] = group_pick_in
         st.session_state["songs_lang_pick"] = lang_pick_in
         st.session_state.pop("selected_song_id", None)  # 重新搜尋就清掉舊選取
+        st.session_state.pop("songs_page", None)
 
     # 初次進入：不顯示任何結果
     if "songs_q" not in st.session_state:
@@ -560,46 +720,27 @@ def page_search_songs():
     group_pick = st.session_state.get("songs_group_pick", "全部")
     lang_pick = st.session_state.get("songs_lang_pick", "全部")
 
-    sql = """
-    SELECT
-      s.song_id,
-      g.group_name,
-      r.release_name,
-      r.release_type,
-      r.release_lang,
-      r.release_date,
-      s.title,
-      s.youtube_url
-    FROM songs s
-    JOIN releases r ON s.release_id = r.release_id
-    JOIN groups g ON r.group_id = g.group_id
-    WHERE 1=1
-    """
-    params = []
-
-    if q:
-        sql += " AND s.title LIKE ? "
-        params.append(f"%{q}%")
-
-    # 保留進階：團體
-    if group_pick != "全部":
-        sql += " AND g.group_name = ? "
-        params.append(group_pick)
-
-    # 保留進階：語言
-    if lang_pick != "全部":
-        sql += " AND r.release_lang = ? "
-        params.append(lang_pick)
-
-    sql += " ORDER BY g.group_name COLLATE NOCASE, r.release_date, s.title COLLATE NOCASE; "
+    # 歌名：songs_fts，依相關度排序；保留進階：團體 / 語言
+    filters = dict(
+        group=None if group_pick == "全部" else group_pick,
+        lang=None if lang_pick == "全部" else lang_pick,
+    )
+    df, total, next_cursor = search_page("songs_page", search_songs_sql, q=q, **filters)
 
-    df = run_df(sql, tuple(params))
-    st.write(f"共找到 **{len(df)}** 首歌")
+    # 完全比對找不到：改用模糊搜尋
+    if df.empty and q:
+        df = fuzzy_page("songs", search_songs_sql, q, **filters)
+    if "similarity" in df.columns:
+        st.write(f"沒有完全符合「{q}」的歌，以下是歌名相近的 **{len(df)}** 首（模糊搜尋）")
+    else:
+        st.write(f"共找到 **{count_label(total)}** 首歌")
     if df.empty:
         st.info("沒有符合條件的歌曲。")
         return
 
-    # ---- 2) 選一首歌顯示細節 + 內嵌YT ----
+    pager("songs_page", next_cursor)
+
+    # ---- 2) 選一首歌顯示細節 + 內嵌YT（選單只列這一頁的歌） ----
     labels = []
     id_by_label = {}
     for row in df.itertuples():
@@ -620,7 +761,10 @@ def page_search_songs():
     with left:
         st.subheader("▶️ YouTube")
         if pd.notna(one["youtube_url"]):
-            show_youtube(one["youtube_url"], width=760, height=428)  # 16:9
+            show_youtube(one["youtube_video_id"], one["youtube_url"], width=760, height=428)  # 16:9
+            dup = same_video_songs(one["youtube_video_id"], int(one["song_id"]))
+            if dup:
+                st.caption("🔁 同一支影片也用在：" + "、".join(dup))
         else:
             st.caption("（此歌曲沒有 YouTube 連結）")
 
@@ -672,26 +816,18 @@ def page_add_group():
     else:
         company_name = company_pick
 
-    # ---- 存圖片到資料夾，拿到 image_path ----
+    # ---- 存進圖片庫（image_store.py：依內容命名，同一張圖只存一份），拿到 image_path ----
     image_path = None
     if img is not None:
-        GROUP_IMG_DIR.mkdir(parents=True, exist_ok=True)
-
-        ext = Path(img.name).suffix.lower()
-        base = safe_filename(group_name)
-        save_path = GROUP_IMG_DIR / f"{base}{ext}"
-
-        i = 1
-        while save_path.exists():
-            save_path = GROUP_IMG_DIR / f"{base}_{i}{ext}"
-            i += 1
-
-        save_path.write_bytes(img.getvalue())
-        image_path = save_path.as_posix()
+        try:
+            image_path = image_store.put(img.getvalue())
+        except ValueError as e:
+            st.error(f"圖片無法使用：{e}")
+            return
 
-    try:
+    def insert_group(conn):
         # 不用再 INSERT companies，因為你只能選既有公司
-        run_exec(
+        conn.execute(
             """
             INSERT INTO groups (company_id, group_name, debut_date, fandom_name, image_path)
             VALUES (
@@ -701,8 +837,12 @@ def page_add_group():
             """,
             (company_name, group_name, norm(debut_date), norm(fandom_name), norm(image_path)),
         )
+        # 新照片直接登記到圖片清單（同一個交易：團體跟圖片清單要嘛都寫進去、要嘛都沒有）
+        if image_path:
+            image_manifest.record(conn, image_path)
 
-        clear_cache()
+    try:
+        run_write(insert_group)
         st.success("✅ 新增團體成功")
     except sqlite3.IntegrityError as e:
         st.error(f"新增失敗（可能團名重複）：{e}")
@@ -741,25 +881,16 @@ def page_add_member():
 
     gid = int(groups.loc[groups["group_name"] == group_pick, "group_id"].iloc[0])
 
-    # ---- 存照片到資料夾，拿到 image_path ----
+    # ---- 存進圖片庫（image_store.py），拿到 image_path ----
     image_path = None
     if img is not None:
-        MEMBER_IMG_DIR.mkdir(parents=True, exist_ok=True)
-
-        ext = Path(img.name).suffix.lower()
-        base = safe_filename(f"{group_pick}_{stage_name}")  # 避免不同團同名
-        save_path = MEMBER_IMG_DIR / f"{base}{ext}"
-
-        i = 1
-        while save_path.exists():
-            save_path = MEMBER_IMG_DIR / f"{base}_{i}{ext}"
-            i += 1
-
-        save_path.write_bytes(img.getvalue())
-        image_path = save_path.as_posix()  # 存相對路徑
+        try:
+            image_path = image_store.put(img.getvalue())
+        except ValueError as e:
+            st.error(f"圖片無法使用：{e}")
+            return
 
-    conn = get_conn()
-    try:
+    def insert_member(conn):
         cur = conn.execute(
             """
             INSERT INTO members (group_id, stage_name, real_name, birth_date, image_path)
@@ -779,14 +910,15 @@ def page_add_member():
                 [(member_id, code) for code in nat_pick],
             )
 
-        conn.commit()
-        clear_cache()
+        # 新照片直接登記到圖片清單
+        if image_path:
+            image_manifest.record(conn, image_path)
+
+    try:
+        run_write(insert_member)
         st.success("✅ 新增成員成功")
     except sqlite3.IntegrityError as e:
-        conn.rollback()
         st.error(f"新增失敗（可能同團藝名重複或外鍵問題）：{e}")
-    finally:
-        conn.close()
 
 
 def page_add_release():
@@ -823,7 +955,6 @@ def page_add_release():
             """,
             (gid, new_name, new_type, new_lang, norm(new_date)),
         )
-        clear_cache()
         st.success("✅ 新增 release 成功")
     except sqlite3.IntegrityError as e:
         st.error(f"新增失敗（可能 UNIQUE 或 CHECK 不符合）：{e}")
@@ -867,18 +998,26 @@ def page_add_song():
         st.error("title 不能空白")
         return
 
+    youtube_url = norm(youtube_url)
+    video_id = youtube.video_id(youtube_url)
+    dup = same_video_songs(video_id)  # 新增之前就已經在用這支影片的歌
     try:
         run_exec(
             """
-            INSERT INTO songs (release_id, title, youtube_url)
-            VALUES (?, ?, ?);
+            INSERT INTO songs (release_id, title, youtube_url, youtube_video_id)
+            VALUES (?, ?, ?, ?);
             """,
-            (release_id, title, norm(youtube_url)),
+            (release_id, title, youtube_url, video_id),
         )
-        clear_cache()
         st.success("✅ 新增歌曲成功")
     except sqlite3.IntegrityError as e:
         st.error(f"新增失敗：{e}")
+        return
+
+    if youtube_url and video_id is None:
+        st.warning("⚠️ 認不出這個連結的 YouTube 影片 id，歌曲頁只會顯示外部連結。")
+    if dup:
+        st.warning("⚠️ 這支影片也用在：" + "、".join(dup))
 
 
 # ---------------------------
@@ -920,7 +1059,6 @@ def page_modify():
                     """,
                     (company_name, norm(founder), norm(founded_date), int(row["company_id"])),
                 )
-                clear_cache()
                 st.success("✅ 更新成功")
             except sqlite3.IntegrityError as e:
                 st.error(f"更新失敗：{e}")
@@ -966,7 +1104,6 @@ def page_modify():
                     """,
                     (company_name, group_name, norm(debut_date), norm(fandom_name), int(row["group_id"])),
                 )
-                clear_cache()
                 st.success("✅ 更新成功")
             except sqlite3.IntegrityError as e:
                 st.error(f"更新失敗：{e}")
@@ -1015,8 +1152,7 @@ def page_modify():
             submit = st.form_submit_button("更新")
 
         if submit:
-            conn = get_conn()
-            try:
+            def update_member(conn):
                 conn.execute(
                     """
                     UPDATE members
@@ -1034,14 +1170,11 @@ def page_modify():
                         [(member_id, code) for code in nat_pick],
                     )
 
-                conn.commit()
-                clear_cache()
+            try:
+                run_write(update_member)
                 st.success("✅ 更新成功")
             except sqlite3.IntegrityError as e:
-                conn.rollback()
                 st.error(f"更新失敗：{e}")
-            finally:
-                conn.close()
 
     elif mode.startswith("發行作品"):
         groups = get_groups()
@@ -1084,7 +1217,6 @@ def page_modify():
                         """,
                         (release_name, release_type, release_lang, norm(release_date), rid),
                     )
-                    clear_cache()
                     st.success("✅ 更新成功")
                 except sqlite3.IntegrityError as e:
                     st.error(f"更新失敗（可能 UNIQUE 或 CHECK 不符合）：{e}")
@@ -1115,7 +1247,7 @@ def page_modify():
 
         songs = run_df(
             """
-            SELECT song_id, title, youtube_url
+            SELECT song_id, title, youtube_url, youtube_video_id
             FROM songs
             WHERE release_id=?
             ORDER BY title COLLATE NOCASE;
@@ -1137,16 +1269,16 @@ def page_modify():
             submit = st.form_submit_button("更新")
 
         if submit:
+            youtube_url = norm(youtube_url)
             try:
                 run_exec(
                     """
                     UPDATE songs
-                    SET title=?, youtube_url=?
+                    SET title=?, youtube_url=?, youtube_video_id=?
                     WHERE song_id=?;
                     """,
-                    (title, norm(youtube_url), sid),
+                    (title, youtube_url, youtube.video_id(youtube_url), sid),
                 )
-                clear_cache()
                 st.success("✅ 更新成功")
             except sqlite3.IntegrityError as e:
                 st.error(f"更新失敗：{e}")
@@ -1154,7 +1286,10 @@ def page_modify():
         if pd.notna(srow["youtube_url"]):
             st.divider()
             st.subheader("▶️ 目前影片預覽")
-            show_youtube(srow["youtube_url"])
+            show_youtube(srow["youtube_video_id"], srow["youtube_url"])
+            dup = same_video_songs(srow["youtube_video_id"], sid)
+            if dup:
+                st.caption("🔁 同一支影片也用在：" + "、".join(dup))
 
 
 # ---------------------------
@@ -1200,19 +1335,16 @@ def page_delete():
 
         st.warning("⚠️ 刪除後無法復原。")
         if st.button("確認刪除成員", type="primary"):
-            conn = get_conn()
-            try:
+            def delete_member(conn):
                 # 先刪關聯表，避免外鍵限制
                 conn.execute("DELETE FROM member_nationalities WHERE member_id=?;", (mid,))
                 conn.execute("DELETE FROM members WHERE member_id=?;", (mid,))
-                conn.commit()
-                clear_cache()
+
+            try:
+                run_write(delete_member)
                 st.success("✅ 已刪除成員")
             except sqlite3.IntegrityError as e:
-                conn.rollback()
                 st.error(f"刪除失敗：{e}")
-            finally:
-                conn.close()
 
     # -------------------------
     # 刪除：歌曲
@@ -1260,7 +1392,6 @@ def page_delete():
         if st.button("確認刪除歌曲", type="primary"):
             try:
                 run_exec("DELETE FROM songs WHERE song_id=?;", (sid,))
-                clear_cache()
                 st.success("✅ 已刪除歌曲")
             except sqlite3.IntegrityError as e:
                 st.error(f"刪除失敗：{e}")
@@ -1293,19 +1424,16 @@ def page_delete():
 
         st.warning("⚠️ 刪除該發行作品 release 會一併刪除該 release 底下的所有歌曲（songs）。")
         if st.button("確認刪除發行作品", type="primary"):
-            conn = get_conn()
-            try:
+            def delete_release(conn):
                 # 若 DB 沒設 CASCADE，手動先刪 songs
                 conn.execute("DELETE FROM songs WHERE release_id=?;", (rid,))
                 conn.execute("DELETE FROM releases WHERE release_id=?;", (rid,))
-                conn.commit()
-                clear_cache()
+
+            try:
+                run_write(delete_release)
                 st.success("✅ 已刪除發行作品")
             except sqlite3.IntegrityError as e:
-                conn.rollback()
                 st.error(f"刪除失敗：{e}")
-            finally:
-                conn.close()
 
     # -------------------------
     # 刪除：團體（會連帶 members / releases / songs / member_nationalities）
@@ -1321,12 +1449,15 @@ def page_delete():
 
         st.warning("⚠️ 刪除團體 group 會一併刪除：該團成員、發行作品、歌曲。不可復原。")
         if st.button("確認刪除團體", type="primary"):
-            conn = get_conn()
-            try:
-                # 1) 刪 member_nationalities（先找出該團所有 member_id）
-                mids = run_df("SELECT member_id FROM members WHERE group_id=?;", (gid,))["member_id"].tolist()
-                if mids:
-                    conn.executemany("DELETE FROM member_nationalities WHERE member_id=?;", [(int(x),) for x in mids])
+            def delete_group(conn):
+                # 1) 刪 member_nationalities（該團所有成員）
+                conn.execute(
+                    """
+                    DELETE FROM member_nationalities
+                    WHERE member_id IN (SELECT member_id FROM members WHERE group_id=?);
+                    """,
+                    (gid,),
+                )
 
                 # 2) 刪 songs（透過 releases）
                 conn.execute(
@@ -1342,14 +1473,58 @@ def page_delete():
                 conn.execute("DELETE FROM members WHERE group_id=?;", (gid,))
                 conn.execute("DELETE FROM groups WHERE group_id=?;", (gid,))
 
-                conn.commit()
-                clear_cache()
+            try:
+                run_write(delete_group)
                 st.success("✅ 已刪除團體（含關聯資料）")
             except sqlite3.IntegrityError as e:
-                conn.rollback()
                 st.error(f"刪除失敗：{e}")
-            finally:
-                conn.close()
+
+
+# ---------------------------
+# 管理者：SQL 統計
+# ---------------------------
+def is_admin() -> bool:
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(st.query_params.get("admin", ""), ADMIN_TOKEN)
+
+
+def sql_stats_panel():
+    qs = get_query_stats()
+    snap = qs.snapshot()
+
+    with st.expander(f"📈 SQL 統計（{len(snap)} 種查詢）"):
+        st.caption(f"自 {qs.started_at:%Y-%m-%d %H:%M:%S} UTC 起；依總耗時排序，⚠️ 表示有整張表掃描")
+        if not snap:
+            st.info("還沒有任何查詢。")
+            return
+
+        table = pd.DataFrame(snap)
+        table["scan"] = table["full_scan"].map(lambda t: "⚠️ " + ", ".join(t) if t else "")
+        st.dataframe(
+            table[["total_ms", "calls", "p50_ms", "p99_ms", "rows_per_call", "scan", "sql"]],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        labels = [f"{i + 1}. {r['sql'][:60]}" for i, r in enumerate(snap)]
+        pick = st.selectbox("查看 query plan", range(len(snap)), format_func=lambda i: labels[i])
+        st.code(snap[pick]["sql"], language="sql")
+        st.code("\n".join(snap[pick]["plan"]) or "（尚未取得）")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button(
+                "匯出 JSON",
+                qs.to_json(),
+                file_name=f"sql_stats_{time.strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+                use_container_width=True,
+            )
+        with c2:
+            if st.button("清除統計", use_container_width=True):
+                qs.reset()
+                st.rerun()
 
 
 # ---------------------------
@@ -1379,6 +1554,16 @@ def main():
             ],
     )
 
+        with st.expander("🔌 連線池 / 寫入競爭"):
+            st.json(get_pool().stats())
+
+        if get_replica() is not None:
+            with st.expander("🧠 記憶體副本"):
+                st.json(get_replica().stats())
+
+        if is_admin():
+            sql_stats_panel()
+
 
     if page == "🔎 搜尋團體":
         page_search_groups()
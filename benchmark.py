@@ -0,0 +1,285 @@
+# benchmark.py
+# 擴充性基準測試：用 gen_catalog.py 的假資料跑匯入、搜尋、詳細頁查詢，記錄時間與記憶體高峰
+# 結果寫成 JSON（方便存檔比較）；給 --baseline 會跟舊報告比，變慢超過門檻就回傳非 0
+#
+# 用法：
+#   python benchmark.py --preset small
+#   python benchmark.py --preset medium --repeat 30 --out bench_medium.json --baseline bench_medium_old.json
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+import gen_catalog
+import import_from_csv
+import init_db
+from db_pool import ConnectionPool
+from queries import (
+    COMPANIES_SQL,
+    COUNT_CAP,
+    GROUP_PROFILE_SQL,
+    GROUPS_SQL,
+    MEMBER_DETAIL_SQL,
+    NATIONALITIES_SQL,
+    PAGE_SIZE,
+    RELEASES_FOR_GROUP_SQL,
+    search_groups_sql,
+    search_members_sql,
+    search_songs_sql,
+)
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource
+    resource = None
+
+WORK_DIR = Path("bench_work")
+
+# True：用 tracemalloc 量每一步自己的記憶體高峰（準，但 pandas 會慢好幾倍，時間不能拿來比）
+# False：用 process 的 RSS 高水位（幾乎沒有額外負擔，但只會一路往上）
+TRACE_MEM = False
+
+
+def memory_peak() -> int:
+    if TRACE_MEM:
+        return tracemalloc.get_traced_memory()[1]
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Linux 單位是 KB
+
+
+def measure(fn):
+    """跑一次 fn，回傳 (結果, 秒數, 記憶體高峰 bytes)"""
+    if TRACE_MEM:
+        tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    return out, dt, memory_peak()
+
+
+def summarize(name: str, kind: str, times: list, peak: int, rows=None) -> dict:
+    times = sorted(times)
+    return {
+        "name": name,
+        "kind": kind,
+        "repeat": len(times),
+        "rows": rows,
+        "seconds": {
+            "min": times[0],
+            "median": statistics.median(times),
+            "p95": times[min(len(times) - 1, int(len(times) * 0.95))],
+            "total": sum(times),
+        },
+        "peak_mem_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+# ---------------------------
+# 匯入
+# ---------------------------
+def bench_import(data_dir: Path, db_path: Path) -> list:
+    if db_path.exists():
+        db_path.unlink()
+    init_db.DB_PATH = db_path
+    init_db.init_db()
+
+    import_from_csv.DATA_DIR = data_dir
+    import_from_csv.DB_PATH = db_path
+    results = []
+
+    conn = import_from_csv.connect()
+    try:
+        timings, dt, peak = measure(lambda: import_from_csv.run_import(conn, wipe=False))
+        total_rows = sum(n for _, n, _ in timings)
+        results.append(summarize("import_full", "import", [dt], peak, total_rows))
+        for name, n, t in timings:
+            results.append(summarize(f"import_full.{name}", "import", [t], peak, n))
+
+        _, dt, peak = measure(lambda: import_from_csv.run_incremental(conn))
+        results.append(summarize("import_incremental_noop", "import", [dt], peak, 0))
+    finally:
+        conn.close()
+    return results
+
+
+# ---------------------------
+# 查詢（跟 app 用同一套 SQL / 連線池）
+# ---------------------------
+def query_cases(seed: int, sizes: dict, rng: random.Random) -> list:
+    """(名稱, kind, [(sql, params), ...])；參數每次不同，避免只量到同一個熱點"""
+    def rand(n):
+        return rng.randrange(n)
+
+    def pick(fn, n):
+        return [fn() for _ in range(n)]
+
+    # 用假資料的命名規則挑一定搜得到的關鍵字
+    def group_q():
+        return gen_catalog.group_name(seed, rand(sizes["groups"]))[:4]
+
+    def member_q():
+        return gen_catalog.stage_name(seed, rand(sizes["members"]))[:4]
+
+    def song_q():
+        return gen_catalog.word(seed, rand(sizes["songs"]), 13, 3)[:5]
+
+    def some_group():
+        return gen_catalog.group_name(seed, rand(sizes["groups"]))
+
+    n = 8
+    return [
+        ("lookup.companies", "lookup", [(COMPANIES_SQL, ())]),
+        ("lookup.groups", "lookup", [(GROUPS_SQL, ())]),
+        ("lookup.nationalities", "lookup", [(NATIONALITIES_SQL, ())]),
+        ("lookup.releases_for_group", "lookup",
+         pick(lambda: (RELEASES_FOR_GROUP_SQL, (rand(sizes["groups"]) + 1,)), n)),
+
+        ("search.groups.fts", "search", pick(lambda: search_groups_sql(group_q()), n)),
+        ("search.groups.short_like", "search", pick(lambda: search_groups_sql(group_q()[:2]), n)),
+        ("search.groups.company", "search",
+         pick(lambda: search_groups_sql("", company=gen_catalog.company_name(seed, rand(sizes["companies"]))), n)),
+        ("search.groups.all", "search", [search_groups_sql("")]),
+
+        ("search.members.fts", "search", pick(lambda: search_members_sql(member_q()), n)),
+        ("search.members.short_like", "search", pick(lambda: search_members_sql(member_q()[:2]), n)),
+        ("search.members.group", "search", pick(lambda: search_members_sql("", group=some_group()), n)),
+        ("search.members.nationality", "search", [search_members_sql("", nationality="JP")]),
+
+        ("search.songs.fts", "search", pick(lambda: search_songs_sql(song_q()), n)),
+        ("search.songs.group_lang", "search", pick(lambda: search_songs_sql("", group=some_group(), lang="KR"), n)),
+
+        # app 實際跑的是分頁（keyset，一頁 PAGE_SIZE 筆）+ 有上限的筆數
+        ("page.groups.all", "page", [search_groups_sql("", limit=PAGE_SIZE + 1)]),
+        ("page.groups.by_songs", "page", [search_groups_sql("", order="songs", limit=PAGE_SIZE + 1)]),
+        ("page.members.all", "page", [search_members_sql("", limit=PAGE_SIZE + 1)]),
+        ("page.songs.all", "page", [search_songs_sql("", limit=PAGE_SIZE + 1)]),
+        ("page.songs.fts", "page", pick(lambda: search_songs_sql(song_q(), limit=PAGE_SIZE + 1), n)),
+        ("count.members.all", "page", [search_members_sql("", count_cap=COUNT_CAP)]),
+        ("count.songs.all", "page", [search_songs_sql("", count_cap=COUNT_CAP)]),
+
+        ("detail.group_profile", "detail", pick(lambda: (GROUP_PROFILE_SQL, (rand(sizes["groups"]) + 1,)), n)),
+        ("detail.member", "detail", pick(lambda: (MEMBER_DETAIL_SQL, (rand(sizes["members"]) + 1,)), n)),
+    ]
+
+
+def bench_queries(db_path: Path, seed: int, sizes: dict, repeat: int) -> list:
+    pool = ConnectionPool(db_path)
+    rng = random.Random(seed)
+    results = []
+    try:
+        for name, kind, variants in query_cases(seed, sizes, rng):
+            times, peak, rows = [], 0, []
+            for i in range(repeat):
+                sql, params = variants[i % len(variants)]
+                with pool.connection() as conn:
+                    df, dt, p = measure(lambda: pd.read_sql_query(sql, conn, params=params))
+                times.append(dt)
+                peak = max(peak, p)
+                rows.append(len(df))
+            results.append(summarize(name, kind, times, peak, int(statistics.median(rows))))
+    finally:
+        pool.close_idle()
+    return results
+
+
+# ---------------------------
+# 報告
+# ---------------------------
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """回傳變慢超過 threshold（比例）的項目；用 median 比"""
+    old = {r["name"]: r for r in baseline.get("results", [])}
+    slower = []
+    for r in report["results"]:
+        b = old.get(r["name"])
+        if not b or b["seconds"]["median"] <= 0:
+            continue
+        ratio = r["seconds"]["median"] / b["seconds"]["median"]
+        if ratio > 1 + threshold:
+            slower.append((r["name"], b["seconds"]["median"], r["seconds"]["median"], ratio))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    gen_catalog.add_size_args(parser)
+    parser.add_argument("--data", type=Path, help="假資料目錄（預設 bench_data/<preset>，不存在就先產生）")
+    parser.add_argument("--repeat", type=int, default=20, help="每個查詢跑幾次")
+    parser.add_argument("--out", type=Path, default=Path("bench_report.json"))
+    parser.add_argument("--baseline", type=Path, help="上一次的報告，用來比較是否變慢")
+    parser.add_argument("--threshold", type=float, default=0.25, help="median 變慢超過這個比例就算退步（預設 25%%）")
+    parser.add_argument("--skip-import", action="store_true", help="沿用 bench_work/ 裡上次匯入好的資料庫")
+    parser.add_argument("--trace-mem", action="store_true", help="用 tracemalloc 量每一步的記憶體（較準但會變慢）")
+    args = parser.parse_args()
+
+    global TRACE_MEM
+    TRACE_MEM = args.trace_mem
+
+    sizes = gen_catalog.sizes_from_args(args)
+    data_dir = args.data or Path("bench_data") / args.preset
+    if not (data_dir / import_from_csv.CSV_FILES["songs"]).exists():
+        print(f"產生假資料：{data_dir} ...")
+        gen_catalog.generate(data_dir, sizes, seed=args.seed)
+
+    WORK_DIR.mkdir(exist_ok=True)
+    db_path = WORK_DIR / f"{args.preset}.db"
+
+    if TRACE_MEM:
+        tracemalloc.start()
+    results = []
+    if not args.skip_import:
+        print("匯入中 ...")
+        results += bench_import(data_dir, db_path)
+    print("查詢中 ...")
+    results += bench_queries(db_path, args.seed, sizes, args.repeat)
+    if TRACE_MEM:
+        tracemalloc.stop()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "preset": args.preset,
+        "seed": args.seed,
+        "sizes": sizes,
+        "memory": "tracemalloc" if TRACE_MEM else "rss_high_water",
+        "env": {
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n{'name':38} {'rows':>9} {'median ms':>10} {'p95 ms':>10} {'peak MB':>8}")
+    for r in results:
+        rows = "" if r["rows"] is None else r["rows"]
+        print(f"{r['name']:38} {rows:>9} {r['seconds']['median'] * 1000:>10.2f} "
+              f"{r['seconds']['p95'] * 1000:>10.2f} {r['peak_mem_mb']:>8.2f}")
+    print(f"\n✅ 報告已寫入：{args.out.resolve()}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("sizes") != sizes:
+            print(f"\n⚠️ baseline 的資料量不同（{baseline.get('sizes')}），比較結果僅供參考。")
+        slower = compare(report, baseline, args.threshold)
+        if slower:
+            print(f"\n⚠️ 有 {len(slower)} 項比 baseline 慢超過 {args.threshold:.0%}：")
+            for name, old, new, ratio in slower:
+                print(f"  - {name}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms（x{ratio:.2f}）")
+            sys.exit(1)
+        print("與 baseline 相比沒有明顯退步。")
+
+
+if __name__ == "__main__":
+    main()
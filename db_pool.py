@@ -0,0 +1,242 @@
+# db_pool.py
+# SQLite 連線池：同一個執行緒重用同一條連線，連線用完歸還池子而不是關掉
+# pragma 只在建立連線時套用一次；sqlite3 內建的 statement cache 也跟著連線一起活下來
+# 寫入一律走 ConnectionPool.write()：BEGIN IMMEDIATE + 遇到 database is locked 時退避重試
+
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_PATH = Path("kpop.db")
+
+# 池子設定
+POOL_SIZE = 8               # 最多同時開著幾條連線
+POOL_TIMEOUT = 5.0          # 池子滿了時最多等幾秒（同時也是 sqlite 的 lock timeout）
+STATEMENT_CACHE_SIZE = 256  # 每條連線快取幾個 prepared statement
+
+# 寫入重試
+WRITE_RETRIES = 5           # busy timeout 之後還拿不到寫入鎖，最多再重試幾次
+RETRY_BACKOFF = 0.05        # 第一次重試前等幾秒，之後每次加倍（再加一點隨機，避免大家同時重試）
+
+# 每條新連線只做一次（journal_mode=WAL 存在資料庫檔裡，由 init_db.py 設定）
+PRAGMAS = (
+    "PRAGMA foreign_keys=ON;",
+    "PRAGMA synchronous=NORMAL;",  # WAL 模式下 NORMAL 就不會壞檔，只是斷電可能掉最後幾筆交易
+)
+
+
+def is_busy(e: Exception) -> bool:
+    """SQLITE_BUSY / SQLITE_LOCKED（database is locked）：別人正在寫，等一下再試就好"""
+    if not isinstance(e, sqlite3.OperationalError):
+        return False
+    code = getattr(e, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+class ConnectionPool:
+    """
+    簡單的 thread-safe 連線池。
+
+    - acquire()/release() 可以巢狀：同一個執行緒已經借了連線，再借一次會拿到同一條
+    - 最外層 release() 時才真的還回池子（沒 commit 的交易會先 rollback）
+    - 池子滿了就等，超過 timeout 丟 TimeoutError
+    - write(fn) 在 BEGIN IMMEDIATE 交易裡跑 fn(conn)，拿不到寫入鎖會退避重試
+    """
+
+    def __init__(
+        self,
+        db_path=DB_PATH,
+        size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        cached_statements: int = STATEMENT_CACHE_SIZE,
+        write_retries: int = WRITE_RETRIES,
+        pragmas=PRAGMAS,
+        uri: bool = False,
+    ):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.uri = uri          # db_path 是 file: URI（例如 replica.py 的記憶體資料庫）
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.write_retries = write_retries
+
+        self._idle = []          # 閒置連線（LIFO，最近用過的最熱）
+        self._open = 0           # 目前開著的連線數（閒置 + 借出）
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._counters = {
+            "connects": 0,       # 真的呼叫 sqlite3.connect 的次數
+            "closes": 0,
+            "checkouts": 0,      # 從池子借出的次數
+            "reentrant": 0,      # 同執行緒巢狀借用（直接重用）
+            "waits": 0,          # 池子滿了需要等待的次數
+            "timeouts": 0,
+            "rollbacks": 0,      # 歸還時發現交易沒收尾、幫忙 rollback 的次數
+            # 寫入競爭
+            "writes": 0,             # 成功 commit 的寫入交易
+            "write_retries": 0,      # 因為 database is locked 重試的次數
+            "write_failures": 0,     # 重試用完還是失敗
+            "write_lock_wait_ms": 0.0,      # 等寫入鎖（BEGIN IMMEDIATE）的累計時間
+            "write_lock_wait_max_ms": 0.0,  # 單次等最久的
+        }
+
+    # -------------------------
+    # 建立 / 借出 / 歸還
+    # -------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,  # 連線會在不同執行緒之間輪流使用（同一時間只有一個）
+            cached_statements=self.cached_statements,
+            uri=self.uri,
+        )
+        for p in self.pragmas:
+            conn.execute(p)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            with self._cond:
+                self._counters["reentrant"] += 1
+            return held
+
+        conn = None
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise TimeoutError(f"連線池已滿（{self.size} 條），等待超過 {self.timeout} 秒")
+                self._counters["waits"] += 1
+                self._cond.wait(remaining)
+            self._counters["checkouts"] += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._counters["connects"] += 1
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if getattr(self._local, "conn", None) is not conn:
+            raise RuntimeError("這條連線不是目前執行緒借出的")
+
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        rolled_back = False
+        if conn.in_transaction:
+            conn.rollback()
+            rolled_back = True
+
+        with self._cond:
+            if rolled_back:
+                self._counters["rollbacks"] += 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    # -------------------------
+    # 寫入
+    # -------------------------
+    def write(self, fn, *args, **kwargs):
+        """
+        在 BEGIN IMMEDIATE 交易裡跑 fn(conn, *args, **kwargs)，成功就 commit 並回傳 fn 的結果。
+
+        一開始就拿寫入鎖：多句的修改不會做到一半才撞到別人的鎖（WAL 下那種情況不會等 busy timeout，直接失敗）。
+        拿不到鎖會先等 busy timeout，再退避重試最多 write_retries 次；其他錯誤 rollback 後原樣往外丟。
+        fn 可能被執行不只一次，裡面只放資料庫操作。已經在交易裡（巢狀呼叫）就直接跑，由外層 commit。
+        """
+        for attempt in range(self.write_retries + 1):
+            with self.connection() as conn:
+                if conn.in_transaction:
+                    return fn(conn, *args, **kwargs)
+
+                t0 = time.monotonic()
+                try:
+                    conn.execute("BEGIN IMMEDIATE;")
+                    waited = (time.monotonic() - t0) * 1000
+                    out = fn(conn, *args, **kwargs)
+                    conn.commit()
+                except BaseException as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    if not is_busy(e):
+                        raise
+                    with self._cond:
+                        if attempt == self.write_retries:
+                            self._counters["write_failures"] += 1
+                            raise
+                        self._counters["write_retries"] += 1
+                else:
+                    with self._cond:
+                        self._counters["writes"] += 1
+                        self._counters["write_lock_wait_ms"] += waited
+                        self._counters["write_lock_wait_max_ms"] = max(
+                            self._counters["write_lock_wait_max_ms"], waited
+                        )
+                    return out
+
+            # 連線先還回去再睡，別占著池子
+            time.sleep(RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    # -------------------------
+    # 管理
+    # -------------------------
+    def close_idle(self) -> int:
+        """關掉所有閒置連線（借出中的不動），回傳關掉幾條"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._counters["closes"] += len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+        return len(idle)
+
+    def stats(self) -> dict:
+        with self._cond:
+            out = dict(self._counters)
+            out["open"] = self._open
+            out["idle"] = len(self._idle)
+            out["in_use"] = self._open - len(self._idle)
+            out["size"] = self.size
+            out["timeout"] = self.timeout
+            out["write_lock_wait_ms"] = round(out["write_lock_wait_ms"], 1)
+            out["write_lock_wait_max_ms"] = round(out["write_lock_wait_max_ms"], 1)
+        return out
@@ -0,0 +1,231 @@
+# export_to_csv.py
+# 把 kpop.db 匯出成 import_from_csv.py 吃的 CSV：同樣的檔名、同樣的欄位，外鍵換回自然鍵
+# （group_name、release_name / release_type / release_lang …）。
+# app 新增 / 修改過的資料寫回 data/，之後 --incremental / --shadow 重匯就不會把它們蓋掉
+#
+# 邊讀邊寫：每張表一個 cursor，每次 fetchmany 一批寫出去，不會把整張表讀進記憶體；
+# 七張表在同一個讀取交易裡匯出（WAL：app 同時在寫也是同一個時間點的內容）。
+# 順序照 id（= 當初匯入 / 新增的順序），跟原本的 CSV 比 diff 很乾淨
+#
+# 用法：
+#   python export_to_csv.py --out export              匯出到 export/
+#   python export_to_csv.py --out data --verify       寫回 data/，再用 import_from_csv 重匯一次確認來回一致
+#   python export_to_csv.py --out export --parquet    另外每張表寫一個 .parquet（要裝 pyarrow）
+
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import import_from_csv
+from import_from_csv import CSV_FILES, IMPORT_STEPS
+from init_db import SCHEMA_SQL
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet 是選配：沒裝 pyarrow 就只能匯出 CSV
+    pa = pq = None
+
+DB_PATH = Path("kpop.db")
+EXPORT_BATCH_ROWS = 50_000  # 每次 fetchmany 幾列（parquet 一個 row group 就是一批）
+
+# 每張表的匯出 SQL：欄位名稱 / 順序跟 data/*.csv 的標題列一樣
+# songs.youtube_video_id 是從 youtube_url 算的，匯入時會重算，不匯出
+EXPORT_SQL = {
+    "companies": """
+        SELECT company_name, founder, founded_date
+        FROM companies ORDER BY company_id;
+    """,
+    "groups": """
+        SELECT g.group_name, c.company_name, g.debut_date, g.fandom_name, g.image_path
+        FROM groups g
+        LEFT JOIN companies c ON c.company_id = g.company_id
+        ORDER BY g.group_id;
+    """,
+    "members": """
+        SELECT g.group_name, m.stage_name, m.real_name, m.birth_date, m.image_path
+        FROM members m
+        JOIN groups g ON g.group_id = m.group_id
+        ORDER BY m.member_id;
+    """,
+    "nationalities": """
+        SELECT nationality_code, nationality_name
+        FROM nationalities ORDER BY rowid;
+    """,
+    "member_nationalities": """
+        SELECT g.group_name, m.stage_name, mn.nationality_code
+        FROM member_nationalities mn
+        JOIN members m ON m.member_id = mn.member_id
+        JOIN groups g ON g.group_id = m.group_id
+        ORDER BY mn.rowid;
+    """,
+    "releases": """
+        SELECT g.group_name, r.release_name, r.release_type, r.release_lang, r.release_date
+        FROM releases r
+        JOIN groups g ON g.group_id = r.group_id
+        ORDER BY r.release_id;
+    """,
+    "songs": """
+        SELECT g.group_name, r.release_name, r.release_type, r.release_lang, s.title, s.youtube_url
+        FROM songs s
+        JOIN releases r ON r.release_id = s.release_id
+        JOIN groups g ON g.group_id = r.group_id
+        ORDER BY s.song_id;
+    """,
+}
+
+
+def parquet_path(out_dir: Path, name: str) -> Path:
+    return out_dir / Path(CSV_FILES[name]).with_suffix(".parquet")
+
+
+def export_table(conn: sqlite3.Connection, name: str, out_dir: Path, parquet: bool = False,
+                 batch_rows: int = EXPORT_BATCH_ROWS) -> int:
+    """
+    一張表匯出成 CSV（+ parquet），回傳列數。
+    先寫到暫存檔、寫完才換名字：匯出失敗不會留下寫到一半的 CSV（--out data 時很重要）
+    """
+    cur = conn.execute(EXPORT_SQL[name])
+    cols = [d[0] for d in cur.description]
+    path, ppath = out_dir / CSV_FILES[name], parquet_path(out_dir, name)
+    tmp = path.with_name(f".{path.name}.tmp")
+    ptmp = ppath.with_name(f".{ppath.name}.tmp") if parquet else None
+    writer = None
+    n = 0
+    try:
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, lineterminator="\n")  # 跟 data/*.csv 一樣是 LF
+            w.writerow(cols)
+            if parquet:
+                schema = pa.schema([(c, pa.string()) for c in cols])  # 跟匯入一樣全部當字串
+                writer = pq.ParquetWriter(ptmp, schema)
+            while rows := cur.fetchmany(batch_rows):
+                w.writerows(rows)
+                if writer is not None:
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(col, pa.string()) for col in zip(*rows)], schema=schema,
+                    ))
+                n += len(rows)
+            if writer is not None:
+                if n == 0:
+                    writer.write_table(schema.empty_table())
+                writer.close()
+                writer = None
+        os.replace(tmp, path)
+        if ptmp is not None:
+            os.replace(ptmp, ppath)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+        if ptmp is not None:
+            ptmp.unlink(missing_ok=True)
+    return n
+
+
+def export(conn: sqlite3.Connection, out_dir: Path, parquet: bool = False,
+           batch_rows: int = EXPORT_BATCH_ROWS) -> list[tuple[str, int, float]]:
+    """七張表全部匯出（同一個讀取交易），回傳 [(table, 列數, 秒數), ...]"""
+    if parquet and pq is None:
+        raise RuntimeError("匯出 parquet 需要 pyarrow：pip install pyarrow")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    timings = []
+    conn.execute("BEGIN;")
+    try:
+        for name, _ in IMPORT_STEPS:
+            t0 = time.perf_counter()
+            n = export_table(conn, name, out_dir, parquet=parquet, batch_rows=batch_rows)
+            timings.append((name, n, time.perf_counter() - t0))
+    finally:
+        conn.rollback()  # 只有讀，結束交易就好
+    return timings
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def verify(out_dir: Path, timings: list, parquet: bool = False) -> list:
+    """
+    來回檢查：out_dir 的 CSV 用 import_from_csv 匯進一個暫時的空資料庫，再匯出一次。
+    兩次匯出的 CSV 要一模一樣，而且每張表的列數要等於原本資料庫的（匯入時被 INSERT OR IGNORE 吃掉的列會對不上）。
+    回傳問題清單（空的就是一致）
+    """
+    problems = []
+    expected = {name: n for name, n, _ in timings}
+    with tempfile.TemporaryDirectory(dir=out_dir.resolve().parent) as tmp:
+        tmp = Path(tmp)
+        conn = sqlite3.connect(tmp / "verify.db")
+        old_dir = import_from_csv.DATA_DIR
+        import_from_csv.DATA_DIR = out_dir
+        try:
+            conn.executescript(SCHEMA_SQL)
+            import_from_csv.run_import(conn)
+            again = export(conn, tmp / "csv")
+        finally:
+            import_from_csv.DATA_DIR = old_dir
+            conn.close()
+
+        for name, n, _ in again:
+            if n != expected[name]:
+                problems.append(f"{name}: 匯出 {expected[name]} 列，重匯後剩 {n} 列")
+            elif file_sha256(out_dir / CSV_FILES[name]) != file_sha256(tmp / "csv" / CSV_FILES[name]):
+                problems.append(f"{CSV_FILES[name]}: 重匯後再匯出的內容不一樣")
+            if parquet:
+                rows = pq.ParquetFile(parquet_path(out_dir, name)).metadata.num_rows
+                if rows != expected[name]:
+                    problems.append(f"{parquet_path(out_dir, name).name}: {rows} 列，CSV 是 {expected[name]} 列")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--out", type=Path, required=True, help="輸出目錄（給 data 就是直接寫回匯入用的 CSV）")
+    parser.add_argument("--parquet", action="store_true", help="另外每張表寫一個 .parquet（要裝 pyarrow）")
+    parser.add_argument("--verify", action="store_true", help="匯出後用 import_from_csv 重匯一次，確認來回一致")
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS, help="每批讀 / 寫幾列")
+    args = parser.parse_args()
+    if args.parquet and pq is None:
+        parser.error("--parquet 需要 pyarrow：pip install pyarrow")
+    if not args.db.exists():
+        raise FileNotFoundError(f"找不到 {args.db}")
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA query_only = ON;")
+    try:
+        t0 = time.perf_counter()
+        timings = export(conn, args.out, parquet=args.parquet, batch_rows=args.batch_rows)
+        total = time.perf_counter() - t0
+    finally:
+        conn.close()
+
+    print(f"✅ 匯出完成：{args.out.resolve()}")
+    for name, n, dt in timings:
+        print(f"  - {name}: {n} 筆，{dt:.3f}s（{n / dt if dt > 0 else 0:,.0f} rows/s）")
+    n_all = sum(n for _, n, _ in timings)
+    print(f"  = 共 {n_all} 筆，{total:.3f}s（{n_all / total if total > 0 else 0:,.0f} rows/s）")
+
+    if args.verify:
+        t0 = time.perf_counter()
+        problems = verify(args.out, timings, parquet=args.parquet)
+        if problems:
+            print("❌ 來回檢查失敗：")
+            for p in problems:
+                print(f"  - {p}")
+            raise SystemExit(1)
+        print(f"✅ 來回檢查通過（{time.perf_counter() - t0:.3f}s）：重匯後再匯出跟這次的 CSV 一模一樣")
+
+
+if __name__ == "__main__":
+    main()
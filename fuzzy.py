@@ -0,0 +1,208 @@
+# fuzzy.py
+# 模糊搜尋：字元 trigram 索引（記憶體內），容忍錯字、大小寫、重音符號、常見的韓文羅馬拼音差異
+#   Chayeong ~ Chaeyoung、rosé ~ Rose、NAYEON ~ Nayeon
+# 不依賴 streamlit：app.py 用 st.cache_resource 每種資料各留一個 FuzzyIndex
+#
+# 索引增量更新：init_db.py 的 trigger 把名字 / 歌名有變動的 id 記進 fuzzy_log，
+# refresh() 只重算 log 裡新出現的那些；落後太多（例如剛整批匯入，或 log 裡的舊紀錄已經被截掉）才整個重建
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from array import array
+
+import numpy as np
+
+# 資料種類 -> (表, id 欄位, 要索引的文字欄位)；fuzzy_log.kind 就是表名
+SOURCES = {
+    "groups": ("groups", "group_id", ["group_name"]),
+    "members": ("members", "member_id", ["stage_name", "real_name"]),
+    "songs": ("songs", "song_id", ["title"]),
+}
+
+MIN_SIMILARITY = 0.3     # trigram 相似度（Jaccard）低於這個不算
+LATENCY_BUDGET = 0.15    # 一次查詢最多花多久合併 posting list（秒），超過就用目前的候選
+MAX_POSTINGS = 2_000_000 # 一次查詢最多看幾個 posting（太常見的 trigram 最後才看）
+REBUILD_RATIO = 0.2      # 待套用的變動超過索引筆數的這個比例，就直接整個重建
+
+# 羅馬拼音常見的寫法差異，比對前先統一（順序有關：先處理長的）
+ROMAN_FOLDS = [("ou", "o"), ("eo", "o"), ("oo", "u"), ("ee", "i")]
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def fold(text: str) -> str:
+    """比對用的正規化：去重音（é -> e）、不分大小寫、標點當空白、統一羅馬拼音寫法"""
+    s = unicodedata.normalize("NFKD", text)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    s = _NON_WORD_RE.sub(" ", s).replace("_", " ")
+    for a, b in ROMAN_FOLDS:
+        s = s.replace(a, b)
+    return " ".join(s.split())
+
+
+def trigrams(text: str) -> set:
+    """每個字前面補兩個空白、後面補一個（跟 pg_trgm 一樣），短字也有 trigram"""
+    grams = set()
+    for w in fold(text).split():
+        w = f"  {w} "
+        grams.update(w[i:i + 3] for i in range(len(w) - 2))
+    return grams
+
+
+class FuzzyIndex:
+    """
+    一種資料（groups / members / songs）的 trigram 索引。
+
+    - entry：一個 (id, 一個文字欄位)；members 的藝名、本名各一個 entry
+    - postings：trigram -> entry 編號（array，省記憶體）
+    - 刪除 / 修改只把舊 entry 標成失效，失效的太多就整個重建
+    - refresh() / search() thread-safe
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.table, self.id_col, self.text_cols = SOURCES[kind]
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.seq = None                # 已經套用到 fuzzy_log 的哪一筆
+        self._refs = array("q")        # entry -> id
+        self._sizes = array("H")       # entry -> trigram 數
+        self._alive = bytearray()      # entry 是否還有效
+        self._dead = 0
+        self._postings = {}
+
+    def __len__(self):
+        return len(self._refs) - self._dead
+
+    # ---------- 建索引 ----------
+    def _rows_sql(self, where: str = "") -> str:
+        parts = [
+            f"SELECT {self.id_col}, {c} FROM {self.table} WHERE {c} IS NOT NULL {where}"
+            for c in self.text_cols
+        ]
+        return " UNION ALL ".join(parts)
+
+    def _add(self, rows) -> None:
+        for ref, text in rows:
+            grams = trigrams(text)
+            if not grams:
+                continue
+            e = len(self._refs)
+            self._refs.append(ref)
+            self._sizes.append(min(len(grams), 0xFFFF))
+            self._alive.append(1)
+            for g in grams:
+                p = self._postings.get(g)
+                if p is None:
+                    p = self._postings[g] = array("i")
+                p.append(e)
+
+    def _remove(self, refs: list) -> None:
+        if not self._refs:
+            return
+        hit = np.isin(np.frombuffer(self._refs, dtype=np.int64), refs)
+        alive = np.frombuffer(self._alive, dtype=np.uint8)
+        for e in np.flatnonzero(hit & (alive == 1)):
+            self._alive[e] = 0
+            self._dead += 1
+
+    def _log_range(self, conn) -> tuple:
+        """(fuzzy_log 目前最大的 seq, 還留著的最小 seq)"""
+        top = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'fuzzy_log';").fetchone()
+        low = conn.execute("SELECT MIN(seq) FROM fuzzy_log;").fetchone()
+        return (top[0] if top else 0), low[0]
+
+    def rebuild(self, conn) -> None:
+        with self._lock:
+            self._rebuild(conn)
+
+    def _rebuild(self, conn) -> None:
+        self._reset()
+        top, _ = self._log_range(conn)
+        self._add(conn.execute(self._rows_sql()))
+        self.seq = top
+
+    def refresh(self, conn) -> dict:
+        """
+        套用 fuzzy_log 裡還沒處理的變動；第一次用、log 被清過（整批匯入後）或變動太多就整個重建。
+        回傳 {"mode": "none" | "incremental" | "rebuild", "changed": n}
+        """
+        with self._lock:
+            top, low = self._log_range(conn)
+            if self.seq is not None and top == self.seq:
+                return {"mode": "none", "changed": 0}
+
+            trimmed = self.seq is None or low is None or low > self.seq + 1
+            if not trimmed:
+                changed = [r[0] for r in conn.execute(
+                    "SELECT DISTINCT ref_id FROM fuzzy_log WHERE kind = ? AND seq > ? AND seq <= ?;",
+                    (self.kind, self.seq, top),
+                )]
+                if len(changed) <= max(1000, len(self) * REBUILD_RATIO):
+                    if changed:
+                        self._remove(changed)
+                        self._add(conn.execute(
+                            self._rows_sql(f"AND {self.id_col} IN (SELECT value FROM json_each(?))"),
+                            [json.dumps(changed)] * len(self.text_cols),
+                        ))
+                    self.seq = top
+                    if self._dead > len(self._refs) * REBUILD_RATIO:
+                        self._rebuild(conn)
+                        return {"mode": "rebuild", "changed": len(changed)}
+                    return {"mode": "incremental", "changed": len(changed)}
+
+            self._rebuild(conn)
+            return {"mode": "rebuild", "changed": len(self)}
+
+    # ---------- 查詢 ----------
+    def search(self, q: str, limit: int = 40, min_similarity: float = MIN_SIMILARITY,
+               budget: float = LATENCY_BUDGET) -> list:
+        """
+        回傳 [(id, 相似度), ...]，相似度高的在前（同一個 id 只留最高分）。
+        從最少見的 trigram 開始合併 posting list，超過時間 / 數量預算就用目前的候選算分。
+        """
+        qgrams = trigrams(q)
+        if not qgrams:
+            return []
+        deadline = time.perf_counter() + budget
+
+        with self._lock:
+            lists = sorted((self._postings[g] for g in qgrams if g in self._postings), key=len)
+            parts, seen = [], 0
+            for p in lists:
+                if parts and (seen + len(p) > MAX_POSTINGS or time.perf_counter() > deadline):
+                    break
+                parts.append(np.frombuffer(p, dtype=np.int32).copy())
+                seen += len(p)
+            if not parts:
+                return []
+
+            # numpy 的 view 要在放開 lock 前用完（view 還在的時候 array 不能 append）
+            entries, shared = np.unique(np.concatenate(parts), return_counts=True)
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            keep = alive[entries] == 1
+            entries, shared = entries[keep], shared[keep]
+            sizes = np.frombuffer(self._sizes, dtype=np.uint16)[entries].astype(np.int64)
+            refs = np.frombuffer(self._refs, dtype=np.int64)[entries]
+            del alive
+
+        score = shared / (len(qgrams) + sizes - shared)
+        ok = score >= min_similarity
+        refs, score = refs[ok], score[ok]
+        order = np.lexsort((refs, -score))
+
+        out, used = [], set()
+        for i in order:
+            ref = int(refs[i])
+            if ref in used:
+                continue
+            used.add(ref)
+            out.append((ref, round(float(score[i]), 3)))
+            if len(out) >= limit:
+                break
+        return out
@@ -0,0 +1,206 @@
+# gen_catalog.py
+# 產生假資料 CSV（欄位跟 import_from_csv.py 要的一樣），用來測大量資料下的匯入 / 查詢速度
+# 同一個 seed + 同樣的筆數，產出的檔案完全一樣
+#
+# 用法：
+#   python gen_catalog.py --preset small --out bench_data/small
+#   python gen_catalog.py --companies 10000 --groups 100000 --members 1000000 --songs 5000000 --out bench_data/prod
+
+import argparse
+import csv
+import random
+from pathlib import Path
+
+from import_from_csv import CSV_FILES
+
+PRESETS = {
+    "tiny": dict(companies=20, groups=200, members=1_000, releases=2_000, songs=8_000),
+    "small": dict(companies=200, groups=2_000, members=10_000, releases=20_000, songs=80_000),
+    "medium": dict(companies=1_000, groups=20_000, members=100_000, releases=200_000, songs=800_000),
+    "prod": dict(companies=10_000, groups=100_000, members=1_000_000, releases=1_250_000, songs=5_000_000),
+}
+
+RELEASE_TYPES = ["ALBUM", "EP", "SINGLE", "SINGLE_ALBUM"]
+RELEASE_LANGS = ["KR", "JP", "EN"]
+
+NATIONALITIES = [
+    ("KR", "South Korea"), ("JP", "Japan"), ("CN", "China"), ("TW", "Taiwan"),
+    ("TH", "Thailand"), ("US", "United States"), ("AU", "Australia"), ("NZ", "New Zealand"),
+    ("CA", "Canada"), ("VN", "Vietnam"), ("ID", "Indonesia"), ("PH", "Philippines"),
+]
+
+SYLLABLES = [
+    "ka", "ri", "na", "so", "mi", "yu", "ji", "won", "hae", "rin", "ae", "bi", "chae", "da", "eun",
+    "ga", "ha", "in", "jin", "kyu", "lia", "min", "nay", "rae", "sa", "seo", "tae", "woo", "ye", "zu",
+]
+
+
+# ---------------------------
+# 名字：只由 (seed, 編號) 決定，子表不用把父表整個留在記憶體裡也能算出外鍵
+# ---------------------------
+def mix(seed: int, i: int, salt: int) -> int:
+    x = (i * 0x9E3779B1 + seed * 0x85EBCA77 + salt * 0xC2B2AE3D) & 0xFFFFFFFF
+    x ^= x >> 15
+    x = (x * 0x2C1B3C6D) & 0xFFFFFFFF
+    x ^= x >> 12
+    return x
+
+
+def word(seed: int, i: int, salt: int, n: int = 2) -> str:
+    h = mix(seed, i, salt)
+    parts = []
+    for _ in range(n):
+        parts.append(SYLLABLES[h % len(SYLLABLES)])
+        h //= len(SYLLABLES)
+    return "".join(parts)
+
+
+def company_name(seed: int, c: int) -> str:
+    return f"{word(seed, c, 1).capitalize()} Entertainment {c}"
+
+
+def group_name(seed: int, g: int) -> str:
+    return f"{word(seed, g, 2, 3).upper()} {g}"
+
+
+def group_of_member(m: int, sizes: dict) -> int:
+    return m % sizes["groups"]
+
+
+def stage_name(seed: int, m: int) -> str:
+    return f"{word(seed, m, 3).capitalize()}{m}"
+
+
+def group_of_release(r: int, sizes: dict) -> int:
+    return r % sizes["groups"]
+
+
+def release_key(seed: int, r: int, sizes: dict) -> tuple:
+    """(group_name, release_name, release_type, release_lang)"""
+    h = mix(seed, r, 4)
+    return (
+        group_name(seed, group_of_release(r, sizes)),
+        f"{word(seed, r, 5, 2).capitalize()} {r}",
+        RELEASE_TYPES[h % len(RELEASE_TYPES)],
+        RELEASE_LANGS[(h >> 8) % len(RELEASE_LANGS)],
+    )
+
+
+def random_date(rng: random.Random, start_year: int, end_year: int) -> str:
+    return f"{rng.randint(start_year, end_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+# ---------------------------
+# 產生 CSV（一列一列寫出，不會整張表放在記憶體）
+# ---------------------------
+def generate(out_dir: Path, sizes: dict, seed: int = 42) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    counts = {}
+
+    def open_csv(name, header):
+        f = open(out_dir / CSV_FILES[name], "w", newline="", encoding="utf-8")
+        w = csv.writer(f)
+        w.writerow(header)
+        return f, w
+
+    f, w = open_csv("companies", ["company_name", "founder", "founded_date"])
+    with f:
+        for c in range(sizes["companies"]):
+            w.writerow([company_name(seed, c), f"{word(seed, c, 6).capitalize()} {word(seed, c, 7).capitalize()}",
+                        random_date(rng, 1990, 2022)])
+    counts["companies"] = sizes["companies"]
+
+    f, w = open_csv("groups", ["group_name", "company_name", "debut_date", "fandom_name", "image_path"])
+    with f:
+        for g in range(sizes["groups"]):
+            # 約 5% 沒有公司（對應 app 的「其他」）
+            h = mix(seed, g, 8)
+            company = company_name(seed, h % sizes["companies"]) if h % 20 else ""
+            w.writerow([group_name(seed, g), company, random_date(rng, 2005, 2025),
+                        word(seed, g, 9).upper(), ""])
+    counts["groups"] = sizes["groups"]
+
+    f, w = open_csv("members", ["group_name", "stage_name", "real_name", "birth_date", "image_path"])
+    with f:
+        for m in range(sizes["members"]):
+            w.writerow([group_name(seed, group_of_member(m, sizes)), stage_name(seed, m),
+                        f"{word(seed, m, 10).capitalize()} {word(seed, m, 11, 3).capitalize()}",
+                        random_date(rng, 1990, 2010), ""])
+    counts["members"] = sizes["members"]
+
+    f, w = open_csv("nationalities", ["nationality_code", "nationality_name"])
+    with f:
+        w.writerows(NATIONALITIES)
+    counts["nationalities"] = len(NATIONALITIES)
+
+    f, w = open_csv("member_nationalities", ["group_name", "stage_name", "nationality_code"])
+    n = 0
+    with f:
+        for m in range(sizes["members"]):
+            h = mix(seed, m, 12)
+            gname, sname = group_name(seed, group_of_member(m, sizes)), stage_name(seed, m)
+            # 大多是韓國籍，約 1/8 有第二國籍
+            first = NATIONALITIES[0][0] if h % 3 else NATIONALITIES[h % len(NATIONALITIES)][0]
+            w.writerow([gname, sname, first])
+            n += 1
+            if h % 8 == 0:
+                second = NATIONALITIES[(h >> 4) % len(NATIONALITIES)][0]
+                if second != first:
+                    w.writerow([gname, sname, second])
+                    n += 1
+    counts["member_nationalities"] = n
+
+    f, w = open_csv("releases", ["group_name", "release_name", "release_type", "release_lang", "release_date"])
+    with f:
+        for r in range(sizes["releases"]):
+            w.writerow([*release_key(seed, r, sizes), random_date(rng, 2005, 2025)])
+    counts["releases"] = sizes["releases"]
+
+    f, w = open_csv("songs", ["group_name", "release_name", "release_type", "release_lang", "title", "youtube_url"])
+    with f:
+        for s in range(sizes["songs"]):
+            r = s % sizes["releases"]
+            vid = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-") for _ in range(11))
+            w.writerow([*release_key(seed, r, sizes), f"{word(seed, s, 13, 3).capitalize()} {s}",
+                        f"https://youtu.be/{vid}"])
+    counts["songs"] = sizes["songs"]
+
+    return counts
+
+
+def sizes_from_args(args) -> dict:
+    sizes = dict(PRESETS[args.preset])
+    for k in sizes:
+        v = getattr(args, k, None)
+        if v is not None:
+            sizes[k] = v
+    if min(sizes.values()) <= 0:
+        raise ValueError(f"每張表至少要 1 筆：{sizes}")
+    return sizes
+
+
+def add_size_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="tiny")
+    parser.add_argument("--seed", type=int, default=42)
+    for k in PRESETS["tiny"]:
+        parser.add_argument(f"--{k}", type=int, help=f"覆蓋 preset 的 {k} 筆數")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_size_args(parser)
+    parser.add_argument("--out", type=Path, help="輸出目錄（預設 bench_data/<preset>）")
+    args = parser.parse_args()
+
+    sizes = sizes_from_args(args)
+    out = args.out or Path("bench_data") / args.preset
+    counts = generate(out, sizes, seed=args.seed)
+
+    print(f"✅ 已產生假資料：{out.resolve()}")
+    for k, v in counts.items():
+        print(f"  - {k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
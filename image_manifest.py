@@ -0,0 +1,164 @@
+# image_manifest.py
+# 圖片清單（images 表）：groups / members 用到的每個 image_path 是否存在、內容 hash、格式、尺寸
+# 匯入 CSV 後跑一次（import_from_csv.py 會自動呼叫），app 顯示圖片時查這張表，不用每次 render 都去碰檔案
+# 增量：檔案 mtime / 大小沒變就沿用上次的結果；檢查檔案用 thread pool 平行做
+#
+# 用法：
+#   python image_manifest.py   重新檢查 DB 裡所有 image_path，列出壞掉的路徑
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+
+from thumbs import source_hash
+
+DB_PATH = Path("kpop.db")
+IMAGE_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+MANIFEST_COLS = ["path", "status", "sha256", "format", "width", "height", "bytes", "mtime_ns", "error", "checked_at"]
+
+REFERENCED_SQL = """
+SELECT image_path FROM groups WHERE image_path IS NOT NULL
+UNION
+SELECT image_path FROM members WHERE image_path IS NOT NULL;
+"""
+
+
+def normalize_path(path):
+    """
+    DB/CSV 裡的路徑統一用 /：images\\groups\\x.png -> images/groups/x.png
+    空值回傳 None。
+    """
+    if path is None:
+        return None
+    s = str(path).strip().replace("\\", "/")
+    return s or None
+
+
+def probe(path: str, prev: dict | None = None) -> dict | None:
+    """
+    檢查一個圖片檔，回傳 images 表的一列；prev（上次的結果）的 mtime / 大小都沒變就回傳 None。
+    只碰檔案系統，不碰資料庫（給 thread pool 跑）。
+    """
+    row = dict.fromkeys(MANIFEST_COLS)
+    row["path"] = path
+    row["checked_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    src = Path(path)
+    try:
+        st = src.stat()
+    except OSError:
+        row["status"] = "missing"
+        if prev and prev["status"] == "missing":
+            return None
+        return row
+
+    if prev and prev["mtime_ns"] == st.st_mtime_ns and prev["bytes"] == st.st_size and prev["status"] != "missing":
+        return None
+
+    row["bytes"] = st.st_size
+    row["mtime_ns"] = st.st_mtime_ns
+    try:
+        row["sha256"] = source_hash(src)
+        with Image.open(src) as im:
+            row["format"] = im.format
+            row["width"], row["height"] = im.size
+        row["status"] = "ok"
+    except (OSError, UnidentifiedImageError) as e:
+        row["status"] = "unreadable"
+        row["error"] = str(e)
+    return row
+
+
+def _upsert(conn: sqlite3.Connection, rows: list) -> None:
+    conn.executemany(
+        f"""
+        INSERT OR REPLACE INTO images ({", ".join(MANIFEST_COLS)})
+        VALUES ({", ".join("?" * len(MANIFEST_COLS))});
+        """,
+        [tuple(r[c] for c in MANIFEST_COLS) for r in rows],
+    )
+
+
+def sync(conn: sqlite3.Connection, workers: int = IMAGE_WORKERS) -> dict:
+    """
+    讓 images 表跟 groups / members 目前引用的路徑一致：
+    新路徑或檔案有變動的才重新檢查（平行），已經沒有人引用的路徑刪掉。
+    呼叫端負責交易（commit / rollback）。回傳統計。
+    """
+    referenced = {normalize_path(r[0]) for r in conn.execute(REFERENCED_SQL)} - {None}
+    prev = {
+        r[0]: {"status": r[1], "mtime_ns": r[2], "bytes": r[3]}
+        for r in conn.execute("SELECT path, status, mtime_ns, bytes FROM images;")
+    }
+
+    paths = sorted(referenced)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda p: probe(p, prev.get(p)), paths))
+
+    changed = [r for r in results if r is not None]
+    if changed:
+        _upsert(conn, changed)
+
+    stale = [(p,) for p in prev if p not in referenced]
+    if stale:
+        conn.executemany("DELETE FROM images WHERE path = ?;", stale)
+
+    counts = dict(conn.execute(
+        "SELECT status, COUNT(*) FROM images GROUP BY status;"
+    ).fetchall())
+    return {
+        "referenced": len(paths),
+        "checked": len(changed),
+        "unchanged": len(paths) - len(changed),
+        "removed": len(stale),
+        "ok": counts.get("ok", 0),
+        "missing": counts.get("missing", 0),
+        "unreadable": counts.get("unreadable", 0),
+    }
+
+
+def record(conn: sqlite3.Connection, path) -> dict | None:
+    """單一路徑（例如 app 剛上傳的圖）立刻寫進 images 表，回傳那一列"""
+    path = normalize_path(path)
+    if path is None:
+        return None
+    row = probe(path)
+    _upsert(conn, [row])
+    return row
+
+
+def broken(conn: sqlite3.Connection) -> list:
+    """[(path, status, error), ...]：不存在或讀不了的圖"""
+    return conn.execute(
+        "SELECT path, status, error FROM images WHERE status <> 'ok' ORDER BY path;"
+    ).fetchall()
+
+
+def main():
+    if not DB_PATH.exists():
+        raise FileNotFoundError("找不到 kpop.db。請先執行：python init_db.py")
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        t0 = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE;")
+        stats = sync(conn)
+        conn.commit()
+        print(
+            f"✅ 圖片清單更新完成（{time.perf_counter() - t0:.3f}s）：引用 {stats['referenced']} 個路徑，"
+            f"重新檢查 {stats['checked']}，未變更 {stats['unchanged']}，移除 {stats['removed']}"
+        )
+        for path, status, error in broken(conn):
+            print(f"  ⚠️ {status}: {path}" + (f"（{error}）" if error else ""))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
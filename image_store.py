@@ -0,0 +1,248 @@
+# image_store.py
+# 上傳圖片的內容定址儲存：檔名 = 內容 sha256，依前兩碼分子目錄（images/store/ab/abcd....png）
+# 同樣的圖上傳幾次都只存一份；先寫暫存檔再 rename，多個 session 同時上傳也不會寫壞或撞名
+# 誰在用哪個檔案看 image_refs 表（init_db.py 的 trigger 維護 groups / members.image_path 的引用數），
+# sweep() 刪掉已經沒有人引用的檔案
+# 改用圖片庫之前的舊圖檔（images/groups、images/members，CSV 也引用這些路徑）由 dedupe() 照內容去重
+#
+# 用法：
+#   python image_store.py                 列出沒人引用的檔案（不刪）
+#   python image_store.py --sweep         刪掉沒人引用、而且超過 --grace 秒沒動過的檔案
+#   python image_store.py --dedupe        舊圖檔照內容去重，並跟圖片庫共用同一份
+
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+
+DB_PATH = Path("kpop.db")
+STORE_DIR = Path("images/store")
+IMAGE_ROOT = STORE_DIR.parent  # 舊圖檔也在這底下
+
+# 剛上傳、還沒寫進 DB 的檔案也是「沒人引用」：sweep 只動超過這麼久沒改過的
+SWEEP_GRACE = 3600
+
+FORMAT_EXTS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+
+def blob_path(sha: str, ext: str) -> Path:
+    return STORE_DIR / sha[:2] / f"{sha}{ext}"
+
+
+def image_ext(fp) -> str:
+    """依實際內容決定副檔名（fp：路徑或檔案物件）；不是支援的圖片就丟 ValueError"""
+    try:
+        with Image.open(fp) as im:
+            fmt = im.format
+    except (OSError, UnidentifiedImageError) as e:
+        raise ValueError(f"無法辨識的圖片格式：{e}") from e
+    if fmt not in FORMAT_EXTS:
+        raise ValueError(f"不支援的圖片格式：{fmt}")
+    return FORMAT_EXTS[fmt]
+
+
+def put(data: bytes) -> str:
+    """
+    存一張圖，回傳要寫進 image_path 的相對路徑（POSIX 格式）。
+    副檔名依實際內容決定（同一張圖不會因為 .jpg / .jpeg 存成兩份）；不是圖片就丟 ValueError。
+    """
+    dest = blob_path(hashlib.sha256(data).hexdigest(), image_ext(io.BytesIO(data)))
+    if dest.exists():
+        # 內容一樣：不用再寫；更新 mtime，避免剛好被 sweep 當成過期檔案刪掉
+        try:
+            os.utime(dest)
+            return dest.as_posix()
+        except FileNotFoundError:
+            pass  # sweep 剛好把它移走了：照常寫一份新的
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return dest.as_posix()
+
+
+def blobs():
+    """store 裡所有的檔案（不含寫到一半的暫存檔）"""
+    if not STORE_DIR.exists():
+        return
+    for f in STORE_DIR.glob("*/*"):
+        if f.is_file() and f.suffix != ".tmp":
+            yield f
+
+
+def referenced(conn: sqlite3.Connection) -> dict:
+    """{image_path: 引用數}，只含還有人用的"""
+    return dict(conn.execute("SELECT path, refs FROM image_refs WHERE refs > 0;"))
+
+
+def unreferenced(conn: sqlite3.Connection, grace: float = SWEEP_GRACE) -> list:
+    """沒人引用、而且超過 grace 秒沒動過的檔案（還跟舊圖檔共用同一份資料的不算：刪了也省不到空間）"""
+    used = referenced(conn)
+    cutoff = time.time() - grace
+    out = []
+    for f in blobs():
+        st = f.stat()
+        if f.as_posix() not in used and st.st_mtime < cutoff and st.st_nlink == 1:
+            out.append(f)
+    return out
+
+
+def remove_stale(f: Path, cutoff: float) -> int | None:
+    """
+    刪掉一個圖片庫的檔案，回傳釋放的 bytes；途中發現有人在用就不刪，回傳 None。
+    先改名移開再看 mtime：改名之前 put() 摸過的（有人正要用這張圖）就搬回去；
+    改名之後的 put() 會看到檔案不在，自己寫一份新的。檢查到刪除之間不會有空檔
+    """
+    moved = f.with_name(f"{f.name}.sweep.tmp")
+    try:
+        os.replace(f, moved)
+    except FileNotFoundError:
+        return None  # 別的 process 先刪了
+    st = moved.stat()
+    if st.st_mtime >= cutoff or st.st_nlink > 1:
+        os.replace(moved, f)  # put() 剛好又寫了一份的話，內容一樣，蓋過去沒關係
+        return None
+    moved.unlink()
+    return st.st_size
+
+
+def sweep(conn: sqlite3.Connection, grace: float = SWEEP_GRACE) -> dict:
+    """
+    刪掉沒人引用的檔案，順便清掉 image_refs 裡歸零的列；回傳統計。
+    引用在寫入交易裡重新確認一次：app 要寫 image_path 得等這個交易結束，
+    列出候選到真的刪掉之間才剛被引用的檔案不會被刪
+    """
+    candidates = unreferenced(conn, grace)
+    removed, freed = 0, 0
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        used = referenced(conn)
+        cutoff = time.time() - grace
+        for f in candidates:
+            if f.as_posix() in used:
+                continue
+            size = remove_stale(f, cutoff)
+            if size is not None:
+                removed += 1
+                freed += size
+        conn.execute("DELETE FROM image_refs WHERE refs <= 0;")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"removed": removed, "freed_bytes": freed}
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def legacy_files():
+    """images/ 底下、圖片庫以外的檔案（CSV 資料附的圖、改用圖片庫之前上傳的）"""
+    if not IMAGE_ROOT.exists():
+        return
+    for f in sorted(IMAGE_ROOT.rglob("*")):
+        if f.is_file() and STORE_DIR not in f.parents and f.suffix != ".tmp":
+            yield f
+
+
+def link(src: Path, dest: Path) -> None:
+    """dest 換成指向 src 的 hard link（先建在暫存名稱再 rename，途中 dest 不會不見）"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.link.tmp")
+    tmp.unlink(missing_ok=True)
+    os.link(src, tmp)
+    os.replace(tmp, dest)
+
+
+def dedupe(conn: sqlite3.Connection) -> dict:
+    """
+    舊圖檔照內容去重，並跟圖片庫共用同一份資料（hard link，路徑都不變，DB / CSV 不用改）：
+    - 內容一樣的幾個檔案只留一份：沒人引用的副本刪掉，有人引用的換成 hard link
+      （留下哪個：被引用最多的，再來是檔名最短的 —— images/groups/wbr.png 而不是 wbr_1.png）
+    - 每種內容在圖片庫也有一個 hard link：之後上傳同一張圖 put() 直接用現成的，不會再存一份
+    不是圖片的檔案不放進圖片庫；檔案系統不支援 hard link 的話只刪沒人引用的副本。回傳統計
+    """
+    used = referenced(conn)
+    by_sha = {}
+    for f in legacy_files():
+        by_sha.setdefault(file_sha256(f), []).append(f)
+
+    stats = {"files": sum(len(fs) for fs in by_sha.values()), "removed": 0, "linked": 0, "freed_bytes": 0}
+    for sha, files in by_sha.items():
+        files.sort(key=lambda f: (-used.get(f.as_posix(), 0), len(f.as_posix()), f.as_posix()))
+        try:
+            dest = blob_path(sha, image_ext(files[0]))
+        except ValueError:
+            dest = None
+        keep = dest if dest is not None and dest.exists() else files[0]
+        for f in files:
+            if f == keep or os.path.samefile(f, keep):
+                continue
+            size = f.stat().st_size
+            if f is not files[0] and f.as_posix() not in used:
+                f.unlink()
+                stats["removed"] += 1
+            else:
+                try:
+                    link(keep, f)
+                except OSError:
+                    continue
+                stats["linked"] += 1
+            stats["freed_bytes"] += size
+        if dest is not None and not dest.exists():
+            try:
+                link(keep, dest)
+            except OSError:
+                pass
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sweep", action="store_true", help="刪掉沒人引用的檔案（預設只列出來）")
+    parser.add_argument("--grace", type=float, default=SWEEP_GRACE, help="只處理超過幾秒沒動過的檔案")
+    parser.add_argument("--dedupe", action="store_true", help="舊圖檔照內容去重，並跟圖片庫共用同一份")
+    args = parser.parse_args()
+
+    if not DB_PATH.exists():
+        raise FileNotFoundError("找不到 kpop.db。請先執行：python init_db.py")
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        total = sum(f.stat().st_size for f in blobs())
+        print(f"圖片庫：{STORE_DIR.resolve()}（{total / 1024 / 1024:.1f} MB）")
+        if args.dedupe:
+            stats = dedupe(conn)
+            print(
+                f"🔗 舊圖檔 {stats['files']} 個：刪掉 {stats['removed']} 個沒人引用的副本，"
+                f"{stats['linked']} 個改成共用同一份（省下 {stats['freed_bytes'] / 1024:.1f} KB）"
+            )
+        if args.sweep:
+            stats = sweep(conn, args.grace)
+            print(f"🧹 已刪除 {stats['removed']} 個沒人引用的檔案（{stats['freed_bytes'] / 1024:.1f} KB）")
+        elif not args.dedupe:
+            for f in unreferenced(conn, args.grace):
+                print(f"  - {f.as_posix()}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
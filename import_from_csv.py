@@ -1,13 +1,33 @@
 # import_from_csv.py
 # 將 data/ 底下的 CSV 匯入 SQLite (kpop.db)
 # tables: companies, groups, members, nationalities, member_nationalities, releases, songs
+#
+# 批次匯入：整欄一次正規化、executemany 倒進 TEMP 暫存表，
+# 外鍵 / 列舉值用 SQL 一次檢查完所有表（錯誤一起回報），再用 INSERT ... SELECT 搬進正式表；
+# 全部包在同一個交易裡（失敗整批 rollback）。
+#
+# 用法：
+#   python import_from_csv.py --wipe          清空後完整重匯
+#   python import_from_csv.py --incremental   只套用 CSV 跟上次匯入之間的差異
+#   python import_from_csv.py --stream --wipe 超大 CSV：分塊讀、每塊一個交易，中斷後再跑 --stream 從斷點繼續
+#   python import_from_csv.py --shadow        在旁邊另建一份新的資料庫，匯入 + 驗證完才整份換上去（app 不用停）
+#
+# 匯入完會接著更新圖片清單（image_manifest.py：檢查 image_path 指到的檔案），--skip-images 可略過
 
 import argparse
+import hashlib
+import os
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import pandas as pd
 
+import image_manifest
+import youtube
+from init_db import SCHEMA_SQL, analyze, enable_wal
+
 DB_PATH = Path("kpop.db")
 DATA_DIR = Path("data")
 
@@ -21,6 +41,25 @@ CSV_FILES = {
     "songs": "songs.csv",
 }
 
+VALID_TYPE = {"ALBUM", "EP", "SINGLE", "SINGLE_ALBUM"}
+VALID_LANG = {"KR", "JP", "EN"}
+
+# 匯入期間用的 pragma：可以重跑的批次工作，不需要每筆都 fsync；
+# 外鍵先關掉（我們自己驗證），commit 前再跑一次 foreign_key_check
+IMPORT_PRAGMAS = (
+    "PRAGMA foreign_keys = OFF;",
+    "PRAGMA synchronous = OFF;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -65536;",  # 64 MB
+)
+
+# --shadow 建新資料庫用：那個檔案只有自己在用，失敗就整個丟掉，不需要 journal 也不用讓別人讀
+SHADOW_PRAGMAS = (
+    "PRAGMA journal_mode = OFF;",
+    "PRAGMA main.locking_mode = EXCLUSIVE;",
+)
+PUBLISH_TIMEOUT = 60  # 換上新資料庫時最多等 app 手上的寫入交易幾秒
+
 
 def connect() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH)
@@ -40,15 +79,76 @@ def norm(v):
     return v
 
 
-def load_csv(name: str) -> pd.DataFrame:
-    path = DATA_DIR / CSV_FILES[name]
-    if not path.exists():
-        raise FileNotFoundError(f"找不到 {path}，請確認 data/ 目錄與檔名。")
-    df = pd.read_csv(path)
+def norm_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """整張表做 norm()：一次處理一整欄（去頭尾空白、空字串/NaN -> None）"""
+    out = pd.DataFrame(index=df.index)
+    for c in df.columns:
+        s = df[c].astype("string").str.strip().replace("", pd.NA)
+        out[c] = s.astype(object).where(s.notna(), None)
+    return out
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = [c.strip() for c in df.columns]
+    df = norm_frame(df)
+    if "image_path" in df.columns:
+        # CSV 裡是 Windows 反斜線（images\groups\x.png），統一成 /
+        df["image_path"] = df["image_path"].map(image_manifest.normalize_path)
+    if "youtube_url" in df.columns:
+        # songs.youtube_video_id 不在 CSV 裡，從連結算（跟 app 寫入時同一個 youtube.video_id）
+        df["youtube_video_id"] = df["youtube_url"].map(youtube.video_id)
     return df
 
 
+def csv_path(name: str, data_dir: Path | None = None) -> Path:
+    path = (data_dir or DATA_DIR) / CSV_FILES[name]
+    if not path.exists():
+        raise FileNotFoundError(f"找不到 {path}，請確認 data/ 目錄與檔名。")
+    return path
+
+
+def load_csv(name: str, data_dir: Path | None = None) -> pd.DataFrame:
+    # 全部當字串讀，才不會把日期/代碼之類的欄位猜成數字
+    return clean_frame(pd.read_csv(csv_path(name, data_dir), dtype=str))
+
+
+def iter_csv(name: str, chunk_size: int, skip_rows: int = 0):
+    """分塊讀 CSV（每塊最多 chunk_size 列），跳過前 skip_rows 列資料；每塊的處理跟 load_csv 一樣"""
+    # 不用 read_csv 的 skiprows：它數的是檔案的「行」，欄位裡有換行、或中間有空白行時，
+    # 跟之前 yield 出去的列數對不上（斷點會多跳或重複）。
+    # 斷點就是之前 yield 過的列數：照一樣的方式讀，丟掉前 skip_rows 列（只多花解析時間，不碰資料庫）
+    reader = pd.read_csv(csv_path(name), dtype=str, chunksize=chunk_size)
+    with reader:
+        for chunk in reader:
+            if skip_rows >= len(chunk):
+                skip_rows -= len(chunk)
+                continue
+            if skip_rows:
+                chunk = chunk.iloc[skip_rows:]
+                skip_rows = 0
+            yield clean_frame(chunk)  # index = 第幾列資料（錯誤訊息的行號用）
+
+
+def require_columns(df: pd.DataFrame, name: str, required: set) -> None:
+    missing = required - set(df.columns)
+    if missing:
+        raise ValueError(f"{CSV_FILES[name]} 缺少欄位：{missing}")
+
+
+def column(df: pd.DataFrame, col: str) -> pd.Series:
+    """可選欄位：CSV 沒有這欄就當全部是 None"""
+    if col in df.columns:
+        return df[col]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def bulk_insert(conn: sqlite3.Connection, sql: str, cols: list[pd.Series]) -> int:
+    """executemany 一次寫入，回傳實際新增筆數（INSERT OR IGNORE 略過的不算）"""
+    rows = zip(*(c.tolist() for c in cols))
+    cur = conn.executemany(sql, rows)
+    return max(cur.rowcount, 0)
+
+
 def reset_db(conn: sqlite3.Connection) -> None:
     """清空資料表（保留結構）"""
     conn.execute("PRAGMA foreign_keys = OFF;")
@@ -67,180 +167,284 @@ def reset_db(conn: sqlite3.Connection) -> None:
 
 
 # -------------------------
-# 匯入各表
+# 暫存表（staging）
 # -------------------------
+# CSV 先整批倒進 TEMP 暫存表（全部 TEXT，_row = CSV 的行號），
+# 外鍵 / 列舉值的檢查都是一條 anti-join SQL，檢查通過再用 INSERT ... SELECT 搬進正式表
+
+# 每張表要讀的 CSV 欄位：(必填欄位, 可選欄位)
+STAGE_COLS = {
+    "companies": (["company_name"], ["founder", "founded_date"]),
+    "groups": (["group_name"], ["company_name", "debut_date", "fandom_name", "image_path"]),
+    "members": (["group_name", "stage_name"], ["real_name", "birth_date", "image_path"]),
+    "nationalities": (["nationality_code"], ["nationality_name"]),
+    "member_nationalities": (["group_name", "stage_name", "nationality_code"], []),
+    "releases": (["group_name", "release_name", "release_type", "release_lang"], ["release_date"]),
+    "songs": (["group_name", "release_name", "release_type", "release_lang", "title"], ["youtube_url", "youtube_video_id"]),
+}
+
+# 子表檢查外鍵時，父表可能還在暫存表裡（整批匯入是先全部檢查完才搬），所以要建索引
+STAGE_INDEXES = {
+    "companies": ["company_name"],
+    "groups": ["group_name"],
+    "members": ["group_name", "stage_name"],
+    "nationalities": ["nationality_code"],
+    "releases": ["group_name", "release_name", "release_type", "release_lang"],
+}
+
+
+def stage_cols(name: str) -> list:
+    required, optional = STAGE_COLS[name]
+    return required + optional
+
+
+def create_stage(conn: sqlite3.Connection) -> None:
+    """建立（或清空）所有暫存表；TEMP 表只有這條連線看得到，連線關掉就不見"""
+    for name in STAGE_COLS:
+        cols = ", ".join(f"{c} TEXT" for c in stage_cols(name))
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS stage_{name} (_row INTEGER PRIMARY KEY, {cols});")
+        if name in STAGE_INDEXES:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS temp.idx_stage_{name} ON stage_{name}({', '.join(STAGE_INDEXES[name])});"
+            )
+        conn.execute(f"DELETE FROM stage_{name};")
+
+
+def stage(conn: sqlite3.Connection, name: str, df: pd.DataFrame) -> int:
+    """把 df 倒進 stage_<name>（先清空）；_row 是 CSV 的行號（第 1 行是標題）"""
+    required, _ = STAGE_COLS[name]
+    require_columns(df, name, set(required))
+    cols = stage_cols(name)
+    conn.execute(f"DELETE FROM stage_{name};")
+    return bulk_insert(
+        conn,
+        f"INSERT INTO stage_{name} (_row, {', '.join(cols)}) VALUES (?, {', '.join('?' * len(cols))});",
+        [pd.Series(df.index + 2, index=df.index)] + [column(df, c) for c in cols],
+    )
 
-def import_companies(conn: sqlite3.Connection) -> None:
+
+def _in_list(values: set) -> str:
+    return ", ".join(f"'{v}'" for v in sorted(values))
+
+
+def _parent_exists(parent: str, on: list, db_sql: str) -> str:
     """
-    companies.csv 欄位：
-    company_name, founder, founded_date
+    自然鍵 on 在父表找得到（正式表，或還沒搬進去的暫存表）。
+    db_sql 是查正式表的 EXISTS 子查詢（用 s.<欄位> 比對）。
     """
-    df = load_csv("companies")
-    required = {"company_name"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"companies.csv 缺少欄位：{missing}")
+    match = " AND ".join(f"p.{c} = s.{c}" for c in on)
+    return f"(EXISTS ({db_sql}) OR EXISTS (SELECT 1 FROM stage_{parent} p WHERE {match}))"
+
+
+# 每張表的檢查：(說明, 顯示的欄位, 不合格的條件)；s 是這張表的暫存表
+CHECKS = {
+    "groups": [
+        ("找不到的 company_name", ["company_name"],
+         "s.company_name IS NOT NULL AND NOT " + _parent_exists(
+             "companies", ["company_name"],
+             "SELECT 1 FROM companies c WHERE c.company_name = s.company_name")),
+    ],
+    "members": [
+        ("找不到的 group_name", ["group_name"],
+         "NOT " + _parent_exists(
+             "groups", ["group_name"],
+             "SELECT 1 FROM groups g WHERE g.group_name = s.group_name")),
+    ],
+    "member_nationalities": [
+        ("找不到的 member（group_name, stage_name）", ["group_name", "stage_name"],
+         "NOT " + _parent_exists(
+             "members", ["group_name", "stage_name"],
+             """SELECT 1 FROM members m JOIN groups g ON m.group_id = g.group_id
+                WHERE g.group_name = s.group_name AND m.stage_name = s.stage_name""")),
+        ("找不到的 nationality_code", ["nationality_code"],
+         "NOT " + _parent_exists(
+             "nationalities", ["nationality_code"],
+             "SELECT 1 FROM nationalities n WHERE n.nationality_code = s.nationality_code")),
+    ],
+    "releases": [
+        ("找不到的 group_name", ["group_name"],
+         "NOT " + _parent_exists(
+             "groups", ["group_name"],
+             "SELECT 1 FROM groups g WHERE g.group_name = s.group_name")),
+        (f"不合法 release_type（只能 {sorted(VALID_TYPE)}）", ["release_type"],
+         f"s.release_type IS NULL OR s.release_type NOT IN ({_in_list(VALID_TYPE)})"),
+        (f"不合法 release_lang（只能 {sorted(VALID_LANG)}）", ["release_lang"],
+         f"s.release_lang IS NULL OR s.release_lang NOT IN ({_in_list(VALID_LANG)})"),
+    ],
+    "songs": [
+        (f"不合法 release_type（只能 {sorted(VALID_TYPE)}）", ["release_type"],
+         f"s.release_type IS NULL OR s.release_type NOT IN ({_in_list(VALID_TYPE)})"),
+        (f"不合法 release_lang（只能 {sorted(VALID_LANG)}）", ["release_lang"],
+         f"s.release_lang IS NULL OR s.release_lang NOT IN ({_in_list(VALID_LANG)})"),
+        ("找不到對應 releases 的資料（請先在 releases.csv 建立對應發行作品）",
+         ["group_name", "release_name", "release_type", "release_lang"],
+         "NOT " + _parent_exists(
+             "releases", ["group_name", "release_name", "release_type", "release_lang"],
+             """SELECT 1 FROM releases r JOIN groups g ON r.group_id = g.group_id
+                WHERE g.group_name = s.group_name AND r.release_name = s.release_name
+                  AND r.release_type = s.release_type AND r.release_lang = s.release_lang""")),
+    ],
+}
+
+ERROR_PREVIEW = 10  # 每項錯誤列出幾個不同的值
+
+
+def validate(conn: sqlite3.Connection, names) -> list:
+    """對已經放進暫存表的這幾張表跑所有檢查，回傳錯誤訊息（全部收集完，不會第一個錯就停）"""
+    errors = []
+    for name in names:
+        for desc, show, cond in CHECKS.get(name, []):
+            vals = ", ".join(f"s.{c}" for c in show)
+            rows = conn.execute(f"""
+                SELECT {vals}, MIN(s._row), COUNT(*) OVER ()
+                FROM stage_{name} s
+                WHERE {cond}
+                GROUP BY {vals}
+                ORDER BY MIN(s._row)
+                LIMIT {ERROR_PREVIEW};
+            """).fetchall()
+            if rows:
+                preview = [r[0] if len(show) == 1 else tuple(r[:len(show)]) for r in rows]
+                lines = [r[len(show)] for r in rows]
+                errors.append(
+                    f"{CSV_FILES[name]} 有{desc}：{rows[0][-1]} 種，前幾筆 {preview}（第 {lines} 行）"
+                )
+    return errors
+
+
+def raise_errors(errors: list) -> None:
+    if errors:
+        raise ValueError("CSV 檢查失敗：\n" + "\n".join(f"  - {e}" for e in errors))
+
+
+# 暫存表 -> 正式表（依 CSV 順序；INSERT OR IGNORE：自然鍵重複的留第一筆）
+PROMOTE_SQL = {
+    "companies": """
+        INSERT OR IGNORE INTO companies (company_name, founder, founded_date)
+        SELECT company_name, founder, founded_date
+        FROM stage_companies ORDER BY _row;
+    """,
+    "groups": """
+        INSERT OR IGNORE INTO groups (company_id, group_name, debut_date, fandom_name, image_path)
+        SELECT c.company_id, s.group_name, s.debut_date, s.fandom_name, s.image_path
+        FROM stage_groups s
+        LEFT JOIN companies c ON c.company_name = s.company_name
+        ORDER BY s._row;
+    """,
+    "members": """
+        INSERT OR IGNORE INTO members (group_id, stage_name, real_name, birth_date, image_path)
+        SELECT g.group_id, s.stage_name, s.real_name, s.birth_date, s.image_path
+        FROM stage_members s
+        JOIN groups g ON g.group_name = s.group_name
+        ORDER BY s._row;
+    """,
+    "nationalities": """
+        INSERT OR IGNORE INTO nationalities (nationality_code, nationality_name)
+        SELECT nationality_code, nationality_name
+        FROM stage_nationalities ORDER BY _row;
+    """,
+    "member_nationalities": """
+        INSERT OR IGNORE INTO member_nationalities (member_id, nationality_code)
+        SELECT m.member_id, s.nationality_code
+        FROM stage_member_nationalities s
+        JOIN groups g ON g.group_name = s.group_name
+        JOIN members m ON m.group_id = g.group_id AND m.stage_name = s.stage_name
+        ORDER BY s._row;
+    """,
+    "releases": """
+        INSERT OR IGNORE INTO releases (group_id, release_name, release_type, release_lang, release_date)
+        SELECT g.group_id, s.release_name, s.release_type, s.release_lang, s.release_date
+        FROM stage_releases s
+        JOIN groups g ON g.group_name = s.group_name
+        ORDER BY s._row;
+    """,
+    # songs 沒有 UNIQUE 約束，INSERT OR IGNORE 擋不掉重複：照自然鍵（NATURAL_KEYS）自己去重，
+    # CSV 裡重複的只留第一列、資料庫裡已經有的（同一張發行作品同一個歌名）不再新增
+    # —— --stream 換了 CSV 從頭重跑時，已經寫進去的歌才不會多一份
+    "songs": """
+        INSERT INTO songs (release_id, title, youtube_url, youtube_video_id)
+        SELECT r.release_id, s.title, s.youtube_url, s.youtube_video_id
+        FROM (
+          SELECT *, ROW_NUMBER() OVER (
+            PARTITION BY group_name, release_name, release_type, release_lang, title ORDER BY _row
+          ) AS dup
+          FROM stage_songs
+        ) s
+        JOIN groups g ON g.group_name = s.group_name
+        JOIN releases r ON r.group_id = g.group_id AND r.release_name = s.release_name
+                       AND r.release_type = s.release_type AND r.release_lang = s.release_lang
+        WHERE s.dup = 1
+          AND NOT EXISTS (SELECT 1 FROM songs x WHERE x.release_id = r.release_id AND x.title = s.title)
+        ORDER BY s._row;
+    """,
+}
+
+
+def promote(conn: sqlite3.Connection, name: str) -> int:
+    """暫存表搬進正式表，回傳實際新增筆數；搬完清空暫存表"""
+    n = max(conn.execute(PROMOTE_SQL[name]).rowcount, 0)
+    conn.execute(f"DELETE FROM stage_{name};")
+    return n
 
-    sql = """
-    INSERT OR IGNORE INTO companies (company_name, founder, founded_date)
-    VALUES (?, ?, ?)
+
+# -------------------------
+# 匯入各表（每個函式回傳新增筆數）
+# -------------------------
+def import_table(conn: sqlite3.Connection, name: str, df: pd.DataFrame | None = None) -> int:
+    """單一張表：放進暫存表 -> 檢查 -> 搬進正式表"""
+    if df is None:
+        df = load_csv(name)
+    create_stage(conn)
+    stage(conn, name, df)
+    raise_errors(validate(conn, [name]))
+    return promote(conn, name)
+
+
+def import_companies(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
+    """
+    companies.csv 欄位：
+    company_name, founder, founded_date
     """
-    for _, r in df.iterrows():
-        conn.execute(sql, (
-            norm(r.get("company_name")),
-            norm(r.get("founder")),
-            norm(r.get("founded_date")),
-        ))
+    return import_table(conn, "companies", df)
 
 
-def import_groups(conn: sqlite3.Connection) -> None:
+def import_groups(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
     """
     groups.csv 欄位：
     group_name, company_name, debut_date, fandom_name, image_path(可選)
 
-    company_name 會自動對應到 companies.company_id（可空）
-    """
-    df = load_csv("groups")
-    required = {"group_name"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"groups.csv 缺少欄位：{missing}")
-
-    # image_path 不是必填；沒有也 OK
-    sql = """
-    INSERT OR IGNORE INTO groups (company_id, group_name, debut_date, fandom_name, image_path)
-    VALUES (
-      (SELECT company_id FROM companies WHERE company_name = ?),
-      ?, ?, ?, ?
-    )
+    company_name 會自動對應到 companies.company_id（可空，但填了就要找得到）
     """
-    for _, r in df.iterrows():
-        conn.execute(sql, (
-            norm(r.get("company_name")),
-            norm(r.get("group_name")),
-            norm(r.get("debut_date")),
-            norm(r.get("fandom_name")),
-            norm(r.get("image_path")),
-        ))
+    return import_table(conn, "groups", df)
 
 
-
-def import_members(conn: sqlite3.Connection) -> None:
+def import_members(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
     """
     members.csv 欄位（目前狀況）：
     group_name, stage_name, real_name, birth_date, image_path(可選)
     """
-    df = load_csv("members")
-    required = {"group_name", "stage_name"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"members.csv 缺少欄位：{missing}")
-
-    # 檢查 group_name 是否存在
-    group_names = set(pd.read_sql_query("SELECT group_name FROM groups", conn)["group_name"].tolist())
-    bad = []
-    for _, r in df.iterrows():
-        gname = norm(r.get("group_name"))
-        if gname not in group_names:
-            bad.append(gname)
-    if bad:
-        raise ValueError(f"members.csv 有找不到的 group_name：{sorted(set(bad))}")
-
-    sql = """
-    INSERT OR IGNORE INTO members (group_id, stage_name, real_name, birth_date, image_path)
-    VALUES (
-      (SELECT group_id FROM groups WHERE group_name = ?),
-      ?, ?, ?, ?
-    )
-    """
-    for _, r in df.iterrows():
-        conn.execute(sql, (
-            norm(r.get("group_name")),
-            norm(r.get("stage_name")),
-            norm(r.get("real_name")),
-            norm(r.get("birth_date")),
-            norm(r.get("image_path")),
-        ))
-
+    return import_table(conn, "members", df)
 
 
-def import_nationalities(conn: sqlite3.Connection) -> None:
+def import_nationalities(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
     """
     nationalities.csv 欄位：
     nationality_code, nationality_name
     """
-    df = load_csv("nationalities")
-    required = {"nationality_code"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"nationalities.csv 缺少欄位：{missing}")
-
-    sql = """
-    INSERT OR IGNORE INTO nationalities (nationality_code, nationality_name)
-    VALUES (?, ?)
-    """
-    for _, r in df.iterrows():
-        conn.execute(sql, (
-            norm(r.get("nationality_code")),
-            norm(r.get("nationality_name")),
-        ))
+    return import_table(conn, "nationalities", df)
 
 
-def import_member_nationalities(conn: sqlite3.Connection) -> None:
+def import_member_nationalities(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
     """
     member_nationalities.csv 欄位（建議用可定位 member 的欄位）：
     group_name, stage_name, nationality_code
 
     會用 (group_name, stage_name) 找到 member_id
     """
-    df = load_csv("member_nationalities")
-    required = {"group_name", "stage_name", "nationality_code"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"member_nationalities.csv 缺少欄位：{missing}")
-
-    # 建 member lookup: (group_name, stage_name) -> member_id
-    mem_df = pd.read_sql_query("""
-        SELECT m.member_id, g.group_name, m.stage_name
-        FROM members m
-        JOIN groups g ON m.group_id = g.group_id
-    """, conn)
-    member_lookup = {
-        (row["group_name"], row["stage_name"]): int(row["member_id"])
-        for _, row in mem_df.iterrows()
-    }
-
-    # 建 nationality set
-    nat_set = set(pd.read_sql_query("SELECT nationality_code FROM nationalities", conn)["nationality_code"].tolist())
-
-    missing_member = []
-    missing_nat = []
-    for _, r in df.iterrows():
-        key = (norm(r.get("group_name")), norm(r.get("stage_name")))
-        nat = norm(r.get("nationality_code"))
-        if key not in member_lookup:
-            missing_member.append(key)
-        if nat not in nat_set:
-            missing_nat.append(nat)
-
-    if missing_member:
-        preview = sorted(set(missing_member))[:10]
-        raise ValueError(f"member_nationalities.csv 有找不到的 member（group_name, stage_name）：前幾筆 {preview}")
-    if missing_nat:
-        preview = sorted(set(missing_nat))[:10]
-        raise ValueError(f"member_nationalities.csv 有找不到的 nationality_code：前幾筆 {preview}")
-
-    sql = """
-    INSERT OR IGNORE INTO member_nationalities (member_id, nationality_code)
-    VALUES (?, ?)
-    """
-    for _, r in df.iterrows():
-        key = (norm(r.get("group_name")), norm(r.get("stage_name")))
-        member_id = member_lookup[key]
-        conn.execute(sql, (member_id, norm(r.get("nationality_code"))))
-
-
-def import_releases(conn: sqlite3.Connection) -> None:
+    return import_table(conn, "member_nationalities", df)
+
+
+def import_releases(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
     """
     releases.csv 欄位：
     group_name, release_name, release_type, release_lang, release_date
@@ -248,160 +452,801 @@ def import_releases(conn: sqlite3.Connection) -> None:
     release_type：ALBUM / EP / SINGLE / SINGLE_ALBUM
     release_lang：KR / JP / EN
     """
-    df = load_csv("releases")
-    required = {"group_name", "release_name", "release_type", "release_lang"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"releases.csv 缺少欄位：{missing}")
-
-    group_names = set(pd.read_sql_query("SELECT group_name FROM groups", conn)["group_name"].tolist())
-    bad_group = []
-    for _, r in df.iterrows():
-        gname = norm(r.get("group_name"))
-        if gname not in group_names:
-            bad_group.append(gname)
-    if bad_group:
-        raise ValueError(f"releases.csv 有找不到的 group_name：{sorted(set(bad_group))}")
-
-    valid_type = {"ALBUM", "EP", "SINGLE", "SINGLE_ALBUM"}
-    valid_lang = {"KR", "JP", "EN"}
-
-    bad_type, bad_lang = [], []
-    for _, r in df.iterrows():
-        t = norm(r.get("release_type"))
-        l = norm(r.get("release_lang"))
-        if t not in valid_type:
-            bad_type.append(t)
-        if l not in valid_lang:
-            bad_lang.append(l)
-
-    if bad_type:
-        raise ValueError(f"releases.csv 有不合法 release_type：{sorted(set(bad_type))}（只能 {sorted(valid_type)}）")
-    if bad_lang:
-        raise ValueError(f"releases.csv 有不合法 release_lang：{sorted(set(bad_lang))}（只能 {sorted(valid_lang)}）")
-
-    sql = """
-    INSERT OR IGNORE INTO releases (group_id, release_name, release_type, release_lang, release_date)
-    VALUES (
-      (SELECT group_id FROM groups WHERE group_name = ?),
-      ?, ?, ?, ?
-    )
-    """
-    for _, r in df.iterrows():
-        conn.execute(sql, (
-            norm(r.get("group_name")),
-            norm(r.get("release_name")),
-            norm(r.get("release_type")),
-            norm(r.get("release_lang")),
-            norm(r.get("release_date")),
-        ))
+    return import_table(conn, "releases", df)
 
 
-def import_songs(conn: sqlite3.Connection) -> None:
+def import_songs(conn: sqlite3.Connection, df: pd.DataFrame | None = None) -> int:
     """
     songs.csv 欄位（目前狀況）：
     group_name, release_name, release_type, release_lang, title, youtube_url
 
     songs 需要用 (group_name, release_name, release_type, release_lang) 找到 release_id
     """
-    df = load_csv("songs")
-    required = {"group_name", "release_name", "release_type", "release_lang", "title"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"songs.csv 缺少欄位：{missing}")
-
-    valid_type = {"ALBUM", "EP", "SINGLE", "SINGLE_ALBUM"}
-    valid_lang = {"KR", "JP", "EN"}
-
-    for col, valid_set in [("release_type", valid_type), ("release_lang", valid_lang)]:
-        bad = []
-        for _, r in df.iterrows():
-            v = norm(r.get(col))
-            if v not in valid_set:
-                bad.append(v)
-        if bad:
-            raise ValueError(f"songs.csv 有不合法 {col}：{sorted(set(bad))}（只能 {sorted(valid_set)}）")
-
-    rel_df = pd.read_sql_query("""
-        SELECT r.release_id, g.group_name, r.release_name, r.release_type, r.release_lang
-        FROM releases r
-        JOIN groups g ON r.group_id = g.group_id
-    """, conn)
-
-    lookup = {
-        (row["group_name"], row["release_name"], row["release_type"], row["release_lang"]): int(row["release_id"])
-        for _, row in rel_df.iterrows()
-    }
-
-    missing_rel = []
-    for _, r in df.iterrows():
-        key = (
-            norm(r.get("group_name")),
-            norm(r.get("release_name")),
-            norm(r.get("release_type")),
-            norm(r.get("release_lang")),
-        )
-        if key not in lookup:
-            missing_rel.append(key)
-
-    if missing_rel:
-        preview = sorted(set(missing_rel))[:10]
-        raise ValueError(
-            "songs.csv 有找不到對應 releases 的資料（請先在 releases.csv 建立對應發行作品）。\n"
-            f"前幾筆：{preview}"
-        )
+    return import_table(conn, "songs", df)
+
+
+# 依外鍵順序
+IMPORT_STEPS = [
+    ("companies", import_companies),
+    ("groups", import_groups),
+    ("members", import_members),
+    ("nationalities", import_nationalities),
+    ("member_nationalities", import_member_nationalities),
+    ("releases", import_releases),
+    ("songs", import_songs),
+]
+
+
+# -------------------------
+# 同步紀錄（增量匯入用）
+# -------------------------
+# import_files：每個 CSV 上次匯入時的 sha256，沒變就整個檔案跳過
+# import_rows：每一列的自然鍵 -> 內容 hash，用來算出新增/修改/刪除
+SYNC_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS import_files (
+  table_name TEXT PRIMARY KEY,
+  file_sha256 TEXT NOT NULL,
+  imported_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- 分塊匯入（--stream）的斷點：每個 CSV 已經寫進 DB 的列數，跟那一塊的資料在同一個交易裡更新
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+  table_name TEXT PRIMARY KEY,
+  file_sha256 TEXT NOT NULL,
+  rows_done INTEGER NOT NULL DEFAULT 0,
+  finished INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+CREATE TABLE IF NOT EXISTS import_rows (
+  table_name TEXT NOT NULL,
+  natural_key TEXT NOT NULL,
+  row_hash INTEGER NOT NULL,
+  PRIMARY KEY (table_name, natural_key)
+) WITHOUT ROWID;
+"""
+
+KEY_SEP = "\x1f"
+
+# 每張表的自然鍵（CSV 欄位）
+NATURAL_KEYS = {
+    "companies": ["company_name"],
+    "groups": ["group_name"],
+    "members": ["group_name", "stage_name"],
+    "nationalities": ["nationality_code"],
+    "member_nationalities": ["group_name", "stage_name", "nationality_code"],
+    "releases": ["group_name", "release_name", "release_type", "release_lang"],
+    "songs": ["group_name", "release_name", "release_type", "release_lang", "title"],
+}
+
+# 修改：(SQL, 參數欄位)；None 表示這張表只有鍵、沒有可改的欄位
+UPDATE_SQL = {
+    "companies": (
+        "UPDATE companies SET founder=?, founded_date=? WHERE company_name=?;",
+        ["founder", "founded_date", "company_name"],
+    ),
+    "groups": (
+        """
+        UPDATE groups
+        SET company_id=(SELECT company_id FROM companies WHERE company_name=?),
+            debut_date=?, fandom_name=?, image_path=?
+        WHERE group_name=?;
+        """,
+        ["company_name", "debut_date", "fandom_name", "image_path", "group_name"],
+    ),
+    "members": (
+        """
+        UPDATE members
+        SET real_name=?, birth_date=?, image_path=?
+        WHERE group_id=(SELECT group_id FROM groups WHERE group_name=?) AND stage_name=?;
+        """,
+        ["real_name", "birth_date", "image_path", "group_name", "stage_name"],
+    ),
+    "nationalities": (
+        "UPDATE nationalities SET nationality_name=? WHERE nationality_code=?;",
+        ["nationality_name", "nationality_code"],
+    ),
+    "member_nationalities": None,
+    "releases": (
+        """
+        UPDATE releases
+        SET release_date=?
+        WHERE group_id=(SELECT group_id FROM groups WHERE group_name=?)
+          AND release_name=? AND release_type=? AND release_lang=?;
+        """,
+        ["release_date", "group_name", "release_name", "release_type", "release_lang"],
+    ),
+    "songs": (
+        """
+        UPDATE songs
+        SET youtube_url=?, youtube_video_id=?
+        WHERE title=? AND release_id=(
+          SELECT r.release_id FROM releases r JOIN groups g ON r.group_id = g.group_id
+          WHERE g.group_name=? AND r.release_name=? AND r.release_type=? AND r.release_lang=?
+        );
+        """,
+        ["youtube_url", "youtube_video_id", "title", "group_name", "release_name", "release_type", "release_lang"],
+    ),
+}
+
+# 刪除：參數就是自然鍵（順序同 NATURAL_KEYS）
+DELETE_SQL = {
+    "companies": "DELETE FROM companies WHERE company_name=?;",
+    "groups": "DELETE FROM groups WHERE group_name=?;",
+    "members": """
+        DELETE FROM members
+        WHERE group_id=(SELECT group_id FROM groups WHERE group_name=?) AND stage_name=?;
+    """,
+    "nationalities": "DELETE FROM nationalities WHERE nationality_code=?;",
+    "member_nationalities": """
+        DELETE FROM member_nationalities
+        WHERE member_id=(
+          SELECT m.member_id FROM members m JOIN groups g ON m.group_id = g.group_id
+          WHERE g.group_name=? AND m.stage_name=?
+        ) AND nationality_code=?;
+    """,
+    "releases": """
+        DELETE FROM releases
+        WHERE group_id=(SELECT group_id FROM groups WHERE group_name=?)
+          AND release_name=? AND release_type=? AND release_lang=?;
+    """,
+    "songs": """
+        DELETE FROM songs
+        WHERE release_id=(
+          SELECT r.release_id FROM releases r JOIN groups g ON r.group_id = g.group_id
+          WHERE g.group_name=? AND r.release_name=? AND r.release_type=? AND r.release_lang=?
+        ) AND title=?;
+    """,
+}
+
+# 刪父表時 ON DELETE CASCADE 會連帶刪掉的子表（companies -> groups 是 SET NULL，不會刪）
+CASCADE_CHILDREN = {
+    "groups": ["members", "releases"],
+    "members": ["member_nationalities"],
+    "nationalities": ["member_nationalities"],
+    "releases": ["songs"],
+}
+
+# 資料庫裡現有的自然鍵（跟 row_state 一樣用 KEY_SEP 串起來）；只有會被 cascade 刪掉的表需要
+KEY_SQL = {
+    "members": """
+        SELECT g.group_name || char(31) || m.stage_name
+        FROM members m JOIN groups g ON g.group_id = m.group_id
+    """,
+    "member_nationalities": """
+        SELECT g.group_name || char(31) || m.stage_name || char(31) || mn.nationality_code
+        FROM member_nationalities mn
+        JOIN members m ON m.member_id = mn.member_id
+        JOIN groups g ON g.group_id = m.group_id
+    """,
+    "releases": """
+        SELECT g.group_name || char(31) || r.release_name || char(31) || r.release_type || char(31) || r.release_lang
+        FROM releases r JOIN groups g ON g.group_id = r.group_id
+    """,
+    "songs": """
+        SELECT g.group_name || char(31) || r.release_name || char(31) || r.release_type || char(31)
+               || r.release_lang || char(31) || s.title
+        FROM songs s
+        JOIN releases r ON r.release_id = s.release_id
+        JOIN groups g ON g.group_id = r.group_id
+    """,
+}
+
+
+def cascade_targets(names) -> list:
+    """刪 names 這幾張表的列時，會被 cascade 連帶刪到的子表（含子表的子表）"""
+    out = []
+    todo = list(names)
+    while todo:
+        for child in CASCADE_CHILDREN.get(todo.pop(), []):
+            if child not in out:
+                out.append(child)
+                todo.append(child)
+    return out
+
+
+def missing_keys(conn: sqlite3.Connection, name: str) -> set:
+    """import_rows 記著、但資料庫裡已經沒有的自然鍵"""
+    return {r[0] for r in conn.execute(
+        f"SELECT natural_key FROM import_rows WHERE table_name = ? AND natural_key NOT IN ({KEY_SQL[name]});",
+        (name,),
+    )}
+
 
-    sql = """
-    INSERT OR IGNORE INTO songs (release_id, title, youtube_url)
-    VALUES (?, ?, ?)
+def file_sha256(name: str, data_dir: Path | None = None) -> str:
+    h = hashlib.sha256()
+    with open((data_dir or DATA_DIR) / CSV_FILES[name], "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_state(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    算出每一列的 (natural_key, row_hash)，index 跟 df 一樣。
+    自然鍵重複時只留第一筆（跟 INSERT OR IGNORE 的結果一致）。
+    """
+    key_cols = NATURAL_KEYS[name]
+    keys = df[key_cols[0]].astype("string").str.cat(
+        [df[c].astype("string") for c in key_cols[1:]], sep=KEY_SEP, na_rep=""
+    ).fillna("")
+    hashes = pd.util.hash_pandas_object(df[sorted(df.columns)], index=False)
+    state = pd.DataFrame({
+        "natural_key": keys.astype(object),
+        "row_hash": hashes.to_numpy().view("int64"),
+    }, index=df.index)
+    return state[~state["natural_key"].duplicated()]
+
+
+def split_key(key: str) -> tuple:
+    return tuple(v if v != "" else None for v in key.split(KEY_SEP))
+
+
+def save_state(conn: sqlite3.Connection, name: str, sha: str | None, state: pd.DataFrame, replace: bool) -> None:
+    """
+    replace=True：整張表的紀錄換新；否則只 upsert 傳進來的列。
+    sha=None：只記列，不記檔案（分塊匯入還沒跑完整個檔案時）
+    """
+    if replace:
+        conn.execute("DELETE FROM import_rows WHERE table_name=?;", (name,))
+    conn.executemany(
+        "INSERT OR REPLACE INTO import_rows (table_name, natural_key, row_hash) VALUES (?, ?, ?);",
+        zip([name] * len(state), state["natural_key"].tolist(), state["row_hash"].tolist()),
+    )
+    if sha is None:
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO import_files (table_name, file_sha256, imported_at) VALUES (?, ?, datetime('now'));",
+        (name, sha),
+    )
+
+
+# -------------------------
+# 平行讀 CSV
+# -------------------------
+# 讀檔 + 正規化 + 算 hash 跟匯入順序無關（只有搬進正式表要照外鍵順序），而且是 CPU 活：
+# 所有 CSV 丟給 process pool 同時讀，寫入端（主執行緒，唯一碰 SQLite 的）哪個先讀好就先放進暫存表，
+# 總時間大約是最大的那個檔讀完 + 寫入。全部放進暫存表之後才拿寫入鎖，讀檔期間不會擋住 app
+PARSE_WORKERS = min(len(CSV_FILES), os.cpu_count() or 1)
+
+
+def parse_csv(name: str, data_dir: Path) -> tuple[str, pd.DataFrame, pd.DataFrame, str, float]:
+    """
+    一個 CSV 讀好、檢查必填欄位、算每列的 hash 跟整個檔案的 sha256；不碰資料庫，在 worker process 裡跑。
+    data_dir 要明講：worker 不一定是 fork 出來的，看不到呼叫端改過的 DATA_DIR。
+    回傳 (name, df, row_state, sha256, 秒數)
+    """
+    t0 = time.perf_counter()
+    df = load_csv(name, data_dir)
+    require_columns(df, name, set(STAGE_COLS[name][0]))
+    state = row_state(name, df)
+    sha = file_sha256(name, data_dir)
+    return name, df, state, sha, time.perf_counter() - t0
+
+
+def parse_all(names: list, workers: int = PARSE_WORKERS):
+    """
+    平行讀 names 的 CSV，哪個先讀好就先 yield parse_csv() 的結果。
+    大的檔先送出去（它決定總時間）；只有一顆 CPU 或只有一個檔就直接在這裡讀。
+    """
+    names = sorted(names, key=lambda n: csv_path(n).stat().st_size, reverse=True)  # 順便先確認檔案都在
+    if workers <= 1 or len(names) <= 1:
+        for name in names:
+            yield parse_csv(name, DATA_DIR)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(names))) as pool:
+        futures = [pool.submit(parse_csv, name, DATA_DIR) for name in names]
+        try:
+            for f in as_completed(futures):
+                yield f.result()
+        finally:
+            for f in futures:
+                f.cancel()  # 中途失敗：還沒開始讀的就不用讀了
+
+
+def run_import(conn: sqlite3.Connection, wipe: bool = False) -> list[tuple[str, int, float]]:
     """
-    for _, r in df.iterrows():
-        key = (
-            norm(r.get("group_name")),
-            norm(r.get("release_name")),
-            norm(r.get("release_type")),
-            norm(r.get("release_lang")),
+    在同一個交易裡跑完所有匯入步驟，回傳 [(table, 新增筆數, 秒數), ...]。
+    任何一步失敗（含外鍵檢查）就整批 rollback。
+    順便記下每個 CSV / 每一列的 hash，之後 --incremental 才有比較基準。
+    """
+    conn.executescript(SYNC_SCHEMA_SQL)
+    for p in IMPORT_PRAGMAS:
+        conn.execute(p)
+
+    # 1) 全部 CSV 平行讀，讀好一個就放進暫存表一個（暫存表之間沒有順序關係）。
+    #    這段在拿寫入鎖之前：TEMP 表不算寫正式資料庫，讀檔再久 app 也照樣能寫
+    stage_s, states = {}, {}
+    try:
+        create_stage(conn)
+        for name, df, state, sha, parse_s in parse_all([name for name, _ in IMPORT_STEPS]):
+            t0 = time.perf_counter()
+            stage(conn, name, df)
+            del df
+            states[name] = (sha, state)
+            stage_s[name] = parse_s + time.perf_counter() - t0
+        conn.commit()  # 暫存表的隱含交易先結束，下面才能 BEGIN IMMEDIATE
+    except Exception:
+        conn.rollback()
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA synchronous = FULL;")
+        raise
+
+    timings = []
+    conn.execute("BEGIN IMMEDIATE;")  # 寫入鎖只包住真的寫正式表的部分
+    try:
+        if wipe:
+            reset_db(conn)
+            conn.execute("DELETE FROM import_rows;")
+            conn.execute("DELETE FROM import_files;")
+        for name, (sha, state) in states.items():
+            save_state(conn, name, sha, state, replace=wipe)
+        states.clear()
+
+        # 2) 所有表的檢查一次跑完，錯誤一起回報
+        raise_errors(validate(conn, [name for name, _ in IMPORT_STEPS]))
+
+        # 3) 依外鍵順序搬進正式表
+        for name, _ in IMPORT_STEPS:
+            t0 = time.perf_counter()
+            n = promote(conn, name)
+            timings.append((name, n, stage_s[name] + time.perf_counter() - t0))
+
+        violations = conn.execute("PRAGMA foreign_key_check;").fetchall()
+        if violations:
+            raise ValueError(f"外鍵檢查失敗：前幾筆 {violations[:10]}")
+
+        # 整批匯入後模糊搜尋索引反正要整個重建，變動紀錄不用留
+        conn.execute("DELETE FROM fuzzy_log;")
+        analyze(conn)  # 資料分布整個變了，查詢規劃的統計也要跟著更新
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA synchronous = FULL;")
+
+    return timings
+
+
+def run_incremental(conn: sqlite3.Connection) -> dict:
+    """
+    增量匯入：跟上次匯入的紀錄比對，只套用差異。
+    - CSV 的 sha256 沒變：整個檔案跳過
+    - 有變：依自然鍵算出新增 / 修改 / 刪除
+    刪除由子表往父表做，新增/修改由父表往子表做；全部在同一個交易裡。
+    外鍵開著：刪掉的團 / 發行作品底下不在 CSV 裡的資料（app 新增的）跟著 cascade 刪掉；
+    CSV 裡還留著的子資料被連帶刪掉的話，表示 CSV 之間對不上，整批 rollback。
+    新增跟修改的列都先放進暫存表跑跟完整匯入一樣的檢查，才真的寫入。
+    回傳 {table: {"skipped": bool, "inserted": n, "updated": n, "deleted": n}}
+    """
+    conn.executescript(SYNC_SCHEMA_SQL)
+    for p in IMPORT_PRAGMAS:
+        conn.execute(p)
+    # 跟完整匯入不一樣，這裡要刪資料：外鍵開著才會 cascade（交易開始後就不能改了）
+    conn.execute("PRAGMA foreign_keys = ON;")
+
+    result = {}
+    changed_files = []
+    for name, _ in IMPORT_STEPS:
+        sha = file_sha256(name)
+        row = conn.execute("SELECT file_sha256 FROM import_files WHERE table_name=?;", (name,)).fetchone()
+        if row is None:
+            n_rows = conn.execute(f"SELECT COUNT(*) FROM {name};").fetchone()[0]
+            if n_rows:
+                raise ValueError(f"{name} 沒有匯入紀錄但已有資料，請先執行一次 --wipe 完整匯入。")
+        elif row[0] == sha:
+            result[name] = {"skipped": True, "inserted": 0, "updated": 0, "deleted": 0}
+            continue
+        changed_files.append(name)
+
+    # 有變動的 CSV 平行讀；差異還是照外鍵順序算（plans 的順序就是之後寫入的順序）
+    parsed = {name: (df, state, sha) for name, df, state, sha, _ in parse_all(changed_files)}
+    plans = []  # (name, sha, df, state, inserted_idx, updated_idx, deleted_keys)
+    for name in changed_files:
+        df, state, sha = parsed.pop(name)
+        old = pd.read_sql_query(
+            "SELECT natural_key, row_hash FROM import_rows WHERE table_name=?;", conn, params=(name,)
         )
-        release_id = lookup[key]
-        conn.execute(sql, (
-            release_id,
-            norm(r.get("title")),
-            norm(r.get("youtube_url")),
-        ))
+        merged = state.reset_index().merge(old, on="natural_key", how="outer", suffixes=("", "_old"), indicator=True)
+
+        inserted_idx = merged.loc[merged["_merge"] == "left_only", "index"].astype(int).tolist()
+        changed = (merged["_merge"] == "both") & (merged["row_hash"] != merged["row_hash_old"])
+        updated_idx = merged.loc[changed, "index"].astype(int).tolist()
+        deleted_keys = merged.loc[merged["_merge"] == "right_only", "natural_key"].tolist()
+
+        plans.append((name, sha, df, state, inserted_idx, updated_idx, deleted_keys))
+        result[name] = {
+            "skipped": False,
+            "inserted": len(inserted_idx),
+            "updated": len(updated_idx),
+            "deleted": len(deleted_keys),
+        }
+    result = {name: result[name] for name, _ in IMPORT_STEPS}
+
+    conn.execute("BEGIN IMMEDIATE;")  # 一開始就拿寫入鎖，app 同時有人在寫也不會匯到一半才失敗
+    try:
+        # 1) 刪除：子表 -> 父表
+        cascaded = cascade_targets([name for name, *_, deleted_keys in plans if deleted_keys])
+        before = {name: missing_keys(conn, name) for name in cascaded}  # 之前就被 app 刪掉的不算
+        for name, _, _, _, _, _, deleted_keys in reversed(plans):
+            if deleted_keys:
+                conn.executemany(DELETE_SQL[name], [split_key(k) for k in deleted_keys])
+                conn.executemany(
+                    "DELETE FROM import_rows WHERE table_name=? AND natural_key=?;",
+                    [(name, k) for k in deleted_keys],
+                )
+        errors = []
+        for name in cascaded:
+            lost = sorted(missing_keys(conn, name) - before[name])
+            if lost:
+                errors.append(
+                    f"{CSV_FILES[name]} 還有 {len(lost)} 列屬於被刪掉的資料，"
+                    f"前幾筆 {[split_key(k) for k in lost[:ERROR_PREVIEW]]}"
+                )
+        raise_errors(errors)
+
+        # 2) 修改 + 新增：父表 -> 子表；兩種列一起先過暫存表的檢查，才開始寫
+        create_stage(conn)
+        for name, sha, df, state, inserted_idx, updated_idx, _ in plans:
+            if inserted_idx or updated_idx:
+                stage(conn, name, df.loc[inserted_idx + updated_idx])
+                raise_errors(validate(conn, [name]))
+            if updated_idx and UPDATE_SQL[name]:
+                sql, cols = UPDATE_SQL[name]
+                part = df.loc[updated_idx]
+                bulk_insert(conn, sql, [column(part, c) for c in cols])
+            if inserted_idx or updated_idx:
+                promote(conn, name)  # 只會新增 inserted 的列：updated 的自然鍵已經在了
+            save_state(conn, name, sha, state.loc[inserted_idx + updated_idx], replace=False)
+
+        violations = conn.execute("PRAGMA foreign_key_check;").fetchall()
+        if violations:
+            raise ValueError(f"外鍵檢查失敗（CSV 之間對不上？）：前幾筆 {violations[:10]}")
 
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA synchronous = FULL;")
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--wipe", action="store_true", help="匯入前先清空資料表（保留結構）")
-    args = parser.parse_args()
+    return result
 
-    if not DB_PATH.exists():
-        raise FileNotFoundError("找不到 kpop.db。請先執行：python init_db.py")
 
-    conn = connect()
+STREAM_CHUNK_ROWS = 50_000  # 分塊匯入每塊幾列：記憶體大約就是一塊 DataFrame + 一塊暫存表
+
+
+def run_stream(conn: sqlite3.Connection, wipe: bool = False, chunk_size: int = STREAM_CHUNK_ROWS,
+               progress=None) -> list[tuple[str, int, float]]:
+    """
+    分塊匯入：每個 CSV 一次只讀 chunk_size 列，驗證 + 寫入 + 記斷點在同一個交易裡，
+    記憶體只跟一塊的大小有關（外鍵在 SQL 裡對，不用把父表讀進來）。中斷（或某一塊驗證失敗）後再跑一次就從斷點繼續；
+    CSV 內容改過（sha256 不同）的話那個檔案從頭來：已經寫過的列照自然鍵略過，不會重複
+    （UNIQUE 的表靠 INSERT OR IGNORE，songs 在 PROMOTE_SQL 裡自己去重）。
+    每一塊的資料跟它的斷點在同一個交易裡 commit，不會有「資料寫了、斷點沒記」的情況。
+    wipe=True：清空資料表與斷點，從頭匯入。
+    progress(name, rows_done)：每寫完一塊呼叫一次。
+    回傳 [(table, 新增筆數, 秒數), ...]（從斷點繼續時只算這次跑的部分）
+    """
+    conn.executescript(SYNC_SCHEMA_SQL)
+    for p in IMPORT_PRAGMAS:
+        conn.execute(p)
+    # 每塊都會 commit，要能從斷點繼續就不能關掉 fsync（WAL + NORMAL：當機最多少掉最後一塊，不會壞檔）
+    conn.execute("PRAGMA synchronous = NORMAL;")
+
+    timings = []
     try:
-        if args.wipe:
+        if wipe:
+            conn.execute("BEGIN IMMEDIATE;")
             reset_db(conn)
+            for t in ["import_rows", "import_files", "import_checkpoints"]:
+                conn.execute(f"DELETE FROM {t};")
+            conn.commit()
+
+        for name, fn in IMPORT_STEPS:
+            sha = file_sha256(name)
+            row = conn.execute(
+                "SELECT file_sha256, rows_done, finished FROM import_checkpoints WHERE table_name=?;", (name,)
+            ).fetchone()
+            if row and row[0] == sha and row[2]:
+                continue
+            done = row[1] if row and row[0] == sha else 0
+
+            t0 = time.perf_counter()
+            n = 0
+            for chunk in iter_csv(name, chunk_size, skip_rows=done):
+                conn.execute("BEGIN IMMEDIATE;")
+                try:
+                    n += fn(conn, chunk)
+                    save_state(conn, name, None, row_state(name, chunk), replace=False)
+                    done += len(chunk)
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO import_checkpoints (table_name, file_sha256, rows_done, finished, updated_at)
+                        VALUES (?, ?, ?, 0, datetime('now'));
+                        """,
+                        (name, sha, done),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                if progress:
+                    progress(name, done)
+
+            conn.execute("BEGIN IMMEDIATE;")
+            conn.execute(
+                "UPDATE import_checkpoints SET finished=1, rows_done=?, updated_at=datetime('now') WHERE table_name=?;",
+                (done, name),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO import_files (table_name, file_sha256, imported_at) VALUES (?, ?, datetime('now'));",
+                (name, sha),
+            )
+            conn.commit()
+            timings.append((name, n, time.perf_counter() - t0))
+
+        violations = conn.execute("PRAGMA foreign_key_check;").fetchall()
+        if violations:
+            raise ValueError(f"外鍵檢查失敗：前幾筆 {violations[:10]}")
+        conn.execute("DELETE FROM import_checkpoints;")
+        conn.execute("DELETE FROM fuzzy_log;")
+        analyze(conn)
+        conn.commit()
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA synchronous = FULL;")
+
+    return timings
 
-        # 依外鍵順序匯入
-        import_companies(conn)
-        import_groups(conn)
-        import_members(conn)
-        import_nationalities(conn)
-        import_member_nationalities(conn)
-        import_releases(conn)
-        import_songs(conn)
 
+def run_images(conn: sqlite3.Connection) -> dict:
+    """匯入後的圖片清單階段：平行檢查 image_path（只重看新的 / 有變動的檔案），自己一個交易"""
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        stats = image_manifest.sync(conn)
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return stats
+
+
+def print_images(conn: sqlite3.Connection, stats: dict, seconds: float) -> None:
+    print(
+        f"🖼️ 圖片清單（{seconds:.3f}s）：引用 {stats['referenced']} 個路徑，重新檢查 {stats['checked']}，"
+        f"正常 {stats['ok']}，找不到 {stats['missing']}，無法讀取 {stats['unreadable']}"
+    )
+    for path, status, error in image_manifest.broken(conn):
+        print(f"  ⚠️ {status}: {path}" + (f"（{error}）" if error else ""))
+
+
+# -------------------------
+# --shadow：另建新資料庫再整份換上去
+# -------------------------
+def shadow_path(db_path: Path) -> Path:
+    """新資料庫放在正式資料庫旁邊（同一個檔案系統）"""
+    return db_path.with_name(f".{db_path.name}.{os.getpid()}.shadow")
+
+
+def table_names(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+
+
+def live_version(conn: sqlite3.Connection):
+    """
+    正式資料庫的資料版本：各表的 table_versions（app 的每個寫入都會動到，PRAGMA optimize 之類的不算）；
+    舊版資料庫還沒有這張表就用 PRAGMA data_version（要同一條連線：別的連線 commit 過就會變）
+    """
+    if "table_versions" in table_names(conn):
+        return conn.execute("SELECT table_name, version FROM table_versions ORDER BY table_name;").fetchall()
+    return conn.execute("PRAGMA data_version;").fetchone()[0]
+
+
+def copy_indexes(live: sqlite3.Connection, conn: sqlite3.Connection) -> list[str]:
+    """正式資料庫上另外建的索引（例如 index_advisor.py --apply 建的）新的資料庫也要有，回傳補了哪些"""
+    have = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index';")}
+    added = []
+    for name, sql in live.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL;"):
+        if name in have:
+            continue
+        try:
+            conn.execute(sql)
+        except sqlite3.OperationalError:
+            continue  # 建在已經不存在的表 / 欄位上
+        added.append(name)
+    return added
+
+
+def carry_versions(live: sqlite3.Connection, conn: sqlite3.Connection) -> None:
+    """
+    table_versions 跟 fuzzy_log 的序號接著正式資料庫往上加，不能從 0 重來：
+    app 的快取 key、api.py 的 ETag、模糊搜尋索引都靠「號碼變了」知道資料換過。
+    新的號碼 = 正式資料庫的 + 新資料庫自己的 + 1（自己的至少是匯入的列數）：
+    讀完舊號碼到真正換上之間 app 又寫了幾筆，也不會剛好撞號。
+    正式資料庫是加上這些表之前的舊版本的話，就沒有號碼可以接（新的資料庫照自己的號碼）。
+    """
+    have = table_names(live)
+    if "table_versions" in have:
+        old = live.execute("SELECT table_name, version FROM table_versions;").fetchall()
+        conn.executemany(
+            "UPDATE table_versions SET version = version + ? + 1 WHERE table_name = ?;",
+            [(v, t) for t, v in old],
+        )
+    top = None
+    if "sqlite_sequence" in have:
+        top = live.execute("SELECT seq FROM sqlite_sequence WHERE name = 'fuzzy_log';").fetchone()
+    own = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'fuzzy_log';").fetchone()
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'fuzzy_log';")
+    conn.execute(
+        "INSERT INTO sqlite_sequence (name, seq) VALUES ('fuzzy_log', ?);",
+        ((top[0] if top else 0) + (own[0] if own else 0) + 1,),
+    )
 
-        summary = {}
-        for t in ["companies", "groups", "members", "nationalities", "member_nationalities", "releases", "songs"]:
-            n = conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
-            summary[t] = n
 
-        print("✅ 匯入完成！表格筆數：")
-        for k, v in summary.items():
-            print(f"  - {k}: {v}")
+def publish(shadow: Path, db_path: Path = DB_PATH, check=None) -> None:
+    """
+    把建好的新資料庫換上去。
+    正式資料庫是 WAL 模式、app 手上還開著連線，不能直接 rename 檔案（新檔會配到舊的 -wal / -shm）；
+    改用 backup API 把整份內容在「一個寫入交易」裡蓋過去：
+    正在讀的交易看到的還是舊的，下一個交易開始就是新的，不會看到清空或匯到一半。
+    check()：蓋過去之前最後一刻呼叫，丟例外就不換
+    （backup 要自己拿寫入鎖，沒辦法先鎖住再檢查：檢查到真的開始複製之間還是有極短的空檔）
+    """
+    if not db_path.exists():
+        os.replace(shadow, db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            enable_wal(conn)
+        finally:
+            conn.close()
+        return
+
+    src = sqlite3.connect(shadow)
+    dst = sqlite3.connect(db_path, timeout=PUBLISH_TIMEOUT)
+    try:
+        carry_versions(dst, src)  # 換上去之前最後一刻才讀舊號碼
+        src.commit()
+        if check is not None:
+            check()
+        src.backup(dst)
+        dst.execute("PRAGMA wal_checkpoint(PASSIVE);")
+    finally:
+        src.close()
+        dst.close()
+
+
+def run_shadow(db_path: Path = DB_PATH, images: bool = True) -> tuple[list, dict | None, float]:
+    """
+    在正式資料庫旁邊從 SCHEMA_SQL 建一份新的、完整匯入 + 驗證 + ANALYZE，全部沒問題才換上去；
+    任何一步失敗，正式資料庫完全沒動到。
+    建的期間 app 寫過正式資料庫的話（換上去會把那些寫入蓋掉）也不換，丟 RuntimeError。
+    圖片清單沿用正式資料庫的檢查結果（只重看有變動的檔案），另外建過的索引也一起帶過去。
+    回傳 (run_import 的 timings, 圖片清單統計 | None, 圖片清單秒數)
+    """
+    shadow = shadow_path(db_path)
+    shadow.unlink(missing_ok=True)
+    live = sqlite3.connect(db_path) if db_path.exists() else None
+    start = live_version(live) if live is not None else None
+
+    def unchanged():
+        if live_version(live) != start:
+            raise RuntimeError(
+                "建新資料庫期間 app 寫入了正式資料庫，換上去會把那些寫入蓋掉，所以沒有換；"
+                "先用 export_to_csv.py --out data 把目前的資料寫回 CSV，再重跑 --shadow"
+            )
+
+    try:
+        conn = sqlite3.connect(shadow)
+        try:
+            for p in SHADOW_PRAGMAS:
+                conn.execute(p)
+            conn.executescript(SCHEMA_SQL)
+            timings = run_import(conn)
+            conn.execute("PRAGMA synchronous = OFF;")  # run_import 結束時會改回 FULL
+
+            image_stats, image_s = None, 0.0
+            conn.execute("BEGIN;")
+            if live is not None:
+                if copy_indexes(live, conn):
+                    analyze(conn)
+                if "images" in table_names(live):  # 舊版的正式資料庫還沒有圖片清單：全部重新檢查
+                    cols = ", ".join(image_manifest.MANIFEST_COLS)
+                    conn.executemany(
+                        f"INSERT INTO images ({cols}) VALUES ({', '.join('?' for _ in image_manifest.MANIFEST_COLS)});",
+                        live.execute(f"SELECT {cols} FROM images;"),
+                    )
+            if images:
+                t0 = time.perf_counter()
+                image_stats = image_manifest.sync(conn)
+                image_s = time.perf_counter() - t0
+            conn.commit()
+
+            check = conn.execute("PRAGMA quick_check;").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"新的資料庫檢查失敗：{check}")
+        finally:
+            conn.close()
+        publish(shadow, db_path, check=unchanged if live is not None else None)
+    finally:
+        if live is not None:
+            live.close()
+        shadow.unlink(missing_ok=True)
+
+    return timings, image_stats, image_s
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--wipe", action="store_true", help="匯入前先清空資料表（保留結構）")
+    mode.add_argument("--incremental", action="store_true", help="只套用 CSV 跟上次匯入之間的差異")
+    mode.add_argument("--shadow", action="store_true",
+                      help="完整重匯，但在旁邊另建新的資料庫，驗證完才整份換上去（讀的人不會看到清空 / 匯到一半）")
+    parser.add_argument("--stream", action="store_true",
+                        help="分塊匯入（超大 CSV 用，記憶體固定）；中斷後再跑一次會從斷點繼續")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_ROWS, help="--stream 每塊幾列")
+    parser.add_argument("--skip-images", action="store_true", help="不更新圖片清單（不檢查圖片檔）")
+    args = parser.parse_args()
+    if args.stream and (args.incremental or args.shadow):
+        parser.error("--stream 不能跟 --incremental / --shadow 一起用")
+
+    if not DB_PATH.exists() and not args.shadow:
+        raise FileNotFoundError("找不到 kpop.db。請先執行：python init_db.py")
+
+    image_stats = None
+    if args.shadow:
+        t0 = time.perf_counter()
+        timings, image_stats, image_s = run_shadow(DB_PATH, images=not args.skip_images)
+        total = time.perf_counter() - t0
+        print(f"🔁 新的資料庫已換上：{DB_PATH.resolve()}")
+
+    conn = connect()
+    try:
+        if args.incremental:
+            t0 = time.perf_counter()
+            result = run_incremental(conn)
+            total = time.perf_counter() - t0
+
+            print(f"✅ 增量匯入完成（{total:.3f}s）：")
+            for name, r in result.items():
+                if r["skipped"]:
+                    print(f"  - {name}: 未變更，略過")
+                else:
+                    print(f"  - {name}: +{r['inserted']} ~{r['updated']} -{r['deleted']}")
+        else:
+            if not args.shadow:
+                t0 = time.perf_counter()
+                if args.stream:
+                    def progress(name, done):
+                        print(f"  … {name}: {done:,} 列（{time.perf_counter() - t0:.1f}s）", flush=True)
+
+                    timings = run_stream(conn, wipe=args.wipe, chunk_size=args.chunk_size, progress=progress)
+                else:
+                    timings = run_import(conn, wipe=args.wipe)
+                total = time.perf_counter() - t0
+
+            print("✅ 匯入完成！新增筆數 / 速度：")
+            for name, n, dt in timings:
+                print(f"  - {name}: {n} 筆，{dt:.3f}s（{n / dt if dt > 0 else 0:,.0f} rows/s）")
+            n_all = sum(n for _, n, _ in timings)
+            print(f"  = 共 {n_all} 筆，{total:.3f}s（{n_all / total if total > 0 else 0:,.0f} rows/s）")
+
+            print("表格筆數：")
+            for name, _ in IMPORT_STEPS:
+                n = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                print(f"  - {name}: {n}")
+
+        if image_stats is not None:
+            print_images(conn, image_stats, image_s)  # --shadow 已經在新的資料庫裡更新過了
+        elif not args.skip_images and not args.shadow:
+            t0 = time.perf_counter()
+            stats = run_images(conn)
+            print_images(conn, stats, time.perf_counter() - t0)
 
     finally:
         conn.close()
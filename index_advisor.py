@@ -0,0 +1,522 @@
+# index_advisor.py
+# 索引顧問：重播一組查詢，從 EXPLAIN QUERY PLAN 找出要另外排序（USE TEMP B-TREE FOR ORDER BY）
+# 或整張表掃描的地方，提出「等號欄位 + 排序欄位（排序規則 / 方向都對得上）」的索引，可選 covering 版本
+# 每個候選都先在資料庫的快照上試建、量前後時間，計畫真的變好、也沒有變慢的才建議
+#
+# 查詢來源：
+#   - 預設：app 實際用的查詢（queries.py），參數從資料庫裡挑真的存在的值
+#   - --workload：app 管理者面板「SQL 統計」匯出的 JSON（每種查詢第一次執行的參數，只重播 SELECT）
+#
+# --apply：在正式資料庫上建索引，一個索引一個寫入交易（走 db_pool 的 BEGIN IMMEDIATE + 重試），最後 ANALYZE。
+#   WAL 模式下讀取完全不受影響；寫入只會等正在建的那一個索引
+#
+# 用法：
+#   python index_advisor.py
+#   python index_advisor.py --workload sql_stats.json --repeat 50
+#   python index_advisor.py --apply --out advisor_report.json
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from db_pool import ConnectionPool
+from init_db import analyze
+from query_stats import explain, full_scans
+from queries import (
+    COMPANIES_SQL,
+    COUNT_CAP,
+    GROUP_PROFILE_SQL,
+    GROUP_STATS_SQL,
+    GROUPS_SQL,
+    MEMBER_DETAIL_SQL,
+    NATIONALITIES_SQL,
+    PAGE_SIZE,
+    RELEASES_FOR_GROUP_SQL,
+    SONGS_BY_VIDEO_SQL,
+    search_groups_sql,
+    search_members_sql,
+    search_songs_sql,
+)
+
+DB_PATH = Path("kpop.db")
+REPEAT = 20          # 每個查詢量幾次（取 median）
+NOISE = 0.10         # 建索引後慢了超過這個比例（再加 MIN_DELTA_MS）才算變慢：小資料庫的時間本來就有誤差
+MIN_DELTA_MS = 0.05
+MAX_COVERING = 4     # covering 版本最多多帶幾個欄位，再多索引太肥
+
+_IDENT = r"[A-Za-z_]\w*"
+_KEYWORDS = {"ON", "WHERE", "JOIN", "LEFT", "INNER", "CROSS", "ORDER", "GROUP", "LIMIT", "USING", "AND", "AS"}
+_TABLE_RE = re.compile(rf"\b(?:FROM|JOIN)\s+({_IDENT})(?:\s+(?:AS\s+)?({_IDENT}))?", re.IGNORECASE)
+_ORDER_RE = re.compile(r"\bORDER BY\s+(.+?)(?=\)|\bLIMIT\b|;|$)", re.IGNORECASE | re.DOTALL)
+_TERM_RE = re.compile(
+    rf"^(?:({_IDENT})\.)?({_IDENT})(?:\s+COLLATE\s+({_IDENT}))?(?:\s+(ASC|DESC))?$", re.IGNORECASE
+)
+_EQ_RE = re.compile(
+    rf"(?:({_IDENT})\.)?({_IDENT})\s*(?<![<>!])=\s*(?:\?|{_IDENT}\.{_IDENT}|'[^']*'|\d+)", re.IGNORECASE
+)
+_SORT_RE = re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY")
+_COLLATE_RE = re.compile(rf"\bCOLLATE\s+[\"`\[]?({_IDENT})", re.IGNORECASE)
+_TABLE_CONSTRAINTS = {"CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK", "FOREIGN"}
+
+
+# ---------------------------
+# 查詢組合
+# ---------------------------
+def _one(conn: sqlite3.Connection, sql: str, default=None):
+    row = conn.execute(sql).fetchone()
+    return row[0] if row and row[0] is not None else default
+
+
+def canonical_workload(conn: sqlite3.Connection) -> list:
+    """app 的下拉選單、詳細頁、搜尋頁查詢；[(名稱, sql, params), ...]"""
+    group_id = _one(conn, "SELECT group_id FROM group_stats ORDER BY release_count DESC LIMIT 1;", 1)
+    group = _one(conn, f"SELECT group_name FROM groups WHERE group_id = {int(group_id)};", "")
+    company = _one(conn, "SELECT c.company_name FROM companies c JOIN groups g ON g.company_id = c.company_id LIMIT 1;")
+    member_id = _one(conn, "SELECT MIN(member_id) FROM members;", 1)
+    nationality = _one(
+        conn, "SELECT nationality_code FROM member_nationalities GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1;", "KR"
+    )
+    video = _one(conn, "SELECT youtube_video_id FROM songs WHERE youtube_video_id IS NOT NULL LIMIT 1;", "")
+    word = _one(conn, "SELECT substr(title, 1, 4) FROM songs WHERE length(title) >= 4 LIMIT 1;", "love")
+    page = PAGE_SIZE + 1
+
+    return [
+        ("lookup.companies", COMPANIES_SQL, ()),
+        ("lookup.groups", GROUPS_SQL, ()),
+        ("lookup.nationalities", NATIONALITIES_SQL, ()),
+        ("lookup.releases_for_group", RELEASES_FOR_GROUP_SQL, (group_id,)),
+        ("detail.group_profile", GROUP_PROFILE_SQL, (group_id,)),
+        ("detail.group_stats", GROUP_STATS_SQL, (group_id,)),
+        ("detail.member", MEMBER_DETAIL_SQL, (member_id,)),
+        ("detail.songs_by_video", SONGS_BY_VIDEO_SQL, (video,)),
+        ("search.groups.all", *search_groups_sql("", limit=page)),
+        ("search.groups.fts", *search_groups_sql(group[:4], limit=page)),
+        ("search.groups.company", *search_groups_sql("", company=company, limit=page)),
+        ("search.groups.by_songs", *search_groups_sql("", order="songs", limit=page)),
+        ("search.members.all", *search_members_sql("", limit=page)),
+        ("search.members.group", *search_members_sql("", group=group, limit=page)),
+        ("search.members.nationality", *search_members_sql("", nationality=nationality, limit=page)),
+        ("search.songs.all", *search_songs_sql("", limit=page)),
+        ("search.songs.fts", *search_songs_sql(word, limit=page)),
+        ("search.songs.group", *search_songs_sql("", group=group, limit=page)),
+        ("search.songs.lang", *search_songs_sql("", lang="JP", limit=page)),
+        ("count.songs.all", *search_songs_sql("", count_cap=COUNT_CAP)),
+        ("count.members.nationality", *search_members_sql("", nationality=nationality, count_cap=COUNT_CAP)),
+    ]
+
+
+def recorded_workload(path: Path) -> tuple:
+    """
+    SQL 統計匯出的 JSON（query_stats.QueryStats.to_json）。
+    回傳 ([(名稱, sql, params), ...], [(sql, 略過的原因), ...])
+    """
+    data = json.loads(path.read_text(encoding="utf-8"))
+    queries, skipped = [], []
+    for i, q in enumerate(data.get("queries", []), 1):
+        sql, params = q["sql"], q.get("params")
+        if not re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+            skipped.append((sql, "不是 SELECT"))
+        elif "?, ..." in sql:
+            skipped.append((sql, "IN 清單被合併成同一個形狀，無法重播"))
+        elif params is None and "?" in sql:
+            skipped.append((sql, "沒有記錄參數"))
+        else:
+            queries.append((f"recorded.{i}", sql, tuple(params or ())))
+    return queries, skipped
+
+
+# ---------------------------
+# 量測
+# ---------------------------
+def measure(conn: sqlite3.Connection, sql: str, params, repeat: int) -> float:
+    """跑 repeat 次（先暖身一次），回傳 median 秒數"""
+    conn.execute(sql, params).fetchall()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def plan_issues(plan: list, sql: str) -> list:
+    """計畫裡要改善的地方：暫存 B-tree 排序、沒走索引的整張表掃描（子查詢的 SCAN x 不算）"""
+    tables = _aliases(sql)
+    issues = [line.strip() for line in plan if _SORT_RE.search(line)]
+    issues += [f"SCAN {t}" for t in full_scans(plan) if t.lower() in tables]
+    return issues
+
+
+# ---------------------------
+# 候選索引
+# ---------------------------
+def _column_defs(create_sql: str) -> list:
+    """CREATE TABLE 括號裡的每一段定義：照最外層的逗號切（CHECK (...)、字串裡的逗號不算）"""
+    body = create_sql[create_sql.index("(") + 1:create_sql.rindex(")")]
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(body):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`[":
+            quote = "]" if ch == "[" else ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(body[start:i].strip())
+            start = i + 1
+    parts.append(body[start:].strip())
+    return parts
+
+
+def declared_collations(conn: sqlite3.Connection, table: str) -> dict:
+    """欄位 -> CREATE TABLE 裡宣告的排序規則（有寫 COLLATE 的才有）；PRAGMA table_info 沒有這個資訊"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;", (table,)).fetchone()
+    out = {}
+    for part in _column_defs(row[0]) if row and row[0] else []:
+        words = part.split(None, 1)
+        if not words or words[0].upper() in _TABLE_CONSTRAINTS:
+            continue
+        m = _COLLATE_RE.search(words[1]) if len(words) > 1 else None
+        if m:
+            out[words[0].strip('"`[]').lower()] = m.group(1).upper()
+    return out
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> dict:
+    """
+    欄位 -> 宣告的排序規則（沒寫就是 BINARY）；INTEGER PRIMARY KEY（rowid）不列，索引本來就帶著。
+    WHERE col = ? 跟沒寫 COLLATE 的 ORDER BY 都照宣告的規則比，候選索引要用一樣的規則才用得到
+    """
+    declared = declared_collations(conn, table)
+    cols = {}
+    for _, name, ctype, _, _, pk in conn.execute(f"PRAGMA table_info({table});"):
+        if pk == 1 and ctype.upper() == "INTEGER":
+            continue
+        cols[name.lower()] = declared.get(name.lower(), "BINARY")
+    return cols
+
+
+def existing_keys(conn: sqlite3.Connection, table: str) -> list:
+    """表上每個索引的鍵：[((欄位, 排序規則, desc), ...), ...]；運算式索引不列"""
+    keys = []
+    for idx in conn.execute(f"PRAGMA index_list({table});").fetchall():
+        if idx[4]:
+            continue  # partial index：只涵蓋部分的列
+        cols = [
+            (r[2].lower(), r[4].upper(), bool(r[3]))
+            for r in conn.execute(f"PRAGMA index_xinfo({idx[1]});")
+            if r[5] and r[2] is not None
+        ]
+        if cols:
+            keys.append(tuple(cols))
+    return keys
+
+
+def _aliases(sql: str) -> dict:
+    out = {}
+    for table, alias in _TABLE_RE.findall(sql):
+        out[table.lower()] = table.lower()
+        if alias and alias.upper() not in _KEYWORDS:
+            out[alias.lower()] = table.lower()
+    return out
+
+
+def _split_terms(text: str) -> list:
+    return [t.strip() for t in text.split(",") if t.strip()]
+
+
+def candidates(conn: sqlite3.Connection, sql: str, plan: list) -> list:
+    """
+    從 SQL 文字和計畫推出候選索引：[(table, ((欄位, 排序規則, desc), ...)), ...]
+    - 每個 ORDER BY（包含子查詢）：排序欄位都屬於同一張表、都是單純欄位時，
+      索引 = 那一段 WHERE 裡這張表的等號欄位 + 排序欄位；另外試一個 covering 版本
+    - 計畫裡整張表掃描的表：索引 = 那張表的等號欄位
+    算不出來（運算式排序、跨表排序）的就不提，寧可少提不要亂提。
+    """
+    aliases = _aliases(sql)
+    columns = {}
+
+    def cols_of(table):
+        if table not in columns:
+            columns[table] = table_columns(conn, table)
+        return columns[table]
+
+    def eq_cols(segment: str, table: str, default_table: str) -> list:
+        out = []
+        for alias, col in _EQ_RE.findall(segment):
+            t = aliases.get(alias.lower()) if alias else default_table
+            col = col.lower()
+            if t == table and col in cols_of(table) and all(c[0] != col for c in out):
+                out.append((col, cols_of(table)[col], False))
+        return out
+
+    found = []
+    for m in _ORDER_RE.finditer(sql):
+        head = sql[:m.start()]
+        from_at = max(head.upper().rfind("FROM "), 0)
+        segment = sql[from_at:m.start()]
+        first = _TABLE_RE.search(segment)
+        if not first:
+            continue
+        default_table = first.group(1).lower()
+
+        terms, table = [], None
+        for term in _split_terms(m.group(1)):
+            t = _TERM_RE.match(term)
+            if not t:
+                break
+            alias, col, coll, direction = t.groups()
+            tt = aliases.get(alias.lower()) if alias else default_table
+            if tt is None or (table and tt != table) or col.lower() not in cols_of(tt):
+                break
+            table = tt
+            terms.append((col.lower(), (coll or cols_of(tt)[col.lower()]).upper(), (direction or "").upper() == "DESC"))
+        else:
+            if not terms:
+                continue
+            eq = [c for c in eq_cols(segment, table, default_table) if c[0] not in {t[0] for t in terms}]
+            key = tuple(eq + terms)
+            found.append((table, key))
+
+            # covering：這一段 SELECT 用到的、同一張表的其他欄位也放進索引，不用回表
+            select_at = head.upper().rfind("SELECT ")
+            picked = _split_terms(sql[select_at + 7:from_at]) if select_at >= 0 else []
+            extra = []
+            for p in picked:
+                t = _TERM_RE.match(p)
+                if not t:
+                    extra = None
+                    break
+                alias, col = t.group(1), t.group(2).lower()
+                if (aliases.get(alias.lower()) if alias else default_table) == table and col in cols_of(table) \
+                        and col not in {k[0] for k in key}:
+                    extra.append((col, cols_of(table)[col], False))
+            if extra and len(extra) <= MAX_COVERING:
+                found.append((table, key + tuple(extra)))
+
+    for alias in full_scans(plan):
+        table = aliases.get(alias.lower(), alias.lower())
+        if table not in aliases.values():
+            continue
+        eq = eq_cols(sql, table, table)
+        if eq:
+            found.append((table, tuple(eq)))
+
+    out = []
+    for c in found:
+        if c not in out:
+            out.append(c)
+    return out
+
+
+def redundant(key: tuple, existing: list) -> bool:
+    """已經有索引的鍵以 key 開頭（排序規則 / 方向都一樣）：建了也不會更好"""
+    return any(e[:len(key)] == key for e in existing)
+
+
+def index_name(table: str, key: tuple) -> str:
+    parts = []
+    for col, coll, desc in key:
+        parts.append(col + ("" if coll == "BINARY" else f"_{coll.lower()}") + ("_desc" if desc else ""))
+    return f"idx_{table}_" + "_".join(parts)
+
+
+def index_sql(table: str, key: tuple) -> str:
+    cols = ", ".join(
+        col + ("" if coll == "BINARY" else f" COLLATE {coll}") + (" DESC" if desc else "")
+        for col, coll, desc in key
+    )
+    return f"CREATE INDEX IF NOT EXISTS {index_name(table, key)} ON {table}({cols});"
+
+
+# ---------------------------
+# 評估
+# ---------------------------
+def snapshot(db_path: Path) -> Path:
+    """資料庫的快照（backup API，一致的時間點），放在同一個目錄：試建索引不會動到正式資料庫"""
+    fd, tmp = tempfile.mkstemp(dir=Path(db_path).resolve().parent, suffix=".advisor.db")
+    os.close(fd)
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+    return Path(tmp)
+
+
+def advise(db_path: Path, workload: list, repeat: int = REPEAT) -> dict:
+    """
+    在快照上：量每個查詢現在的計畫 / 時間 → 逐一試建候選索引（整組查詢都重看一次計畫）→
+    留下讓提出它的查詢計畫變好、又沒有讓任何查詢變慢的 →
+    全部一起建好再量一次。回傳報告（建議的索引 + 每個查詢的前後對照）。
+    """
+    snap = snapshot(db_path)
+    conn = sqlite3.connect(snap)
+    try:
+        # 快照不用 WAL：試建 / 刪除索引會讓 WAL 越長越大，後面量的時間會被拖慢
+        conn.execute("PRAGMA journal_mode = DELETE;")
+        analyze(conn)
+        conn.commit()
+
+        before = {}
+        proposals = {}   # (table, key) -> 提出它的查詢
+        for name, sql, params in workload:
+            plan = explain(conn, sql, params)
+            before[name] = {"plan": plan, "issues": plan_issues(plan, sql), "ms": measure(conn, sql, params, repeat) * 1000}
+            if before[name]["issues"]:
+                for cand in candidates(conn, sql, plan):
+                    proposals.setdefault(cand, []).append(name)
+
+        accepted = []
+        rejected = []
+        for (table, key), names in proposals.items():
+            ddl = index_sql(table, key)
+            if redundant(key, existing_keys(conn, table)):
+                rejected.append({"sql": ddl, "reason": "已經有一樣開頭的索引"})
+                continue
+            conn.execute(ddl)
+            conn.execute(f"ANALYZE {index_name(table, key)};")
+            helped, hurt = [], []
+            for name, sql, params in workload:
+                plan = explain(conn, sql, params)
+                if plan == before[name]["plan"]:
+                    continue  # 計畫沒變：時間差只是誤差
+                ms = measure(conn, sql, params, repeat) * 1000
+                slower = ms > before[name]["ms"] * (1 + NOISE) + MIN_DELTA_MS
+                if name in names and len(plan_issues(plan, sql)) < len(before[name]["issues"]) and not slower:
+                    helped.append(name)
+                elif slower:
+                    hurt.append(name)
+            conn.execute(f"DROP INDEX {index_name(table, key)};")
+            conn.commit()
+            if hurt:
+                rejected.append({"sql": ddl, "reason": f"讓別的查詢變慢：{', '.join(hurt)}"})
+            elif helped:
+                accepted.append({"table": table, "key": key, "sql": ddl, "queries": helped})
+            else:
+                rejected.append({"sql": ddl, "reason": "計畫沒變好或變慢"})
+
+        # 同一個查詢有好幾個候選都有效（例如一般版和 covering 版）：只留幫到最多查詢、欄位最少的
+        accepted.sort(key=lambda a: (-len(a["queries"]), len(a["key"])))
+        chosen, covered = [], set()
+        for a in accepted:
+            if set(a["queries"]) - covered:
+                chosen.append(a)
+                covered |= set(a["queries"])
+            else:
+                rejected.append({"sql": a["sql"], "reason": "其他候選已經涵蓋"})
+
+        for a in chosen:
+            conn.execute(a["sql"])
+        analyze(conn)
+        conn.commit()
+
+        results = []
+        for name, sql, params in workload:
+            plan = explain(conn, sql, params)
+            ms = measure(conn, sql, params, repeat) * 1000
+            results.append({
+                "name": name,
+                "before_ms": round(before[name]["ms"], 3),
+                "after_ms": round(ms, 3),
+                "speedup": round(before[name]["ms"] / ms, 2) if ms > 0 else None,
+                "issues_before": before[name]["issues"],
+                "issues_after": plan_issues(plan, sql),
+                "plan_before": before[name]["plan"],
+                "plan_after": plan,
+            })
+    finally:
+        conn.close()
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            Path(f"{snap}{suffix}").unlink(missing_ok=True)
+
+    return {
+        "indexes": [{"sql": a["sql"], "queries": a["queries"]} for a in chosen],
+        "rejected": rejected,
+        "queries": results,
+    }
+
+
+def apply(db_path: Path, statements: list) -> list:
+    """
+    在正式資料庫上建索引：一個索引一個 BEGIN IMMEDIATE 交易（拿不到寫入鎖會退避重試），
+    建完再 ANALYZE 一次。回傳每個索引花的秒數。
+    """
+    pool = ConnectionPool(db_path)
+    out = []
+    try:
+        for ddl in statements:
+            t0 = time.perf_counter()
+            pool.write(lambda conn, ddl=ddl: conn.execute(ddl))
+            out.append((ddl, time.perf_counter() - t0))
+        pool.write(analyze)
+    finally:
+        pool.close_idle()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--workload", type=Path, help="SQL 統計匯出的 JSON（預設用 app 的查詢組合）")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每個查詢量幾次")
+    parser.add_argument("--apply", action="store_true", help="把建議的索引建到資料庫上")
+    parser.add_argument("--out", type=Path, help="完整報告（含前後的 query plan）寫成 JSON")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        raise FileNotFoundError(f"找不到 {args.db}。請先執行：python init_db.py")
+
+    if args.workload:
+        workload, skipped = recorded_workload(args.workload)
+        for sql, reason in skipped:
+            print(f"  - 略過（{reason}）：{sql[:80]}")
+    else:
+        conn = sqlite3.connect(args.db)
+        try:
+            workload = canonical_workload(conn)
+        finally:
+            conn.close()
+    if not workload:
+        print("沒有可以重播的查詢。")
+        return
+
+    print(f"重播 {len(workload)} 個查詢（每個 {args.repeat} 次）...")
+    report = advise(args.db, workload, args.repeat)
+
+    print(f"\n{'query':32} {'before ms':>10} {'after ms':>10} {'x':>6}  issues")
+    for r in report["queries"]:
+        issues = "; ".join(r["issues_after"]) if r["issues_after"] else ("（已改善）" if r["issues_before"] else "")
+        print(f"{r['name'][:32]:32} {r['before_ms']:>10.3f} {r['after_ms']:>10.3f} {r['speedup'] or 0:>6.2f}  {issues}")
+
+    if report["indexes"]:
+        print("\n建議的索引：")
+        for a in report["indexes"]:
+            print(f"  {a['sql']}  -- {', '.join(a['queries'])}")
+    else:
+        print("\n沒有建議的索引。")
+    for r in report["rejected"]:
+        print(f"  ✗ {r['sql']}（{r['reason']}）")
+
+    if args.apply and report["indexes"]:
+        for ddl, seconds in apply(args.db, [a["sql"] for a in report["indexes"]]):
+            print(f"✅ {seconds:.2f}s  {ddl}")
+
+    if args.out:
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n報告已寫入：{args.out.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
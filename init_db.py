@@ -5,6 +5,10 @@
 import sqlite3
 from pathlib import Path
 
+import image_manifest
+import image_store
+import youtube
+
 DB_PATH = Path("kpop.db")
 
 SCHEMA_SQL = """
@@ -84,6 +88,7 @@ CREATE TABLE IF NOT EXISTS songs (
   release_id INTEGER NOT NULL,
   title TEXT NOT NULL,
   youtube_url TEXT,
+  youtube_video_id TEXT,  -- youtube_url 解析出來的影片 id（youtube.py），寫入 youtube_url 時一起寫
   FOREIGN KEY (release_id) REFERENCES releases(release_id)
     ON UPDATE CASCADE
     ON DELETE CASCADE
@@ -92,6 +97,8 @@ CREATE TABLE IF NOT EXISTS songs (
 -- 常用索引（加速 Join / 查詢）
 CREATE INDEX IF NOT EXISTS idx_groups_company_id ON groups(company_id);
 CREATE INDEX IF NOT EXISTS idx_groups_name ON groups(group_name);
+-- 下拉選單是 ORDER BY company_name COLLATE NOCASE：排序規則要一樣才用得到索引
+CREATE INDEX IF NOT EXISTS idx_companies_name_nocase ON companies(company_name COLLATE NOCASE);
 
 CREATE INDEX IF NOT EXISTS idx_members_group_id ON members(group_id);
 CREATE INDEX IF NOT EXISTS idx_members_stage_name ON members(stage_name);
@@ -100,8 +107,362 @@ CREATE INDEX IF NOT EXISTS idx_member_nationalities_member_id ON member_national
 CREATE INDEX IF NOT EXISTS idx_member_nationalities_nat_code ON member_nationalities(nationality_code);
 
 CREATE INDEX IF NOT EXISTS idx_releases_group_id ON releases(group_id);
+-- 某團的發行作品依日期、名稱排序（queries.RELEASES_FOR_GROUP_SQL），不用另外排序
+CREATE INDEX IF NOT EXISTS idx_releases_group_date ON releases(group_id, release_date, release_name COLLATE NOCASE);
 CREATE INDEX IF NOT EXISTS idx_songs_release_id ON songs(release_id);
 CREATE INDEX IF NOT EXISTS idx_songs_title ON songs(title);
+-- 找「同一支影片被哪幾首歌用」；沒有連結的歌不進索引
+CREATE INDEX IF NOT EXISTS idx_songs_youtube_video_id ON songs(youtube_video_id) WHERE youtube_video_id IS NOT NULL;
+
+-- 全文檢索（FTS5, trigram：支援任意子字串搜尋，至少 3 個字元）
+-- external content：不重複存資料，只存索引；由下面的 trigger 跟原表同步
+CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+  title,
+  content='songs', content_rowid='song_id', tokenize='trigram'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+  stage_name, real_name,
+  content='members', content_rowid='member_id', tokenize='trigram'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS groups_fts USING fts5(
+  group_name,
+  content='groups', content_rowid='group_id', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_songs_fts_ai AFTER INSERT ON songs BEGIN
+  INSERT INTO songs_fts(rowid, title) VALUES (new.song_id, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_songs_fts_ad AFTER DELETE ON songs BEGIN
+  INSERT INTO songs_fts(songs_fts, rowid, title) VALUES ('delete', old.song_id, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_songs_fts_au AFTER UPDATE OF title ON songs BEGIN
+  INSERT INTO songs_fts(songs_fts, rowid, title) VALUES ('delete', old.song_id, old.title);
+  INSERT INTO songs_fts(rowid, title) VALUES (new.song_id, new.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_members_fts_ai AFTER INSERT ON members BEGIN
+  INSERT INTO members_fts(rowid, stage_name, real_name) VALUES (new.member_id, new.stage_name, new.real_name);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_members_fts_ad AFTER DELETE ON members BEGIN
+  INSERT INTO members_fts(members_fts, rowid, stage_name, real_name) VALUES ('delete', old.member_id, old.stage_name, old.real_name);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_members_fts_au AFTER UPDATE OF stage_name, real_name ON members BEGIN
+  INSERT INTO members_fts(members_fts, rowid, stage_name, real_name) VALUES ('delete', old.member_id, old.stage_name, old.real_name);
+  INSERT INTO members_fts(rowid, stage_name, real_name) VALUES (new.member_id, new.stage_name, new.real_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_fts_ai AFTER INSERT ON groups BEGIN
+  INSERT INTO groups_fts(rowid, group_name) VALUES (new.group_id, new.group_name);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_groups_fts_ad AFTER DELETE ON groups BEGIN
+  INSERT INTO groups_fts(groups_fts, rowid, group_name) VALUES ('delete', old.group_id, old.group_name);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_groups_fts_au AFTER UPDATE OF group_name ON groups BEGIN
+  INSERT INTO groups_fts(groups_fts, rowid, group_name) VALUES ('delete', old.group_id, old.group_name);
+  INSERT INTO groups_fts(rowid, group_name) VALUES (new.group_id, new.group_name);
+END;
+"""
+
+FTS_TABLES = ["songs_fts", "members_fts", "groups_fts"]
+
+# 圖片清單：groups / members 引用的每個 image_path 檢查結果（由 image_manifest.py 維護）
+# app 顯示圖片先查這張表，不用每次 render 都去碰檔案系統
+SCHEMA_SQL += """
+CREATE TABLE IF NOT EXISTS images (
+  path TEXT PRIMARY KEY,
+  status TEXT NOT NULL CHECK (status IN ('ok', 'missing', 'unreadable')),
+  sha256 TEXT,
+  format TEXT,
+  width INTEGER,
+  height INTEGER,
+  bytes INTEGER,
+  mtime_ns INTEGER,
+  error TEXT,
+  checked_at TEXT NOT NULL
+);
+"""
+
+# 每張表一個版本號：有 INSERT / UPDATE / DELETE 就 +1（由 trigger 維護，跨 process 也準）
+# app 的快取 key 會帶上它依賴的表的版本號，寫入時只有相關的快取會失效
+VERSIONED_TABLES = [
+    "companies",
+    "groups",
+    "members",
+    "nationalities",
+    "member_nationalities",
+    "releases",
+    "songs",
+    "images",
+]
+
+SCHEMA_SQL += """
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+"""
+for _t in VERSIONED_TABLES:
+    SCHEMA_SQL += f"INSERT OR IGNORE INTO table_versions (table_name) VALUES ('{_t}');\n"
+    for _op, _suffix in [("INSERT", "ai"), ("UPDATE", "au"), ("DELETE", "ad")]:
+        SCHEMA_SQL += f"""
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_ver_{_suffix} AFTER {_op} ON {_t} BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE table_name = '{_t}';
+END;
+"""
+
+# 成員搜尋用的反正規化表：一列一位成員，團名 / 公司 / 國籍 / 排序 key 都先算好
+# 搜尋與成員詳細頁只查這張表；由下面的 trigger 跟 members / groups / companies / member_nationalities 同步
+def _nationalities_of(member_id_expr: str) -> str:
+    return f"""(SELECT GROUP_CONCAT(nationality_code, ',') FROM (
+      SELECT nationality_code FROM member_nationalities
+      WHERE member_id = {member_id_expr} ORDER BY nationality_code))"""
+
+MEMBER_SEARCH_SELECT = f"""
+SELECT m.member_id, m.group_id, m.stage_name, m.real_name, m.birth_date, m.image_path,
+       g.group_name, c.company_name, {_nationalities_of("m.member_id")},
+       lower(g.group_name), lower(m.stage_name)
+FROM members m
+JOIN groups g ON g.group_id = m.group_id
+LEFT JOIN companies c ON c.company_id = g.company_id
+"""
+
+SCHEMA_SQL += f"""
+CREATE TABLE IF NOT EXISTS member_search (
+  member_id INTEGER PRIMARY KEY,   -- = members.member_id
+  group_id INTEGER NOT NULL,
+  stage_name TEXT NOT NULL,
+  real_name TEXT,
+  birth_date TEXT,
+  image_path TEXT,
+  group_name TEXT NOT NULL,
+  company_name TEXT,
+  nationalities TEXT,              -- 'JP,KR'（依代碼排序，顯示用；篩選走 member_nationalities 的索引）
+  group_key TEXT NOT NULL,         -- lower(group_name)：排序用，等同 COLLATE NOCASE
+  stage_key TEXT NOT NULL          -- lower(stage_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_member_search_sort ON member_search(group_key, stage_key, member_id);
+CREATE INDEX IF NOT EXISTS idx_member_search_group_name ON member_search(group_name, stage_key, member_id);
+CREATE INDEX IF NOT EXISTS idx_member_search_group_id ON member_search(group_id, stage_key);
+CREATE INDEX IF NOT EXISTS idx_member_search_company ON member_search(company_name);
+
+CREATE TRIGGER IF NOT EXISTS trg_members_search_ai AFTER INSERT ON members BEGIN
+  INSERT OR REPLACE INTO member_search {MEMBER_SEARCH_SELECT} WHERE m.member_id = new.member_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_members_search_au AFTER UPDATE ON members BEGIN
+  DELETE FROM member_search WHERE member_id = old.member_id;
+  INSERT OR REPLACE INTO member_search {MEMBER_SEARCH_SELECT} WHERE m.member_id = new.member_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_members_search_ad AFTER DELETE ON members BEGIN
+  DELETE FROM member_search WHERE member_id = old.member_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_search_au AFTER UPDATE OF group_id, group_name, company_id ON groups BEGIN
+  UPDATE member_search
+  SET group_id = new.group_id,
+      group_name = new.group_name,
+      group_key = lower(new.group_name),
+      company_name = (SELECT company_name FROM companies WHERE company_id = new.company_id)
+  WHERE group_id = old.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_companies_search_au AFTER UPDATE OF company_name ON companies BEGIN
+  UPDATE member_search SET company_name = new.company_name WHERE company_name = old.company_name;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_companies_search_ad AFTER DELETE ON companies BEGIN
+  UPDATE member_search SET company_name = NULL WHERE company_name = old.company_name;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_member_nationalities_search_ai AFTER INSERT ON member_nationalities BEGIN
+  UPDATE member_search SET nationalities = {_nationalities_of("new.member_id")} WHERE member_id = new.member_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_member_nationalities_search_au AFTER UPDATE ON member_nationalities BEGIN
+  UPDATE member_search SET nationalities = {_nationalities_of("old.member_id")} WHERE member_id = old.member_id;
+  UPDATE member_search SET nationalities = {_nationalities_of("new.member_id")} WHERE member_id = new.member_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_member_nationalities_search_ad AFTER DELETE ON member_nationalities BEGIN
+  UPDATE member_search SET nationalities = {_nationalities_of("old.member_id")} WHERE member_id = old.member_id;
+END;
+"""
+
+# 每個團的統計（成員 / 發行 / 歌曲數、最早 / 最新發行日），由 trigger 維護，不用每次 COUNT(*)
+# 注意 ON DELETE CASCADE 的順序：父列先刪掉、再刪子列、最後才跑父表的 AFTER trigger，
+# 所以刪 release 時在 BEFORE trigger 先扣掉它的歌曲數（之後 cascade 刪歌時已經找不到所屬的團，不會重複扣）
+def _release_dates_of(group_id_expr: str) -> str:
+    return f"""first_release_date = (SELECT MIN(release_date) FROM releases WHERE group_id = {group_id_expr}),
+      latest_release_date = (SELECT MAX(release_date) FROM releases WHERE group_id = {group_id_expr})"""
+
+def _group_of_release(release_id_expr: str) -> str:
+    return f"(SELECT group_id FROM releases WHERE release_id = {release_id_expr})"
+
+GROUP_STATS_SELECT = """
+SELECT g.group_id,
+       (SELECT COUNT(*) FROM members m WHERE m.group_id = g.group_id),
+       (SELECT COUNT(*) FROM releases r WHERE r.group_id = g.group_id),
+       (SELECT COUNT(*) FROM songs s JOIN releases r ON s.release_id = r.release_id WHERE r.group_id = g.group_id),
+       (SELECT MIN(release_date) FROM releases r WHERE r.group_id = g.group_id),
+       (SELECT MAX(release_date) FROM releases r WHERE r.group_id = g.group_id)
+FROM groups g
+"""
+
+SCHEMA_SQL += f"""
+CREATE TABLE IF NOT EXISTS group_stats (
+  group_id INTEGER PRIMARY KEY,    -- = groups.group_id
+  member_count INTEGER NOT NULL DEFAULT 0,
+  release_count INTEGER NOT NULL DEFAULT 0,
+  song_count INTEGER NOT NULL DEFAULT 0,
+  first_release_date TEXT,
+  latest_release_date TEXT
+);
+
+-- 團體搜尋依名稱 / 數量排序時直接走索引，取一頁就停（-count：由大到小）
+CREATE INDEX IF NOT EXISTS idx_groups_name_nocase ON groups(group_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_group_stats_members ON group_stats(-member_count, group_id);
+CREATE INDEX IF NOT EXISTS idx_group_stats_releases ON group_stats(-release_count, group_id);
+CREATE INDEX IF NOT EXISTS idx_group_stats_songs ON group_stats(-song_count, group_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_stats_ai AFTER INSERT ON groups BEGIN
+  INSERT OR IGNORE INTO group_stats (group_id) VALUES (new.group_id);
+END;
+-- 改 group_id：ON UPDATE CASCADE 改子表時，子表的 trigger 是照舊 id 加減（那時 group_stats 還是舊 id），
+-- 結果對不上；cascade 跑完才輪到這個 trigger，直接照新 id 從原表重算一次（跟 rebuild_group_stats 同一個 SELECT）
+-- 舊資料庫裡是只搬 id 的舊版 trigger：先刪掉再建
+DROP TRIGGER IF EXISTS trg_groups_stats_au;
+CREATE TRIGGER trg_groups_stats_au AFTER UPDATE OF group_id ON groups BEGIN
+  DELETE FROM group_stats WHERE group_id IN (old.group_id, new.group_id);
+  INSERT INTO group_stats {GROUP_STATS_SELECT.strip()} WHERE g.group_id = new.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_groups_stats_ad AFTER DELETE ON groups BEGIN
+  DELETE FROM group_stats WHERE group_id = old.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_members_stats_ai AFTER INSERT ON members BEGIN
+  UPDATE group_stats SET member_count = member_count + 1 WHERE group_id = new.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_members_stats_au AFTER UPDATE OF group_id ON members BEGIN
+  UPDATE group_stats SET member_count = member_count - 1 WHERE group_id = old.group_id;
+  UPDATE group_stats SET member_count = member_count + 1 WHERE group_id = new.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_members_stats_ad AFTER DELETE ON members BEGIN
+  UPDATE group_stats SET member_count = member_count - 1 WHERE group_id = old.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_releases_stats_ai AFTER INSERT ON releases BEGIN
+  UPDATE group_stats
+  SET release_count = release_count + 1,
+      first_release_date = CASE WHEN first_release_date IS NULL OR new.release_date < first_release_date
+                                THEN COALESCE(new.release_date, first_release_date) ELSE first_release_date END,
+      latest_release_date = CASE WHEN latest_release_date IS NULL OR new.release_date > latest_release_date
+                                 THEN COALESCE(new.release_date, latest_release_date) ELSE latest_release_date END
+  WHERE group_id = new.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_releases_stats_au AFTER UPDATE OF group_id, release_date ON releases BEGIN
+  UPDATE group_stats
+  SET release_count = release_count - (old.group_id <> new.group_id),
+      song_count = song_count - CASE WHEN old.group_id <> new.group_id
+                                     THEN (SELECT COUNT(*) FROM songs WHERE release_id = new.release_id) ELSE 0 END,
+      {_release_dates_of("old.group_id")}
+  WHERE group_id = old.group_id;
+  UPDATE group_stats
+  SET release_count = release_count + (old.group_id <> new.group_id),
+      song_count = song_count + CASE WHEN old.group_id <> new.group_id
+                                     THEN (SELECT COUNT(*) FROM songs WHERE release_id = new.release_id) ELSE 0 END,
+      {_release_dates_of("new.group_id")}
+  WHERE group_id = new.group_id AND old.group_id <> new.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_releases_stats_bd BEFORE DELETE ON releases BEGIN
+  UPDATE group_stats
+  SET song_count = song_count - (SELECT COUNT(*) FROM songs WHERE release_id = old.release_id)
+  WHERE group_id = old.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_releases_stats_ad AFTER DELETE ON releases BEGIN
+  UPDATE group_stats
+  SET release_count = release_count - 1,
+      {_release_dates_of("old.group_id")}
+  WHERE group_id = old.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_songs_stats_ai AFTER INSERT ON songs BEGIN
+  UPDATE group_stats SET song_count = song_count + 1 WHERE group_id = {_group_of_release("new.release_id")};
+END;
+CREATE TRIGGER IF NOT EXISTS trg_songs_stats_au AFTER UPDATE OF release_id ON songs BEGIN
+  UPDATE group_stats SET song_count = song_count - 1 WHERE group_id = {_group_of_release("old.release_id")};
+  UPDATE group_stats SET song_count = song_count + 1 WHERE group_id = {_group_of_release("new.release_id")};
+END;
+CREATE TRIGGER IF NOT EXISTS trg_songs_stats_ad AFTER DELETE ON songs BEGIN
+  UPDATE group_stats SET song_count = song_count - 1 WHERE group_id = {_group_of_release("old.release_id")};
+END;
+"""
+
+# 圖片引用計數：每個 image_path 被幾個 groups / members 用到（image_store.py 清理沒人用的圖檔時看這張表）
+# 同一張圖上傳兩次只會存一份檔案，所以不能看到刪一列就刪檔
+IMAGE_REFS_SELECT = """
+SELECT image_path, COUNT(*)
+FROM (
+  SELECT image_path FROM groups WHERE image_path IS NOT NULL
+  UNION ALL
+  SELECT image_path FROM members WHERE image_path IS NOT NULL
+)
+GROUP BY image_path
+"""
+
+SCHEMA_SQL += """
+CREATE TABLE IF NOT EXISTS image_refs (
+  path TEXT PRIMARY KEY,
+  refs INTEGER NOT NULL DEFAULT 0
+);
+"""
+for _t in ["groups", "members"]:
+    SCHEMA_SQL += f"""
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_refs_ai AFTER INSERT ON {_t} WHEN new.image_path IS NOT NULL BEGIN
+  INSERT INTO image_refs (path, refs) VALUES (new.image_path, 1)
+  ON CONFLICT(path) DO UPDATE SET refs = refs + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_refs_au AFTER UPDATE OF image_path ON {_t}
+WHEN old.image_path IS NOT new.image_path BEGIN
+  UPDATE image_refs SET refs = refs - 1 WHERE path = old.image_path;
+  INSERT INTO image_refs (path, refs) SELECT new.image_path, 1 WHERE new.image_path IS NOT NULL
+  ON CONFLICT(path) DO UPDATE SET refs = refs + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_refs_ad AFTER DELETE ON {_t} WHEN old.image_path IS NOT NULL BEGIN
+  UPDATE image_refs SET refs = refs - 1 WHERE path = old.image_path;
+END;
+"""
+
+# 模糊搜尋（fuzzy.py）的變動紀錄：名字 / 歌名有新增、修改、刪除就記下 id，
+# app 裡的 trigram 索引只重算這些 id；整批匯入後 import_from_csv.py 會清空，索引改成整個重建
+SCHEMA_SQL += """
+CREATE TABLE IF NOT EXISTS fuzzy_log (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL,
+  ref_id INTEGER NOT NULL
+);
+"""
+for _t, _id, _cols in [
+    ("groups", "group_id", "group_name"),
+    ("members", "member_id", "stage_name, real_name"),
+    ("songs", "song_id", "title"),
+]:
+    SCHEMA_SQL += f"""
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_fuzzy_ai AFTER INSERT ON {_t} BEGIN
+  INSERT INTO fuzzy_log (kind, ref_id) VALUES ('{_t}', new.{_id});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_fuzzy_au AFTER UPDATE OF {_cols} ON {_t} BEGIN
+  INSERT INTO fuzzy_log (kind, ref_id) VALUES ('{_t}', new.{_id});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_{_t}_fuzzy_ad AFTER DELETE ON {_t} BEGIN
+  INSERT INTO fuzzy_log (kind, ref_id) VALUES ('{_t}', old.{_id});
+END;
+"""
+
+# fuzzy_log 只有匯入會清空：app 平常的寫入每 1000 筆順便截掉太舊的，表不會一直長大。
+# 落後超過 FUZZY_LOG_KEEP 筆的索引會看到 log 被截過（最小的 seq 接不上），照原本的路徑整個重建
+FUZZY_LOG_KEEP = 10_000
+
+SCHEMA_SQL += f"""
+CREATE TRIGGER IF NOT EXISTS trg_fuzzy_log_trim AFTER INSERT ON fuzzy_log WHEN new.seq % 1000 = 0 BEGIN
+  DELETE FROM fuzzy_log WHERE seq <= new.seq - {FUZZY_LOG_KEEP};
+END;
 """
 
 def reset_db(conn: sqlite3.Connection) -> None:
@@ -126,14 +487,125 @@ def reset_db(conn: sqlite3.Connection) -> None:
 
     conn.execute("PRAGMA foreign_keys = ON;")
 
+def rebuild_fts(conn: sqlite3.Connection) -> None:
+    """
+    從原表重建全文索引。
+    舊資料庫第一次加上 FTS 表時，trigger 之前寫入的資料還沒進索引，要重建一次。
+    """
+    for t in FTS_TABLES:
+        conn.execute(f"INSERT INTO {t}({t}) VALUES ('rebuild');")
+
+def rebuild_member_search(conn: sqlite3.Connection) -> None:
+    """從原表重建 member_search（舊資料庫第一次加上這張表時用）"""
+    conn.execute("DELETE FROM member_search;")
+    conn.execute(f"INSERT INTO member_search {MEMBER_SEARCH_SELECT};")
+
+def rebuild_group_stats(conn: sqlite3.Connection) -> None:
+    """從原表重算 group_stats（舊資料庫第一次加上這張表時用）"""
+    conn.execute("DELETE FROM group_stats;")
+    conn.execute(f"INSERT INTO group_stats {GROUP_STATS_SELECT};")
+
+def check_group_stats(conn: sqlite3.Connection) -> list:
+    """group_stats 跟從原表重算的結果比對，回傳對不上的 group_id（空的就是一致）"""
+    rows = conn.execute(f"""
+        SELECT group_id FROM (SELECT * FROM ({GROUP_STATS_SELECT}) EXCEPT SELECT * FROM group_stats)
+        UNION
+        SELECT group_id FROM (SELECT * FROM group_stats EXCEPT SELECT * FROM ({GROUP_STATS_SELECT}));
+    """).fetchall()
+    return sorted({r[0] for r in rows})
+
+def normalize_image_paths(conn: sqlite3.Connection) -> int:
+    """舊資料的 image_path 是 Windows 反斜線，統一成 /（images 表的 key 也是這個格式）"""
+    n = 0
+    for t in ["groups", "members"]:
+        n += conn.execute(
+            f"UPDATE {t} SET image_path = replace(image_path, '\\', '/') WHERE instr(image_path, '\\') > 0;"
+        ).rowcount
+    return n
+
+def rebuild_image_refs(conn: sqlite3.Connection) -> None:
+    """從 groups / members 重算 image_refs（舊資料庫第一次加上這張表時用）"""
+    conn.execute("DELETE FROM image_refs;")
+    conn.execute(f"INSERT INTO image_refs (path, refs) {IMAGE_REFS_SELECT};")
+
+def enable_wal(conn: sqlite3.Connection) -> str:
+    """
+    改成 WAL 模式（設定會存在資料庫檔裡，之後每條連線都是 WAL）：
+    讀不會被寫擋住、寫也不會被讀擋住，同時只會有一個寫入者。
+    回傳目前的 journal_mode（檔案系統不支援 WAL 時會維持原樣）。
+    """
+    mode = conn.execute("PRAGMA journal_mode = WAL;").fetchone()[0]
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    return mode
+
+# ANALYZE 每個索引最多抽樣幾列：統計是近似值，但大資料庫也只要一下子
+ANALYSIS_LIMIT = 1000
+
+def analyze(conn: sqlite3.Connection) -> None:
+    """
+    更新查詢規劃用的統計（sqlite_stat1）。沒有統計時 SQLite 只能猜，同一張表有好幾個索引可選時常常選錯。
+    大量寫入（匯入、加索引）之後跑一次；可以在交易裡跑。
+    """
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT};")
+    conn.execute("ANALYZE;")
+
+def add_youtube_video_id(conn: sqlite3.Connection) -> bool:
+    """
+    舊資料庫的 songs 還沒有 youtube_video_id 欄位：補上（要在 SCHEMA_SQL 建索引之前）。
+    回傳有沒有補（有補的話接著要 backfill_youtube_video_ids）
+    """
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(songs);")}
+    if not cols or "youtube_video_id" in cols:
+        return False
+    conn.execute("ALTER TABLE songs ADD COLUMN youtube_video_id TEXT;")
+    return True
+
+
+def backfill_youtube_video_ids(conn: sqlite3.Connection) -> int:
+    """從 youtube_url 算出還沒填的 youtube_video_id，回傳更新幾筆"""
+    rows = conn.execute(
+        "SELECT song_id, youtube_url FROM songs WHERE youtube_url IS NOT NULL AND youtube_video_id IS NULL;"
+    ).fetchall()
+    updates = [(vid, song_id) for song_id, url in rows if (vid := youtube.video_id(url))]
+    conn.executemany("UPDATE songs SET youtube_video_id = ? WHERE song_id = ?;", updates)
+    return len(updates)
+
+
+def clear_bare_video_ids(conn: sqlite3.Connection) -> int:
+    """舊版 youtube.video_id 把 youtube_url 裡任何 11 碼的字串（hello_world）都當成 id：清掉，回傳清了幾筆"""
+    return conn.execute(
+        "UPDATE songs SET youtube_video_id = NULL WHERE youtube_video_id = trim(youtube_url);"
+    ).rowcount
+
+
 def init_db(wipe: bool = False) -> None:
     conn = sqlite3.connect(DB_PATH)
     try:
+        enable_wal(conn)
         conn.execute("PRAGMA foreign_keys = ON;")
+        existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")}
+        added_video_id = add_youtube_video_id(conn)
         conn.executescript(SCHEMA_SQL)
 
         if wipe:
             reset_db(conn)
+        else:
+            if "songs_fts" not in existing:
+                rebuild_fts(conn)
+            if "member_search" not in existing:
+                rebuild_member_search(conn)
+            if "group_stats" not in existing or check_group_stats(conn):
+                rebuild_group_stats(conn)  # 沒有這張表，或被舊版 trg_groups_stats_au 算壞過
+            if "images" not in existing:
+                normalize_image_paths(conn)
+                image_manifest.sync(conn)
+            if "image_refs" not in existing:
+                rebuild_image_refs(conn)
+                image_store.dedupe(conn)  # 改用圖片庫之前的重複圖檔只留一份
+            if added_video_id:
+                backfill_youtube_video_ids(conn)
+            clear_bare_video_ids(conn)
+            analyze(conn)
 
         conn.commit()
     finally:
@@ -0,0 +1,314 @@
+# queries.py
+# app 用到的查詢 SQL（不依賴 streamlit）：app.py、benchmark 等都從這裡拿，確保跑的是同一套 SQL
+# search_* 函式回傳 (sql, params)；篩選條件傳 None 表示「全部」，after / limit 做 keyset 分頁，
+# ids 只取這些 id（模糊搜尋找到的候選再套一次篩選）
+
+import json
+
+import pandas as pd
+
+# ---------------------------
+# 下拉選單 / 常用查詢
+# ---------------------------
+COMPANIES_SQL = """
+SELECT company_id, company_name
+FROM companies
+ORDER BY company_name COLLATE NOCASE;
+"""
+
+GROUPS_SQL = """
+SELECT g.group_id, g.group_name, c.company_name, g.debut_date, g.fandom_name, g.image_path
+FROM groups g
+LEFT JOIN companies c ON g.company_id=c.company_id
+ORDER BY g.group_name COLLATE NOCASE;
+"""
+
+NATIONALITIES_SQL = """
+SELECT nationality_code, nationality_name
+FROM nationalities
+ORDER BY nationality_code;
+"""
+
+RELEASES_FOR_GROUP_SQL = """
+SELECT release_id, release_name, release_type, release_lang, release_date
+FROM releases
+WHERE group_id = ?
+ORDER BY release_date, release_name COLLATE NOCASE;
+"""
+
+# 同一支影片（youtube_video_id）被哪些歌用；走 idx_songs_youtube_video_id
+SONGS_BY_VIDEO_SQL = """
+SELECT s.song_id, g.group_name, r.release_name, s.title
+FROM songs s
+JOIN releases r ON s.release_id = r.release_id
+JOIN groups g ON r.group_id = g.group_id
+WHERE s.youtube_video_id = ?
+ORDER BY s.song_id;
+"""
+
+# ---------------------------
+# 詳細頁
+# ---------------------------
+GROUP_PROFILE_SQL = """
+SELECT
+  g.group_id, g.group_name, c.company_name, g.debut_date, g.fandom_name, g.image_path,
+  (SELECT json_group_array(json_object(
+            'member_id', x.member_id, 'stage_name', x.stage_name, 'real_name', x.real_name,
+            'birth_date', x.birth_date, 'image_path', x.image_path, 'nationalities', x.nationalities))
+     FROM (
+       SELECT member_id, stage_name, real_name, birth_date, image_path, nationalities
+       FROM member_search
+       WHERE group_id = g.group_id
+       ORDER BY stage_key
+     ) x) AS members_json,
+  (SELECT json_group_array(json_object(
+            'release_name', y.release_name, 'release_type', y.release_type,
+            'release_lang', y.release_lang, 'release_date', y.release_date))
+     FROM (
+       SELECT release_name, release_type, release_lang, release_date
+       FROM releases
+       WHERE group_id = g.group_id
+       ORDER BY release_date DESC, release_name COLLATE NOCASE
+     ) y) AS releases_json
+FROM groups g
+LEFT JOIN companies c ON g.company_id = c.company_id
+WHERE g.group_id = ?;
+"""
+
+# group_stats：init_db.py 用 trigger 維護的每團統計
+GROUP_STATS_SQL = """
+SELECT member_count, release_count, song_count, first_release_date, latest_release_date
+FROM group_stats
+WHERE group_id = ?;
+"""
+
+MEMBER_COLS = ["member_id", "stage_name", "real_name", "birth_date", "image_path", "nationalities"]
+RELEASE_COLS = ["release_name", "release_type", "release_lang", "release_date"]
+
+# member_search：init_db.py 用 trigger 維護的反正規化表（團名、公司、國籍都已經算好）
+MEMBER_DETAIL_SQL = """
+SELECT member_id, stage_name, real_name, birth_date, image_path, group_name, company_name, nationalities
+FROM member_search
+WHERE member_id = ?;
+"""
+
+
+def _clean(v):
+    return None if v is None or (not isinstance(v, str) and pd.isna(v)) else v
+
+
+def group_profile_from_df(df: pd.DataFrame):
+    """把 GROUP_PROFILE_SQL 的結果整理成 dict；查無資料回傳 None"""
+    if df.empty:
+        return None
+
+    row = df.iloc[0]
+    return {
+        "group": {
+            k: _clean(row[k])
+            for k in ["group_id", "group_name", "company_name", "debut_date", "fandom_name", "image_path"]
+        },
+        "members": pd.DataFrame(json.loads(row["members_json"]), columns=MEMBER_COLS),
+        "releases": pd.DataFrame(json.loads(row["releases_json"]), columns=RELEASE_COLS),
+    }
+
+
+# ---------------------------
+# 搜尋
+# ---------------------------
+PAGE_SIZE = 40      # 搜尋結果每頁幾筆
+COUNT_CAP = 1000    # 總筆數最多數到這裡，超過只顯示「1000+」，不為了一個數字掃完整張表
+
+
+def fts_phrase(q: str):
+    """
+    把搜尋字串轉成 FTS5 MATCH 用的片語（trigram：子字串比對、不分大小寫）。
+    不足 3 個字元 trigram 索引查不到，回傳 None，呼叫端改用 LIKE。
+    """
+    q = q.strip()
+    if len(q) < 3:
+        return None
+    return '"' + q.replace('"', '""') + '"'
+
+
+def _finish(cols: str, body: str, params: list, keys: list, after=None, limit=None, count_cap=None):
+    """
+    組出搜尋 SQL。body 是 FROM ... WHERE ...；keys 是排序欄位，最後一個必須是唯一的 id。
+    - after：上一頁最後一列的 keys 值（keyset 分頁：WHERE (keys) > (after)，不用 OFFSET）
+    - limit：最多幾筆
+    - count_cap：改成回傳「筆數」查詢，最多數到 count_cap + 1 就停
+    排序欄位會以 _k0, _k1 ... 一起選出來，split_page() 用來算下一頁的 cursor。
+    """
+    params = list(params)
+    if count_cap is not None:
+        return f"SELECT COUNT(*) AS n FROM (SELECT 1 {body} LIMIT ?);", tuple(params + [count_cap + 1])
+
+    key_cols = ", ".join(f"{k} AS _k{i}" for i, k in enumerate(keys))
+    sql = f"SELECT {cols}, {key_cols} {body}"
+    if after is not None:
+        if len(after) != len(keys):
+            raise ValueError(f"cursor 應該有 {len(keys)} 個值，收到 {len(after)} 個")
+        sql += f" AND ({', '.join(keys)}) > ({', '.join('?' * len(keys))}) "
+        params += list(after)
+    sql += f" ORDER BY {', '.join(keys)}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql + ";", tuple(params)
+
+
+def split_page(df: pd.DataFrame, page_size: int):
+    """
+    搜尋時用 limit=page_size+1 查：多出來那一筆只用來判斷有沒有下一頁。
+    回傳 (這一頁的資料（不含 _k 欄）, 下一頁的 cursor；沒有下一頁為 None)
+    """
+    keys = [c for c in df.columns if c.startswith("_k")]
+    cursor = None
+    if len(df) > page_size:
+        last = df.iloc[page_size - 1]
+        cursor = tuple(v.item() if hasattr(v, "item") else v for v in last[keys])
+    return df.iloc[:page_size].drop(columns=keys), cursor
+
+
+# 團體搜尋的排序方式 -> keyset 的排序欄位（數量由大到小：取負號，row value 比較一樣用 >）
+# 跟 init_db.py 的 idx_groups_name_nocase / idx_group_stats_* 一一對應，排序不用整張表 sort
+GROUP_ORDERS = {
+    "name": ["g.group_name COLLATE NOCASE", "g.group_id"],
+    "members": ["-s.member_count", "s.group_id"],
+    "releases": ["-s.release_count", "s.group_id"],
+    "songs": ["-s.song_count", "s.group_id"],
+}
+
+
+def search_groups_sql(q: str = "", company: str | None = None, without_company: bool = False,
+                      order: str = "name", ids=None, after=None, limit=None, count_cap=None):
+    """
+    團體名稱（groups_fts）+ 公司篩選；without_company=True 只找沒有公司的團。
+    order 見 GROUP_ORDERS；用名稱排序且有關鍵字時，先依相關度排。
+    """
+    cols = "g.group_id, g.group_name, c.company_name, g.debut_date, s.member_count, s.song_count"
+    body = """
+    FROM groups g
+    LEFT JOIN companies c ON g.company_id = c.company_id
+    JOIN group_stats s ON s.group_id = g.group_id
+    """
+    params = []
+    keys = list(GROUP_ORDERS[order])
+
+    match = fts_phrase(q)
+    if match:
+        body += " JOIN groups_fts f ON f.rowid = g.group_id AND groups_fts MATCH ? "
+        params.append(match)
+        if order == "name":
+            keys.insert(0, "f.rank")
+
+    body += " WHERE 1=1 "
+
+    if q and not match:
+        body += " AND g.group_name LIKE ? "
+        params.append(f"%{q}%")
+
+    if without_company:
+        body += " AND c.company_name IS NULL "
+    elif company is not None:
+        body += " AND c.company_name = ? "
+        params.append(company)
+
+    if ids is not None:
+        body += " AND g.group_id IN (SELECT value FROM json_each(?)) "
+        params.append(json.dumps(list(ids)))
+
+    return _finish(cols, body, params, keys, after, limit, count_cap)
+
+
+def search_members_sql(q: str = "", group: str | None = None, nationality: str | None = None,
+                       ids=None, after=None, limit=None, count_cap=None):
+    """藝名/本名（members_fts）+ 團體 / 國籍篩選；查 member_search，不用 join groups"""
+    cols = "m.member_id, m.stage_name, m.group_name"
+    body = """
+    FROM member_search m
+    """
+    params = []
+    # group_key / stage_key 是預先算好的 lower()，排序跟 keyset 比較都走 idx_member_search_sort
+    keys = ["m.group_key", "m.stage_key", "m.member_id"]
+
+    match = fts_phrase(q)
+    if match:
+        # 依相關度排序；藝名命中的權重比本名高
+        body += " JOIN members_fts f ON f.rowid = m.member_id AND members_fts MATCH ? "
+        params.append(match)
+        keys.insert(0, "bm25(members_fts, 10.0, 1.0)")
+
+    body += " WHERE 1=1 "
+
+    if q and not match:
+        body += " AND (m.stage_name LIKE ? OR m.real_name LIKE ?) "
+        params += [f"%{q}%", f"%{q}%"]
+
+    if group is not None:
+        body += " AND m.group_name = ? "
+        params.append(group)
+
+    if nationality is not None:
+        body += """
+        AND m.member_id IN (
+          SELECT member_id FROM member_nationalities WHERE nationality_code = ?
+        )
+        """
+        params.append(nationality)
+
+    if ids is not None:
+        body += " AND m.member_id IN (SELECT value FROM json_each(?)) "
+        params.append(json.dumps(list(ids)))
+
+    return _finish(cols, body, params, keys, after, limit, count_cap)
+
+
+def search_songs_sql(q: str = "", group: str | None = None, lang: str | None = None,
+                     ids=None, after=None, limit=None, count_cap=None):
+    """歌名（songs_fts）+ 團體 / 語言篩選"""
+    cols = """
+      s.song_id,
+      g.group_name,
+      r.release_name,
+      r.release_type,
+      r.release_lang,
+      r.release_date,
+      s.title,
+      s.youtube_url,
+      s.youtube_video_id
+    """
+    body = """
+    FROM songs s
+    JOIN releases r ON s.release_id = r.release_id
+    JOIN groups g ON r.group_id = g.group_id
+    """
+    params = []
+    # release_date 可能是 NULL：row value 比較遇到 NULL 會整列比不出來，所以用 '' 代替（排序位置不變）
+    keys = ["g.group_name COLLATE NOCASE", "COALESCE(r.release_date, '')", "s.title COLLATE NOCASE", "s.song_id"]
+
+    match = fts_phrase(q)
+    if match:
+        body += " JOIN songs_fts f ON f.rowid = s.song_id AND songs_fts MATCH ? "
+        params.append(match)
+        keys.insert(0, "f.rank")
+
+    body += " WHERE 1=1 "
+
+    if q and not match:
+        body += " AND s.title LIKE ? "
+        params.append(f"%{q}%")
+
+    if group is not None:
+        body += " AND g.group_name = ? "
+        params.append(group)
+
+    if lang is not None:
+        body += " AND r.release_lang = ? "
+        params.append(lang)
+
+    if ids is not None:
+        body += " AND s.song_id IN (SELECT value FROM json_each(?)) "
+        params.append(json.dumps(list(ids)))
+
+    return _finish(cols, body, params, keys, after, limit, count_cap)
@@ -0,0 +1,149 @@
+# query_stats.py
+# SQL 執行統計：依「SQL 形狀」（空白壓平、IN (?, ?, ...) 合併）累計次數、延遲、筆數，
+# 每種形狀第一次執行時順便抓 EXPLAIN QUERY PLAN，標出整張表掃描（SCAN 沒走索引）
+# 不依賴 streamlit：app.py 用 st.cache_resource 包一個全域實例，benchmark 等也能直接用
+
+import json
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+SAMPLE_SIZE = 2048  # 每種形狀保留最近幾次的延遲來算 p50 / p99
+
+_WS_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+# "SCAN m"、"SCAN members AS m"；"SCAN m USING INDEX ..."、"SCAN f VIRTUAL TABLE ..."、"SCAN (subquery-1)" 不算
+_FULL_SCAN_RE = re.compile(r"^SCAN (?!CONSTANT ROW)([^\s(]+)(?: AS \S+)?$")
+
+
+def sql_shape(sql: str) -> str:
+    """同一種查詢不管怎麼排版、IN 清單幾個參數，都算同一個形狀"""
+    shape = _WS_RE.sub(" ", sql).strip().rstrip(";").strip()
+    return _IN_LIST_RE.sub("?, ...", shape)
+
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    """EXPLAIN QUERY PLAN 的 detail 欄（依樹狀層級縮排）"""
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    depth = {0: -1}
+    out = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        out.append("  " * depth[node_id] + detail)
+    return out
+
+
+def full_scans(plan: list) -> list:
+    """plan 裡整張表掃描的表（別名）"""
+    hits = []
+    for line in plan:
+        m = _FULL_SCAN_RE.match(line.strip())
+        if m:
+            hits.append(m.group(1))
+    return hits
+
+
+def _sample_params(params):
+    """第一次執行的參數（匯出後 index_advisor.py 拿來重播）；不是 JSON 存得下的就不留"""
+    if not isinstance(params, (list, tuple)):
+        return None
+    params = list(params)
+    try:
+        json.dumps(params)
+    except (TypeError, ValueError):
+        return None
+    return params
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class QueryStats:
+    """
+    thread-safe 的 SQL 統計。
+
+    - record() 在每次查詢後呼叫：累計次數 / 時間 / 筆數
+    - 同一個形狀的 EXPLAIN QUERY PLAN 只抓一次（用同一條連線、同一組參數）
+    - snapshot() 回傳依總時間排序的清單，to_json() 匯出
+    """
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.started_at = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    def record(self, sql: str, seconds: float, rows: int, conn=None, params=()) -> None:
+        shape = sql_shape(sql)
+        with self._lock:
+            s = self._shapes.get(shape)
+            if s is None:
+                s = self._shapes[shape] = {
+                    "calls": 0,
+                    "total_s": 0.0,
+                    "max_s": 0.0,
+                    "rows": 0,
+                    "samples": deque(maxlen=self.sample_size),
+                    "plan": None,
+                    "params": _sample_params(params),
+                }
+            s["calls"] += 1
+            s["total_s"] += seconds
+            s["max_s"] = max(s["max_s"], seconds)
+            s["rows"] += max(rows or 0, 0)
+            s["samples"].append(seconds)
+            need_plan = s["plan"] is None and conn is not None
+            if need_plan:
+                s["plan"] = []  # 先占位，別的執行緒不會重複抓
+
+        if need_plan:
+            try:
+                plan = explain(conn, sql, params)
+            except sqlite3.Error as e:
+                plan = [f"(無法取得 query plan：{e})"]
+            with self._lock:
+                s["plan"] = plan
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self.started_at = datetime.now(timezone.utc)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            items = [(shape, dict(s, samples=sorted(s["samples"]))) for shape, s in self._shapes.items()]
+
+        out = []
+        for shape, s in items:
+            plan = s["plan"] or []
+            out.append({
+                "sql": shape,
+                "calls": s["calls"],
+                "total_ms": round(s["total_s"] * 1000, 2),
+                "p50_ms": round(_percentile(s["samples"], 0.50) * 1000, 3),
+                "p99_ms": round(_percentile(s["samples"], 0.99) * 1000, 3),
+                "max_ms": round(s["max_s"] * 1000, 3),
+                "rows": s["rows"],
+                "rows_per_call": round(s["rows"] / s["calls"], 1) if s["calls"] else 0,
+                "full_scan": full_scans(plan),
+                "plan": plan,
+                "params": s["params"],
+            })
+        out.sort(key=lambda r: r["total_ms"], reverse=True)
+        return out
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "queries": self.snapshot(),
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
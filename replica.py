@@ -0,0 +1,205 @@
+# replica.py
+# 記憶體唯讀副本：用 SQLite backup API 把 kpop.db 整份複製進 shared-cache 的 in-memory 資料庫，
+# 搜尋頁 / 詳細頁的讀取都走記憶體，不再跟磁碟 I/O、其他 process 的寫入搶
+#
+# 副本不直接修改，有變動就整份重新載入成「新的一代」再換上去（舊的一代等借出的連線還回來就消失）：
+#   - 這個 process 自己寫入後：呼叫 mark_stale()，寫入端不用等，重載在背景開始；
+#     下一次 connection() 等重載完才借出（寫的人馬上看得到，連續寫好幾筆也只重載一次）
+#   - 別的 process 寫入（匯入、另一個 app）：每隔 CHECK_INTERVAL 秒看一次 PRAGMA data_version，
+#     有變就開背景執行緒重載；重載期間讀取繼續用舊的一代，不用等
+# 每一代載入後就不再寫，所以不會碰到 shared cache 的表格鎖（SQLITE_LOCKED）
+# 記憶體：大約是 kpop.db 的大小；重載的那一下新舊兩代同時存在
+# 不依賴 streamlit：app.py 用 st.cache_resource 整個 process 共用一個
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from db_pool import DB_PATH, POOL_SIZE, ConnectionPool
+
+CHECK_INTERVAL = 2.0   # 最多每幾秒檢查一次磁碟上的資料庫有沒有被別人改過
+
+# 副本的連線：只讀（寫進副本的東西下次重載就不見了，寧可直接報錯）
+REPLICA_PRAGMAS = (
+    "PRAGMA query_only=ON;",
+)
+
+_ids = itertools.count(1)
+
+
+class ReadReplica:
+    """
+    kpop.db 的記憶體副本。
+
+    - connection()：借一條副本的連線（跟 ConnectionPool.connection() 一樣用 with）
+    - mark_stale()：這個 process 剛寫入（寫入之後呼叫）：背景重載，下一次 connection() 會等它
+    - refresh()：磁碟上的資料庫有變動就立刻重載
+    - reload()：不管有沒有變動，強制重載
+    - thread-safe；同一時間只有一個重載在跑
+    """
+
+    def __init__(self, db_path=DB_PATH, check_interval: float = CHECK_INTERVAL, pool_size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self.pool_size = pool_size
+        self._name = f"kpop_replica_{os.getpid()}_{next(_ids)}"
+
+        self._lock = threading.Lock()          # 保護目前這一代（換代 / 讀計數）
+        self._reload_lock = threading.Lock()   # 同時只有一個重載
+        # 專門看 data_version 的磁碟連線：別的連線 commit 過，它看到的值就會變
+        self._watch = sqlite3.connect(db_path, check_same_thread=False)
+        self._watch_lock = threading.Lock()
+
+        self._gen = 0
+        self._keeper = None      # 記憶體資料庫在最後一條連線關掉時就消失：留一條撐著
+        self._pool = None
+        self._version = None     # 載入這一代時看到的 data_version
+        self._checked_at = 0.0
+        self._marks = 0          # mark_stale() 叫過幾次
+        self._clean = 0          # 確認過副本已經包含第幾次 mark_stale() 之前的寫入
+        self._counters = {
+            "reloads": 0,             # 重載次數（含啟動時第一次）
+            "background_reloads": 0,  # 其中因為別的 process 寫入、在背景做的
+            "reload_failures": 0,
+            "last_reload_ms": 0.0,
+            "size_mb": 0.0,
+            "loaded_at": None,
+        }
+        self.reload()
+
+    # -------------------------
+    # 載入
+    # -------------------------
+    def _data_version(self) -> int:
+        with self._watch_lock:
+            return self._watch.execute("PRAGMA data_version;").fetchone()[0]
+
+    def _load(self) -> None:
+        """呼叫端要先拿 _reload_lock"""
+        t0 = time.perf_counter()
+        # 先記版本再複製：複製途中別人 commit 的話，下次檢查會再載一次（多載一次，不會漏）
+        version = self._data_version()
+        gen = self._gen + 1
+        uri = f"file:{self._name}_{gen}?mode=memory&cache=shared"
+
+        keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        try:
+            src = sqlite3.connect(self.db_path)
+            try:
+                src.backup(keeper)  # 一步複製完：整份都是同一個時間點的內容
+            finally:
+                src.close()
+            pages = keeper.execute("PRAGMA page_count;").fetchone()[0]
+            page_size = keeper.execute("PRAGMA page_size;").fetchone()[0]
+        except BaseException:
+            keeper.close()
+            raise
+        pool = ConnectionPool(uri, size=self.pool_size, pragmas=REPLICA_PRAGMAS, uri=True)
+
+        with self._lock:
+            old_keeper, old_pool = self._keeper, self._pool
+            self._keeper, self._pool, self._gen, self._version = keeper, pool, gen, version
+            self._counters["reloads"] += 1
+            self._counters["last_reload_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            self._counters["size_mb"] = round(pages * page_size / 1024 / 1024, 2)
+            self._counters["loaded_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        # 還借在外面的舊連線用完會回到舊的池子，池子沒人參照時一起關掉
+        if old_pool is not None:
+            old_pool.close_idle()
+        if old_keeper is not None:
+            old_keeper.close()
+
+    def reload(self) -> None:
+        with self._reload_lock:
+            self._load()
+
+    def refresh(self) -> bool:
+        """磁碟上的資料庫在上次載入後有人 commit 過就重載；回傳有沒有重載"""
+        with self._lock:
+            marks = self._marks
+        with self._reload_lock:
+            changed = self._data_version() != self._version
+            if changed:
+                self._load()
+            with self._lock:
+                self._clean = max(self._clean, marks)
+            return changed
+
+    def mark_stale(self) -> None:
+        """這個 process 剛 commit：開始背景重載，下一次 connection() 等重載完才借出"""
+        with self._lock:
+            self._marks += 1
+        self._start_background()
+
+    def _background_reload(self) -> None:
+        if not self._reload_lock.acquire(blocking=False):
+            return  # 已經有人在重載
+        try:
+            if self._data_version() != self._version:
+                self._load()
+                with self._lock:
+                    self._counters["background_reloads"] += 1
+        except Exception:
+            # 背景重載失敗（例如磁碟上的資料庫暫時打不開）：繼續用舊的一代，下次檢查再試
+            with self._lock:
+                self._counters["reload_failures"] += 1
+        finally:
+            self._reload_lock.release()
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            version = self._version
+        if self._data_version() != version:
+            self._start_background()
+
+    def _start_background(self) -> None:
+        if not self._reload_lock.locked():
+            threading.Thread(target=self._background_reload, name="replica-reload", daemon=True).start()
+
+    # -------------------------
+    # 讀取
+    # -------------------------
+    @contextmanager
+    def connection(self):
+        self._check()
+        with self._lock:
+            stale = self._marks != self._clean
+        if stale:
+            # 背景重載還在跑就等它；它開始得比寫入早（沒載到剛寫的）的話這裡再載一次
+            self.refresh()
+        with self._lock:
+            pool = self._pool
+        with pool.connection() as conn:
+            yield conn
+
+    # -------------------------
+    # 管理
+    # -------------------------
+    def close(self) -> None:
+        with self._reload_lock, self._lock:
+            if self._pool is not None:
+                self._pool.close_idle()
+            if self._keeper is not None:
+                self._keeper.close()
+            self._pool = self._keeper = None
+            with self._watch_lock:
+                self._watch.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._counters)
+            out["generation"] = self._gen
+            pool = self._pool
+        if pool is not None:
+            p = pool.stats()
+            out["pool"] = {k: p[k] for k in ("open", "idle", "in_use", "checkouts", "waits")}
+        return out
@@ -0,0 +1,22 @@
+# tests/conftest.py
+# 測試直接 import 根目錄的模組（init_db、queries …），每個測試一個記憶體資料庫
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from init_db import SCHEMA_SQL  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    """空的 kpop schema（含所有 trigger），外鍵開著，跟 app 寫入時一樣"""
+    c = sqlite3.connect(":memory:")
+    c.executescript(SCHEMA_SQL)
+    c.execute("PRAGMA foreign_keys = ON;")
+    yield c
+    c.close()
@@ -0,0 +1,42 @@
+# tests/test_fuzzy_log.py
+# fuzzy_log：索引照 log 增量更新；app 一直寫，log 也不會無限長大，落後太多的索引改成整個重建
+
+from fuzzy import FuzzyIndex
+from init_db import FUZZY_LOG_KEEP
+
+
+def add_groups(conn, names):
+    conn.executemany("INSERT INTO groups (group_name) VALUES (?);", [(n,) for n in names])
+    conn.commit()
+
+
+def test_incremental_refresh(conn):
+    add_groups(conn, ["TWICE", "ITZY"] + [f"group {i}" for i in range(20)])  # 失效的 entry 太多會改成重建
+    index = FuzzyIndex("groups")
+    assert index.refresh(conn)["mode"] == "rebuild"
+    assert index.refresh(conn)["mode"] == "none"
+
+    add_groups(conn, ["NMIXX"])
+    conn.execute("UPDATE groups SET group_name = 'ITZZY' WHERE group_name = 'ITZY';")
+    conn.commit()
+    assert index.refresh(conn) == {"mode": "incremental", "changed": 2}
+    found = {conn.execute("SELECT group_name FROM groups WHERE group_id = ?;", (ref,)).fetchone()[0]
+             for ref, _ in index.search("nmix")}
+    assert found == {"NMIXX"}
+    assert not index.search("itzy", min_similarity=0.99)
+
+
+def test_log_is_capped(conn):
+    index = FuzzyIndex("groups")
+    add_groups(conn, ["seed"])
+    index.refresh(conn)
+
+    n = FUZZY_LOG_KEEP + 2500
+    add_groups(conn, [f"g{i}" for i in range(n)])
+    rows, low, top = conn.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM fuzzy_log;").fetchone()
+    assert top == n + 1
+    assert FUZZY_LOG_KEEP <= rows < FUZZY_LOG_KEEP + 1000
+    assert low > index.seq + 1  # 這個索引要的紀錄已經被截掉了
+
+    assert index.refresh(conn)["mode"] == "rebuild"
+    assert len(index) == n + 1
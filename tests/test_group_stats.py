@@ -0,0 +1,87 @@
+# tests/test_group_stats.py
+# group_stats 由 trigger 維護：每一種寫入之後都要跟 GROUP_STATS_SELECT 從原表重算的一樣
+
+import pytest
+
+from init_db import check_group_stats
+
+
+@pytest.fixture
+def db(conn):
+    conn.executescript("""
+        INSERT INTO companies (company_id, company_name) VALUES (1, 'HYBE'), (2, 'JYPE');
+        INSERT INTO groups (group_id, company_id, group_name) VALUES (1, 1, 'LE SSERAFIM'), (2, 2, 'ITZY');
+        INSERT INTO members (member_id, group_id, stage_name) VALUES
+          (1, 1, 'Sakura'), (2, 1, 'Chaewon'), (3, 2, 'Yeji');
+        INSERT INTO releases (release_id, group_id, release_name, release_type, release_lang, release_date) VALUES
+          (1, 1, 'FEARLESS', 'EP', 'KR', '2022-05-02'),
+          (2, 1, 'UNFORGIVEN', 'ALBUM', 'KR', '2023-05-01'),
+          (3, 2, 'CHESHIRE', 'EP', 'KR', NULL);
+        INSERT INTO songs (song_id, release_id, title) VALUES
+          (1, 1, 'FEARLESS'), (2, 1, 'Blue Flame'), (3, 2, 'UNFORGIVEN'), (4, 3, 'Cheshire');
+    """)
+    assert check_group_stats(conn) == []
+    return conn
+
+
+def stats(conn, group_id):
+    return conn.execute(
+        "SELECT member_count, release_count, song_count, first_release_date, latest_release_date "
+        "FROM group_stats WHERE group_id = ?;", (group_id,)
+    ).fetchone()
+
+
+def test_insert(db):
+    db.execute("INSERT INTO groups (group_id, group_name) VALUES (3, 'ILLIT');")
+    db.execute("INSERT INTO members (group_id, stage_name) VALUES (3, 'Yunah');")
+    db.execute("""
+        INSERT INTO releases (release_id, group_id, release_name, release_type, release_lang, release_date)
+        VALUES (4, 3, 'SUPER REAL ME', 'EP', 'KR', '2024-03-25'), (5, 3, 'I''LL LIKE YOU', 'EP', 'KR', NULL);
+    """)
+    db.execute("INSERT INTO songs (release_id, title) VALUES (4, 'Magnetic'), (4, 'Midnight Fiction');")
+    assert check_group_stats(db) == []
+    assert stats(db, 3) == (1, 2, 2, "2024-03-25", "2024-03-25")
+
+
+def test_update(db):
+    db.execute("UPDATE members SET group_id = 2 WHERE member_id = 1;")
+    db.execute("UPDATE releases SET release_date = '2021-01-01' WHERE release_id = 2;")
+    db.execute("UPDATE releases SET group_id = 2 WHERE release_id = 1;")
+    db.execute("UPDATE songs SET release_id = 3 WHERE song_id = 3;")
+    db.execute("UPDATE releases SET release_date = '2022-10-17' WHERE release_id = 3;")
+    assert check_group_stats(db) == []
+    assert stats(db, 1) == (1, 1, 0, "2021-01-01", "2021-01-01")
+
+
+def test_group_id_change(db):
+    # ON UPDATE CASCADE 改子表時子表的 trigger 照舊 id 加減：最後要照新 id 重算
+    db.execute("UPDATE groups SET group_id = 10 WHERE group_id = 1;")
+    assert check_group_stats(db) == []
+    assert stats(db, 1) is None
+    assert stats(db, 10) == (2, 2, 3, "2022-05-02", "2023-05-01")
+
+    db.execute("UPDATE companies SET company_id = 5 WHERE company_id = 2;")  # 公司改 id 不影響統計
+    assert check_group_stats(db) == []
+
+
+def test_delete(db):
+    db.execute("DELETE FROM songs WHERE song_id = 2;")
+    db.execute("DELETE FROM members WHERE member_id = 2;")
+    assert check_group_stats(db) == []
+
+    db.execute("DELETE FROM releases WHERE release_id = 1;")  # cascade 刪掉底下的歌
+    assert check_group_stats(db) == []
+    assert stats(db, 1) == (1, 1, 1, "2023-05-01", "2023-05-01")
+
+    db.execute("DELETE FROM groups WHERE group_id = 2;")  # cascade 刪成員、發行、歌
+    assert check_group_stats(db) == []
+    assert stats(db, 2) is None
+
+    db.execute("DELETE FROM companies WHERE company_id = 1;")  # groups.company_id SET NULL
+    assert check_group_stats(db) == []
+
+
+def test_check_reports_drift(db):
+    db.execute("UPDATE group_stats SET song_count = song_count + 1 WHERE group_id = 2;")
+    db.execute("DELETE FROM group_stats WHERE group_id = 1;")
+    assert check_group_stats(db) == [1, 2]
@@ -0,0 +1,33 @@
+# tests/test_index_advisor.py
+# 候選索引的排序規則要跟欄位宣告的一樣，不然 WHERE / ORDER BY 用不到
+
+import sqlite3
+
+import index_advisor
+from query_stats import explain
+
+
+def test_declared_collations():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE t (
+          id INTEGER PRIMARY KEY,
+          "name" TEXT COLLATE NOCASE NOT NULL,
+          note TEXT DEFAULT 'a, (b',
+          code TEXT COLLATE rtrim CHECK (code IN ('x', 'y')),
+          UNIQUE (name, code)
+        );
+    """)
+    assert index_advisor.table_columns(conn, "t") == {"name": "NOCASE", "note": "BINARY", "code": "RTRIM"}
+
+
+def test_candidate_is_used():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, code TEXT COLLATE RTRIM);")
+    conn.executemany("INSERT INTO t (name, code) VALUES (?, 'x');", [(f"n{i}",) for i in range(200)])
+    sql = "SELECT id FROM t WHERE code = ? ORDER BY name LIMIT 5;"
+
+    (table, key), *_ = index_advisor.candidates(conn, sql, explain(conn, sql, ("x",)))
+    assert (table, key) == ("t", (("code", "RTRIM", False), ("name", "NOCASE", False)))
+    conn.execute(index_advisor.index_sql(table, key))
+    assert explain(conn, sql, ("x",)) == [f"SEARCH t USING COVERING INDEX {index_advisor.index_name(table, key)} (code=?)"]
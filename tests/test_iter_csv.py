@@ -0,0 +1,37 @@
+# tests/test_iter_csv.py
+# --stream 的斷點是「之前 yield 過幾列」：從任何一列接著讀，都要剛好接上（欄位裡有換行、中間有空白行也一樣）
+
+import pandas as pd
+import pytest
+
+import import_from_csv
+
+SONGS_CSV = (
+    "group_name,release_name,release_type,release_lang,title,youtube_url\n"
+    'A,R,EP,KR,"two\nlines",\n'
+    "A,R,EP,KR,plain,\n"
+    "\n"
+    'A,R,EP,KR,"blank\n\ninside",\n'
+    "A,R,EP,KR,four,\n"
+    "A,R,EP,KR,five,\n"
+)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    (tmp_path / "songs.csv").write_text(SONGS_CSV, encoding="utf-8")
+    monkeypatch.setattr(import_from_csv, "DATA_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+def test_resume_from_every_row(data_dir, chunk_size):
+    full = pd.concat(import_from_csv.iter_csv("songs", 100))
+    assert full["title"].tolist() == ["two\nlines", "plain", "blank\n\ninside", "four", "five"]
+
+    for done in range(len(full) + 1):
+        chunks = list(import_from_csv.iter_csv("songs", chunk_size, skip_rows=done))
+        assert all(len(c) <= chunk_size for c in chunks)
+        rest = pd.concat(chunks) if chunks else full.iloc[:0]
+        assert rest["title"].tolist() == full["title"].tolist()[done:]
+        assert rest.index.tolist() == full.index.tolist()[done:]  # 錯誤訊息的行號跟整份讀的一樣
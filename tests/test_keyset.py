@@ -0,0 +1,100 @@
+# tests/test_keyset.py
+# keyset 分頁（queries._finish / split_page）：一頁一頁接起來要跟不分頁的結果一模一樣，
+# 不管頁界落在哪裡（排序值相同的列、release_date 是 NULL 的列剛好跨頁）
+
+import pandas as pd
+import pytest
+
+from queries import _finish, search_groups_sql, search_members_sql, search_songs_sql, split_page
+
+
+@pytest.fixture
+def db(conn):
+    conn.executescript("""
+        INSERT INTO groups (group_id, group_name) VALUES
+          (1, 'aespa'), (2, 'AESPA2'), (3, 'ive'), (4, 'IVE JP'), (5, 'Zeta'), (6, 'zeta b');
+        INSERT INTO members (group_id, stage_name, real_name) VALUES
+          (1, 'Karina', 'Yu Ji-min'), (1, 'winter', 'Kim Min-jeong'), (1, 'Winter', NULL),
+          (3, 'Yujin', 'An Yu-jin'), (3, 'Gaeul', NULL), (4, 'yujin', NULL), (5, 'Karina', NULL);
+        INSERT INTO releases (release_id, group_id, release_name, release_type, release_lang, release_date) VALUES
+          (1, 1, 'Savage', 'EP', 'KR', '2021-10-05'),
+          (2, 1, 'Girls', 'EP', 'KR', NULL),
+          (3, 1, 'Drama', 'EP', 'KR', NULL),
+          (4, 3, 'ELEVEN', 'SINGLE', 'KR', '2021-12-01'),
+          (5, 3, 'WAVE', 'EP', 'JP', NULL),
+          (6, 5, 'Zeta One', 'SINGLE', 'EN', '2020-01-01');
+        INSERT INTO songs (release_id, title) VALUES
+          (1, 'Savage'), (1, 'savage'), (1, 'Aenergy'), (2, 'Girls'), (2, 'Illusion'),
+          (3, 'Drama'), (3, 'girls'), (4, 'ELEVEN'), (4, 'Take It'), (5, 'WAVE'),
+          (5, 'Eleven (Japanese ver.)'), (6, 'One'), (6, 'one');
+    """)
+    return conn
+
+
+def all_pages(conn, fn, page_size, **kw):
+    """照 app 的方式一頁一頁查（limit = page_size + 1），回傳接起來的結果跟頁數"""
+    pages, after = [], None
+    while True:
+        sql, params = fn(after=after, limit=page_size + 1, **kw)
+        page, after = split_page(pd.read_sql_query(sql, conn, params=params), page_size)
+        pages.append(page)
+        if after is None:
+            return pd.concat(pages, ignore_index=True), len(pages)
+
+
+def unpaged(conn, fn, **kw):
+    sql, params = fn(**kw)
+    df = pd.read_sql_query(sql, conn, params=params)
+    return df.drop(columns=[c for c in df.columns if c.startswith("_k")])
+
+
+CASES = [
+    (search_songs_sql, {}),
+    (search_songs_sql, {"q": "ge"}),  # 不到 3 個字：LIKE
+    (search_songs_sql, {"q": "ele"}),  # FTS：先依相關度
+    (search_songs_sql, {"group": "aespa"}),
+    (search_members_sql, {}),
+    (search_members_sql, {"q": "yujin"}),
+    (search_groups_sql, {}),
+    (search_groups_sql, {"order": "members"}),
+    (search_groups_sql, {"order": "songs", "q": "ve"}),
+]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 5, 100])
+@pytest.mark.parametrize("fn, kw", CASES)
+def test_pages_match_unpaged(db, fn, kw, page_size):
+    expected = unpaged(db, fn, **kw)
+    got, n_pages = all_pages(db, fn, page_size, **kw)
+    id_col = expected.columns[0]  # song_id / member_id / group_id：沒有漏、沒有重複、順序一樣
+    assert got[id_col].tolist() == expected[id_col].tolist()
+    assert n_pages == max(1, -(-len(expected) // page_size))
+
+
+def test_null_release_date_across_pages(db):
+    # aespa 的歌：有日期的、沒日期的兩張發行混在一起，每頁一首逐頁走完
+    got, _ = all_pages(db, search_songs_sql, 1, group="aespa")
+    # 沒日期的排在前面（COALESCE 成 ''），同一天再依歌名（不分大小寫）、song_id
+    assert got["title"].tolist() == ["Drama", "Girls", "girls", "Illusion", "Aenergy", "Savage", "savage"]
+    assert got["release_date"].isna().sum() == 4
+
+
+def test_cursor_values_are_plain(db):
+    sql, params = search_songs_sql(limit=3)
+    _, cursor = split_page(pd.read_sql_query(sql, db, params=params), 2)
+    assert all(v is None or isinstance(v, (int, float, str)) for v in cursor)
+
+
+def test_last_page_has_no_cursor(db):
+    sql, params = search_groups_sql(limit=7)
+    page, cursor = split_page(pd.read_sql_query(sql, db, params=params), 6)
+    assert len(page) == 6 and cursor is None
+    assert not any(c.startswith("_k") for c in page.columns)
+
+
+def test_finish_rejects_wrong_cursor_length():
+    with pytest.raises(ValueError):
+        _finish("x", "FROM t WHERE 1=1", [], ["a", "id"], after=(1,))
+    sql, params = _finish("x", "FROM t WHERE 1=1", [5], ["a", "id"], after=("b", 2), limit=3)
+    assert "(a, id) > (?, ?)" in sql
+    assert params == (5, "b", 2, 3)
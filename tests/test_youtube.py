@@ -0,0 +1,28 @@
+# tests/test_youtube.py
+
+import pytest
+
+from youtube import video_id
+
+VID = "4vbDFu0PUew"
+
+
+@pytest.mark.parametrize("url", [
+    f"https://youtu.be/{VID}?si=PssUfxI6RMwYY4G2",
+    f"https://www.youtube.com/watch?v={VID}",
+    f"https://m.youtube.com/watch?list=PL1&v={VID}&t=10",
+    f"youtube.com/shorts/{VID}",
+    f"https://www.youtube-nocookie.com/embed/{VID}",
+])
+def test_urls(url):
+    assert video_id(url) == VID
+
+
+@pytest.mark.parametrize("text", ["hello_world", VID, f"https://notyoutube.com/watch?v={VID}", "", None])
+def test_not_a_link(text):
+    assert video_id(text) is None
+
+
+def test_bare_id_only_when_field_is_an_id():
+    assert video_id(f" {VID} ", bare_ok=True) == VID
+    assert video_id("hello", bare_ok=True) is None
@@ -0,0 +1,182 @@
+# thumbs.py
+# 圖片縮圖快取：依 app 實際顯示的寬度產生縮小版，避免每次 rerun 都把原圖整張讀出來送到瀏覽器
+# 縮圖檔名 = 原圖內容 hash + 寬度；原圖的 mtime/size 沒變就不重算 hash
+#
+# 用法：
+#   python thumbs.py           批次產生 images/ 底下所有圖片的縮圖
+#   python thumbs.py --clean   另外刪掉已經沒有原圖對應的縮圖
+
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+IMAGE_ROOT = Path("images")
+THUMB_DIR = Path(".thumbs")
+
+# app 用到的顯示寬度：成員格子 / 團體 LOGO / 成員詳細
+THUMB_WIDTHS = (120, 220, 260)
+PIXEL_RATIO = 2        # 高解析螢幕：實際像素 = 顯示寬度 x 2
+WEBP_QUALITY = 82
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# 原圖路徑 -> (mtime_ns, size, sha256)
+_index = {}
+_lock = threading.Lock()
+
+
+def source_path(path) -> Path:
+    """DB/CSV 裡的路徑可能是 Windows 反斜線（images\\groups\\x.png），統一成 Path"""
+    return Path(str(path).replace("\\", "/"))
+
+
+def source_hash(src: Path) -> str | None:
+    """原圖內容的 sha256；檔案 mtime/size 沒變就直接用上次算的。檔案不存在回傳 None"""
+    try:
+        st = src.stat()
+    except OSError:
+        return None
+
+    key = str(src)
+    with _lock:
+        hit = _index.get(key)
+    if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        return hit[2]
+
+    h = hashlib.sha256()
+    with open(src, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    sha = h.hexdigest()
+
+    with _lock:
+        _index[key] = (st.st_mtime_ns, st.st_size, sha)
+    return sha
+
+
+def thumb_path(sha: str, width: int) -> Path:
+    return THUMB_DIR / sha[:2] / f"{sha}_{width}.webp"
+
+
+def _render(src: Path, dest: Path, width: int) -> None:
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if im.mode in ("LA", "PA", "P") or "transparency" in im.info else "RGB")
+        px = width * PIXEL_RATIO
+        if im.width > px:
+            im = im.resize((px, max(1, round(im.height * px / im.width))), Image.LANCZOS)
+
+        # 先寫暫存檔再 rename：其他 session 不會讀到寫一半的縮圖
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                im.save(f, "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(tmp, dest)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+def thumbnail(path, width: int) -> Path | None:
+    """
+    取得 path 在 width 寬度的縮圖（沒有就現場產生）。
+    原圖不存在或讀不了回傳 None，呼叫端自己決定要不要改用原圖。
+    """
+    if not path:
+        return None
+    src = source_path(path)
+    sha = source_hash(src)
+    if sha is None:
+        return None
+
+    dest = thumb_path(sha, width)
+    if not dest.exists():
+        try:
+            _render(src, dest, width)
+        except OSError:
+            return None
+    return dest
+
+
+# 已確認存在的縮圖（sha, width）：同一張圖之後 render 連 exists() 都不用做
+_made = set()
+
+
+def thumbnail_for(path, sha: str, width: int) -> Path | None:
+    """
+    跟 thumbnail() 一樣，但 sha 由呼叫端給（例如 images 清單表），不用讀檔算 hash。
+    產生失敗回傳 None。
+    """
+    dest = thumb_path(sha, width)
+    if (sha, width) in _made:
+        return dest
+    if not dest.exists():
+        try:
+            _render(source_path(path), dest, width)
+        except OSError:
+            return None
+    with _lock:
+        _made.add((sha, width))
+    return dest
+
+
+def build_all(root: Path = IMAGE_ROOT, widths=THUMB_WIDTHS) -> dict:
+    """批次產生 root 底下所有圖片的縮圖，回傳統計與目前有效的 hash 集合"""
+    stats = {"sources": 0, "made": 0, "existing": 0, "failed": 0, "hashes": set()}
+    for src in sorted(root.rglob("*")):
+        if src.suffix.lower() not in IMAGE_EXTS or not src.is_file():
+            continue
+        stats["sources"] += 1
+        sha = source_hash(src)
+        stats["hashes"].add(sha)
+        for w in widths:
+            dest = thumb_path(sha, w)
+            if dest.exists():
+                stats["existing"] += 1
+                continue
+            try:
+                _render(src, dest, w)
+                stats["made"] += 1
+            except OSError as e:
+                stats["failed"] += 1
+                print(f"⚠️ 無法產生縮圖：{src}（{e}）")
+    return stats
+
+
+def clean(valid_hashes: set) -> int:
+    """刪掉不屬於任何現有原圖的縮圖，回傳刪了幾個"""
+    removed = 0
+    if not THUMB_DIR.exists():
+        return removed
+    for f in THUMB_DIR.rglob("*.webp"):
+        if f.stem.rsplit("_", 1)[0] not in valid_hashes:
+            f.unlink()
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clean", action="store_true", help="刪掉已經沒有原圖對應的縮圖")
+    args = parser.parse_args()
+
+    stats = build_all()
+    print(
+        f"✅ 縮圖完成：原圖 {stats['sources']} 張，新產生 {stats['made']}，"
+        f"已存在 {stats['existing']}，失敗 {stats['failed']}"
+    )
+    if args.clean:
+        print(f"🧹 已刪除 {clean(stats['hashes'])} 個過期縮圖")
+
+    total = sum(f.stat().st_size for f in THUMB_DIR.rglob("*.webp")) if THUMB_DIR.exists() else 0
+    print(f"縮圖目錄：{THUMB_DIR.resolve()}（{total / 1024 / 1024:.1f} MB）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# youtube.py
+# YouTube 連結 -> 影片 id（songs.youtube_video_id）。不依賴 streamlit：
+# init_db.py 補舊資料、import_from_csv.py 匯入、app.py 寫入 / 顯示都用這裡，三邊算出來的 id 一定一樣
+#
+# 支援：youtu.be/<id>、watch?v=<id>（v 不一定是第一個參數）、/embed/、/shorts/、/live/、/v/，
+# 其他參數（?si=、&t=、&list=）都忽略。
+# 只有 11 碼、不是連結的字串（hello_world 也是 11 碼）只在欄位本來就是填 id 的時候才算（bare_ok=True）
+
+import re
+
+_ID = r"[A-Za-z0-9_-]{11}"
+_ID_RE = re.compile(rf"{_ID}")
+_URL_RE = re.compile(
+    rf"(?<![A-Za-z0-9-])(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:[^#\s]*&)?v=|embed/|shorts/|live/|v/)|youtu\.be/)"
+    rf"({_ID})(?![A-Za-z0-9_-])"
+)
+
+
+def video_id(url, bare_ok: bool = False) -> str | None:
+    """
+    連結裡的影片 id；空值或認不出來回傳 None。
+    bare_ok=True：這個欄位本來就是填影片 id 的，直接給 11 碼的 id 也接受（youtube_url 欄位不是）
+    """
+    if not isinstance(url, str):
+        return None
+    s = url.strip()
+    if bare_ok and _ID_RE.fullmatch(s):
+        return s
+    m = _URL_RE.search(s)
+    return m.group(1) if m else None
+
+
+def embed_url(vid: str, autoplay: bool = False) -> str:
+    return f"https://www.youtube.com/embed/{vid}" + ("?autoplay=1" if autoplay else "")
+
+
+def watch_url(vid: str) -> str:
+    return f"https://www.youtube.com/watch?v={vid}"
+
+
+def thumbnail_url(vid: str) -> str:
+    """YouTube 自己的預覽圖（480x360），點播放之前先顯示這張"""
+    return f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"